@@ -1,16 +1,46 @@
 # api_handler.py
-from openai import OpenAI, OpenAIError
 from pathlib import Path
-from typing import List # Make sure List is imported for type hinting
+from typing import AsyncIterator, Callable, Iterator, List, TYPE_CHECKING # Make sure List is imported for type hinting
+import threading
+import time
+import logging
 import config
+import tts_text
+
+logger = logging.getLogger(__name__)
+
+# openai is heavy to import, so it is only imported where it is actually used
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 
 # Default list in case API call fails or returns unexpected results
 # You can customize this list with models you know work well
 DEFAULT_CHAT_MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
 
-def get_chat_response(client: OpenAI, prompt: str, model: str) -> str:
-    """Gets a text response from the OpenAI Chat API."""
+def create_client(api_key: str | None = None, base_url: str | None = None) -> "OpenAI":
+    """Creates an OpenAI client, importing the library on first use."""
+    from openai import OpenAI
+    client_kwargs = {}
+    if api_key: client_kwargs["api_key"] = api_key
+    if base_url: client_kwargs["base_url"] = base_url
+    return OpenAI(**client_kwargs)
+
+def create_async_client(api_key: str | None = None, base_url: str | None = None) -> "AsyncOpenAI":
+    """Creates an AsyncOpenAI client (for the asyncio request engine)."""
+    from openai import AsyncOpenAI
+    client_kwargs = {}
+    if api_key: client_kwargs["api_key"] = api_key
+    if base_url: client_kwargs["base_url"] = base_url
+    return AsyncOpenAI(**client_kwargs)
+
+def get_chat_response(client: "OpenAI", prompt: str, model: str, metrics: dict | None = None) -> str:
+    """
+    Gets a text response from the OpenAI Chat API.
+    If a metrics dict is passed it is filled with model, latency_s and completion_tokens.
+    """
+    from openai import OpenAIError
     try:
+        started = time.perf_counter()
         chat_response = client.chat.completions.create(
             model=model,
             messages=[
@@ -19,48 +49,217 @@ def get_chat_response(client: OpenAI, prompt: str, model: str) -> str:
             ]
         )
         generated_text = chat_response.choices[0].message.content
+        if metrics is not None:
+            usage = getattr(chat_response, "usage", None)
+            metrics.update(model=model, latency_s=time.perf_counter() - started,
+                           completion_tokens=getattr(usage, "completion_tokens", None))
         if not generated_text:
             return "(No text response received from API.)" # Return informative message
         return generated_text
     except OpenAIError as e:
-        print(f"OpenAI API error (Chat): {e}")
+        logger.error("OpenAI API error (Chat): %s", e)
         # Raise a more specific, catchable error if needed upstream
         raise ConnectionError(f"Failed to get chat response: {e}") from e
     except Exception as e:
-        print(f"Unexpected error in get_chat_response: {e}")
+        logger.error("Unexpected error in get_chat_response: %s", e)
         raise RuntimeError(f"Unexpected error getting chat response: {e}") from e
 
-def generate_speech(client: OpenAI, text: str, output_path: Path,
+async def get_chat_response_async(client: "AsyncOpenAI", prompt: str, model: str, metrics: dict | None = None) -> str:
+    """Async counterpart of get_chat_response (same return value, metrics and errors)."""
+    from openai import OpenAIError
+    try:
+        started = time.perf_counter()
+        chat_response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        generated_text = chat_response.choices[0].message.content
+        if metrics is not None:
+            usage = getattr(chat_response, "usage", None)
+            metrics.update(model=model, latency_s=time.perf_counter() - started,
+                           completion_tokens=getattr(usage, "completion_tokens", None))
+        if not generated_text:
+            return "(No text response received from API.)"
+        return generated_text
+    except OpenAIError as e:
+        logger.error("OpenAI API error (Chat): %s", e)
+        raise ConnectionError(f"Failed to get chat response: {e}") from e
+    except Exception as e:
+        logger.error("Unexpected error in get_chat_response_async: %s", e)
+        raise RuntimeError(f"Unexpected error getting chat response: {e}") from e
+
+def stream_chat_response(client: "OpenAI", prompt: str, model: str,
+                         cancel_event: threading.Event | None = None,
+                         on_stream_open: Callable | None = None) -> Iterator[str]:
+    """
+    Streams a chat response, yielding one text delta per chunk (an empty string
+    for chunks without content, so the first yield marks the first byte).
+    Stops early if cancel_event is set. on_stream_open receives the underlying
+    stream so another thread can close() it to abort a stalled request.
+    """
+    from openai import OpenAIError
+    stream = None
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        if on_stream_open: on_stream_open(stream)
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            yield delta or ""
+    except OpenAIError as e:
+        if cancel_event is not None and cancel_event.is_set(): return # Aborted on purpose
+        logger.error("OpenAI API error (Chat stream): %s", e)
+        raise ConnectionError(f"Failed to stream chat response: {e}") from e
+    except Exception as e:
+        if cancel_event is not None and cancel_event.is_set(): return # Aborted on purpose
+        logger.error("Unexpected error in stream_chat_response: %s", e)
+        raise RuntimeError(f"Unexpected error streaming chat response: {e}") from e
+    finally:
+        if stream is not None:
+            try: stream.close()
+            except Exception: pass
+
+async def stream_chat_response_async(client: "AsyncOpenAI", prompt: str, model: str, metrics: dict | None = None) -> AsyncIterator[str]:
+    """
+    Async counterpart of stream_chat_response, yielding the non-empty text deltas.
+    If a metrics dict is passed it is filled with model, ttft_s (first text delta),
+    latency_s, and - when the server reports usage - prompt_tokens and completion_tokens.
+    """
+    from openai import OpenAIError
+    stream = None
+    try:
+        started = time.perf_counter()
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True} # Usage arrives in a final chunk without choices
+        )
+        if metrics is not None: metrics.update(model=model, ttft_s=None)
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None and metrics is not None:
+                metrics.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if metrics is not None and metrics["ttft_s"] is None: metrics["ttft_s"] = time.perf_counter() - started
+                yield delta
+        if metrics is not None: metrics["latency_s"] = time.perf_counter() - started
+    except OpenAIError as e:
+        logger.error("OpenAI API error (Chat stream, %s): %s", model, e)
+        raise ConnectionError(f"Failed to stream chat response: {e}") from e
+    except Exception as e:
+        logger.error("Unexpected error in stream_chat_response_async: %s", e)
+        raise RuntimeError(f"Unexpected error streaming chat response: {e}") from e
+    finally:
+        if stream is not None:
+            try: await stream.close()
+            except Exception: pass
+
+def _prepare_speech_input(text: str, speed: float, metrics: dict | None, spoken: str | None = None) -> str:
+    """Preprocesses text for TTS (unless the caller already did: spoken) and records how much was saved."""
+    if spoken is None: spoken = tts_text.speech_text(text)
+    saved = tts_text.preprocessing_metrics(text, spoken, speed)
+    if metrics is not None: metrics.update(saved)
+    if saved["chars_saved"]: logger.debug("TTS input %s -> %s chars (~%.1fs of audio saved)", saved["chars_in"], saved["chars_out"], saved["audio_s_saved"])
+    return spoken
+
+def generate_speech(client: "OpenAI", text: str, output_path: Path,
                     model: str = config.DEFAULT_TTS_MODEL,
                     voice: str = config.DEFAULT_TTS_VOICE,
-                    speed: float = config.DEFAULT_TTS_SPEED): # <-- Add speed parameter with default
-    """Generates speech using OpenAI TTS and saves to output_path."""
-    try:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+                    speed: float = config.DEFAULT_TTS_SPEED, # <-- Add speed parameter with default
+                    response_format: str = "mp3", metrics: dict | None = None, spoken: str | None = None) -> bytes | None:
+    """
+    Generates speech using OpenAI TTS.
+
+    For "mp3" and "wav" the clip is saved to output_path and None is returned.
+    For "pcm" the raw 16-bit mono samples (config.TTS_NATIVE_SAMPLE_RATE) are
+    returned without touching disk, so the caller can play them straight from
+    memory and archive them later (see file_utils.write_pcm_as_wav).
 
-        print(f"DEBUG: Generating speech with model={model}, voice={voice}, speed={speed}") # Log speed
+    The text is preprocessed for speech first (tts_text.speech_text); callers that
+    already did pass the result as spoken, which is then synthesized as is. If a metrics
+    dict is passed it is filled with chars_in, chars_out, chars_saved and audio_s_saved.
+    """
+    from openai import OpenAIError
+    text = _prepare_speech_input(text, speed, metrics, spoken)
+    try:
+        logger.debug("Generating speech with model=%s, voice=%s, speed=%s, format=%s", model, voice, speed, response_format) # Log speed
         tts_response = client.audio.speech.create(
             model=model,
             voice=voice,
             input=text,
-            speed=speed # <-- Pass speed parameter to API
+            speed=speed, # <-- Pass speed parameter to API
+            response_format=response_format
         )
+        if response_format == "pcm":
+            pcm_data = tts_response.content
+            logger.info("Received %s bytes of PCM audio.", len(pcm_data))
+            return pcm_data
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         tts_response.stream_to_file(output_path)
-        print(f"Audio successfully saved to: {output_path}")
+        logger.info("Audio successfully saved to: %s", output_path)
+        return None
     # ... (exception handling remains the same) ...
-    except OpenAIError as e: print(f"OpenAI API error (TTS): {e}"); raise ConnectionError(f"Failed to generate speech: {e}") from e
-    except Exception as e: print(f"Unexpected error in generate_speech: {e}"); raise RuntimeError(f"Unexpected error generating speech: {e}") from e
+    except OpenAIError as e: logger.error("OpenAI API error (TTS): %s", e); raise ConnectionError(f"Failed to generate speech: {e}") from e
+    except Exception as e: logger.error("Unexpected error in generate_speech: %s", e); raise RuntimeError(f"Unexpected error generating speech: {e}") from e
+
+
+async def generate_speech_async(client: "AsyncOpenAI", text: str, output_path: Path,
+                                model: str = config.DEFAULT_TTS_MODEL,
+                                voice: str = config.DEFAULT_TTS_VOICE,
+                                speed: float = config.DEFAULT_TTS_SPEED,
+                                response_format: str = "mp3", metrics: dict | None = None, spoken: str | None = None) -> bytes | None:
+    """Async counterpart of generate_speech (PCM is returned, other formats are saved to output_path)."""
+    from openai import OpenAIError
+    text = _prepare_speech_input(text, speed, metrics, spoken)
+    try:
+        logger.debug("Generating speech with model=%s, voice=%s, speed=%s, format=%s", model, voice, speed, response_format)
+        tts_response = await client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            speed=speed,
+            response_format=response_format
+        )
+        if response_format == "pcm":
+            pcm_data = tts_response.content
+            logger.info("Received %s bytes of PCM audio.", len(pcm_data))
+            return pcm_data
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        await tts_response.astream_to_file(output_path)
+        logger.info("Audio successfully saved to: %s", output_path)
+        return None
+    except OpenAIError as e: logger.error("OpenAI API error (TTS): %s", e); raise ConnectionError(f"Failed to generate speech: {e}") from e
+    except Exception as e: logger.error("Unexpected error in generate_speech_async: %s", e); raise RuntimeError(f"Unexpected error generating speech: {e}") from e
 
 
 # --- Function to get available chat models ---
-def get_available_chat_models(client: OpenAI) -> List[str]:
+def get_available_chat_models(client: "OpenAI") -> List[str]:
     """
     Fetches available models from OpenAI API and filters for common chat models.
     Returns a default list if the API call fails or filtering yields nothing.
     Requires a client instance authenticated with a valid API key.
     """
+    from openai import OpenAIError
     try:
-        print("DEBUG: Attempting to fetch models from OpenAI API...")
+        logger.debug("Attempting to fetch models from OpenAI API...")
         models_list = client.models.list() # The actual API call
         chat_model_ids = []
 
@@ -80,25 +279,25 @@ def get_available_chat_models(client: OpenAI) -> List[str]:
             # --- End Filtering Logic ---
 
         # Optional: Print all models found before filtering for debugging
-        # print(f"DEBUG: Raw model IDs found: {sorted(raw_ids_for_debug)}")
+        # logger.debug("Raw model IDs found: %s", sorted(raw_ids_for_debug))
 
         # Ensure default models are included if missed by filter or API
         for default_model in DEFAULT_CHAT_MODELS:
              if default_model not in chat_model_ids:
-                  print(f"DEBUG: Adding default model '{default_model}' to list.")
+                  logger.debug("Adding default model '%s' to list.", default_model)
                   chat_model_ids.append(default_model)
 
         chat_model_ids = sorted(list(set(chat_model_ids))) # Remove duplicates and sort
 
-        print(f"DEBUG: Found and filtered chat models: {chat_model_ids}")
+        logger.debug("Found and filtered chat models: %s", chat_model_ids)
 
         # Return the filtered list, or the default list if filtering yielded nothing
         return chat_model_ids if chat_model_ids else DEFAULT_CHAT_MODELS
 
     except OpenAIError as e:
-        print(f"WARN: OpenAI API error fetching models: {e}. Returning default list.")
+        logger.warning("OpenAI API error fetching models: %s. Returning default list.", e)
         return DEFAULT_CHAT_MODELS # Return default on API error
     except Exception as e:
-        print(f"WARN: Unexpected error fetching models: {e}. Returning default list.")
+        logger.warning("Unexpected error fetching models: %s. Returning default list.", e)
         return DEFAULT_CHAT_MODELS # Return default on other errors
 # --- End of get_available_chat_models ---
\ No newline at end of file
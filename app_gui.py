@@ -3,22 +3,39 @@
 # ... (Keep all existing imports) ...
 import customtkinter
 import threading
-import time
+import asyncio
 from pathlib import Path
-from openai import OpenAI, OpenAIError
 import os
 import json
 from datetime import datetime
 import tkinter as tk
 import traceback
+import logging
 
 import config
 import api_handler
+import chunked_tts
+import tts_text
 from audio_player import AudioPlayer
-from history_manager import load_history, save_history
-from file_utils import cleanup_old_recordings
+from history_manager import load_history, save_history_merged
+from file_utils import find_response_audio, maintain_recordings, response_audio_path, write_pcm_as_wav
 import theme_manager
-from settings_window import SettingsWindow, TTS_VOICES, TTS_SPEEDS
+import hedging
+from model_stats import ModelStats
+from config import TTS_VOICES, TTS_SPEEDS
+from startup_profiler import profiler
+from sampling_profiler import SamplingProfiler
+from lag_watchdog import EventLoopWatchdog
+from chunked_text import ChunkedTextLoader
+from similarity_index import SimilarityIndex
+from prompt_autocomplete import PromptAutocomplete
+from speculative_prefetch import SpeculativePrefetch
+from async_engine import AsyncEngine
+from segment_store import SegmentStore
+from audio_backfill import AudioBackfill
+
+logger = logging.getLogger(__name__)
+# settings_window and openai are imported lazily where they are first needed
 
 
 class ChatApp(customtkinter.CTk):
@@ -38,6 +55,7 @@ class ChatApp(customtkinter.CTk):
         # --- State Variables ---
         self._is_shutting_down = threading.Event()
         self.settings_window = None
+        self.compare_window = None
         self.current_api_key_display = ""
         self.selected_history_timestamp = None
         self.current_chat_model = config.DEFAULT_CHAT_MODEL
@@ -47,7 +65,18 @@ class ChatApp(customtkinter.CTk):
         self.tts_enabled = True
         self.speak_input_enabled = False
         self.is_playing = False
-        self.processing_thread = None
+        self.current_request = None # concurrent Future of the running chat/TTS task
+        self.playback_task = None # concurrent Future of a history playback task
+        self._async_client = None; self._async_client_key = None # Shared AsyncOpenAI client (one connection pool)
+        self._hedge_fallback_client = None; self._hedge_fallback_key = None # Async client for HEDGE_FALLBACK_BASE_URL
+        self.engine = AsyncEngine() # Single asyncio loop thread for all request work
+        self.engine.start()
+        self.history_buttons = [] # Recycled history row buttons (registered with theme_manager once)
+        self.sampling_profiler = SamplingProfiler() # Idle (no thread) until toggled
+        self.lag_watchdog = EventLoopWatchdog(self) # Started by main.py after first paint
+        self.text_loader = ChunkedTextLoader(self) # Large texts are inserted incrementally
+        self.audio_store = SegmentStore() if config.PACKED_AUDIO_STORE else None # Packed recordings (optional)
+        if self.audio_store is not None: self.engine.executor.submit(self.audio_store.compact, config.RESPONSES_DIR) # Pack loose clips left from earlier runs
         # --- Add variable to store fetched models ---
         self.available_models = api_handler.DEFAULT_CHAT_MODELS # Initialize with default
 
@@ -56,21 +85,37 @@ class ChatApp(customtkinter.CTk):
         self.user_settings_file = config.APP_BASE_DATA_DIR / "user_settings.json"
 
         # --- Load Persistent Data ---
-        self.load_user_settings() # Load saved prefs first
-        self.history = load_history(self.history_file)
-
-        # --- Fetch Models ONCE at Startup ---
+        with profiler.phase("ChatApp.load_user_settings"):
+            self.load_user_settings() # Load saved prefs first
+        self.player.use_buffer_calibration(self.audio_buffer_calibration, on_calibrated=lambda calibration: self.engine.post_to_ui(self._save_audio_calibration, calibration))
+        with profiler.phase("ChatApp.load_history"):
+            self.history = load_history(self.history_file) # Mutated on the engine thread only
+        self.hedge_stats = hedging.HedgeStats.load(config.HEDGE_STATS_FILE) # Used when config.HEDGE_ENABLED
+        self.model_stats = ModelStats.load(config.MODEL_STATS_FILE) # Measured per-model latency (dropdown + "auto")
+        self.similarity_index = SimilarityIndex() # Near-duplicate prompt lookup, built off the main thread
+        self.audio_backfill = AudioBackfill(self) # Opt-in: synthesizes missing history audio at idle priority
+        if self.audio_backfill_enabled: self.audio_backfill.start()
+        if config.SIMILAR_PROMPT_SUGGESTIONS: threading.Thread(target=self._build_similarity_index, name="SimilarityIndex", daemon=True).start()
+
+        # --- Fetch Models ONCE at Startup (background, off the first-paint path) ---
         self.fetch_models_startup() # Call new method to get model list
 
         # --- Build UI ---
-        self._create_widgets() # Build UI AFTER models might be fetched
-        self.update_history_display() # Populate history frame
+        with profiler.phase("ChatApp._create_widgets"):
+            self._create_widgets() # Build UI (model list is only needed by Settings)
+        self.prompt_autocomplete = PromptAutocomplete(self, self.input_textbox) if config.AUTOCOMPLETE_ENABLED else None # Past prompts as you type
+        if self.prompt_autocomplete is not None: threading.Thread(target=self.prompt_autocomplete.build_from_history, args=(list(self.history),), name="PromptIndex", daemon=True).start()
+        self.speculative_prefetch = SpeculativePrefetch(self, self.input_textbox, enabled=self.speculative_prefetch_enabled) # Opt-in: requests drafts while typing pauses
+        with profiler.phase("ChatApp.update_history_display"):
+            self.update_history_display() # Populate history frame
 
         # --- Apply Initial Theme ---
-        theme_manager.apply_theme(self, self.current_appearance_mode)
+        with profiler.phase("ChatApp.apply_theme"):
+            theme_manager.apply_theme(self, self.current_appearance_mode, immediate=True) # Before first paint
 
         # --- Set closing protocol ---
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(config.ENGINE_UI_POLL_MS, self._pump_engine_results) # Deliver engine results to the UI
 
 
     def _create_widgets(self):
@@ -103,7 +148,7 @@ class ChatApp(customtkinter.CTk):
             self.history_title_label, self.history_frame = create_history_panel(self.history_container)
         except ImportError:
             # Fallback: Define history panel widgets directly if ui_components missing
-            print("WARN: ui_components.py not found, defining history panel widgets directly.")
+            logger.warning("ui_components.py not found, defining history panel widgets directly.")
             self.history_title_label = customtkinter.CTkLabel(master=self.history_container, text="History", font=customtkinter.CTkFont(weight="bold")); self.history_title_label.grid(row=0, column=0, padx=10, pady=(5, 5), sticky="ew")
             self.history_frame = customtkinter.CTkScrollableFrame(master=self.history_container, fg_color="transparent"); self.history_frame.grid(row=1, column=0, padx=5, pady=(0, 5), sticky="nsew"); self.history_frame.grid_columnconfigure(0, weight=1)
 
@@ -127,10 +172,12 @@ class ChatApp(customtkinter.CTk):
             self.settings_button = widgets["settings_button"]
             self.tts_checkbox = widgets["tts_checkbox"]
             self.speak_input_checkbox = widgets["speak_input_checkbox"]
+            self.replay_speed_label = widgets["replay_speed_label"]
+            self.replay_speed_menu = widgets["replay_speed_menu"]
             self.status_label = widgets["status_label"]
         except ImportError:
             # Fallback: Define main panel widgets directly if ui_components missing
-            print("WARN: ui_components.py not found, defining main panel widgets directly.")
+            logger.warning("ui_components.py not found, defining main panel widgets directly.")
             self.main_content_frame = customtkinter.CTkFrame(master=self.main_content_container, fg_color="transparent"); self.main_content_frame.pack(fill="both", expand=True)
             self.main_content_frame.grid_columnconfigure(0, weight=1); self.main_content_frame.grid_rowconfigure(0, weight=1); self.main_content_frame.grid_rowconfigure(1, weight=3); self.main_content_frame.grid_rowconfigure(2, weight=0); self.main_content_frame.grid_rowconfigure(3, weight=0)
             self.input_textbox = customtkinter.CTkTextbox(self.main_content_frame, height=100); self.input_textbox.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="nsew"); self.input_textbox.insert("0.0", "Enter your text here...")
@@ -143,11 +190,16 @@ class ChatApp(customtkinter.CTk):
             self.settings_button = customtkinter.CTkButton(self.button_frame, text="Settings"); self.settings_button.grid(row=1, column=1, padx=(5,0), pady=(2,2), sticky="ew")
             self.tts_checkbox = customtkinter.CTkCheckBox(self.button_frame, text="Enable Speech Output"); self.tts_checkbox.grid(row=2, column=0, padx=(5,10), pady=(5,5), sticky="w")
             self.speak_input_checkbox = customtkinter.CTkCheckBox(self.button_frame, text="Speak My Input"); self.speak_input_checkbox.grid(row=2, column=1, padx=(10,5), pady=(5,5), sticky="w")
+            self.replay_speed_label = customtkinter.CTkLabel(self.button_frame, text="Replay Speed:", anchor="w"); self.replay_speed_label.grid(row=3, column=0, padx=(5,10), pady=(0,5), sticky="w")
+            self.replay_speed_menu = customtkinter.CTkOptionMenu(self.button_frame, values=list(TTS_SPEEDS.keys())); self.replay_speed_menu.grid(row=3, column=1, padx=(5,0), pady=(0,5), sticky="ew"); self.replay_speed_menu.set("Normal (1.0x)")
             self.status_label = customtkinter.CTkLabel(self.main_content_frame, text="Status: Ready", anchor="w"); self.status_label.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="ew")
 
 
         # --- Assign Commands/Bindings AFTER widgets are created ---
         self.input_textbox.bind("<Control-Return>", self.handle_ctrl_enter)
+        self.bind_all("<Control-Shift-KeyPress-P>", self.handle_profiler_shortcut) # Shift makes the keysym "P"
+        self.bind_all("<Control-Shift-KeyPress-L>", self.handle_lag_report_shortcut)
+        self.bind_all("<Control-Shift-KeyPress-M>", self.handle_compare_shortcut)
         self.submit_button.configure(command=self.start_processing_thread)
         self.stop_button.configure(command=self.stop_playback)
         self.play_history_button.configure(command=self.play_selected_history)
@@ -167,28 +219,49 @@ class ChatApp(customtkinter.CTk):
         else:
             self.speak_input_checkbox.deselect()
 
+    def _build_similarity_index(self):
+        """Indexes answered history prompts (background thread; queries return nothing until done)."""
+        items = [(item[0], tuple(item)) for item in reversed(list(self.history)) if self._is_reusable_history_item(item)]
+        self.similarity_index.build(items)
+    @staticmethod
+    def _is_reusable_history_item(item) -> bool:
+        return isinstance(item, (list, tuple)) and len(item) >= 2 and bool(item[1]) and item[1] != "(Input Spoken - No AI Response)"
+
     def fetch_models_startup(self):
-        """Fetches available chat models once during startup."""
-        print("Attempting to fetch OpenAI models at startup...")
+        """
+        Fetches available chat models once during startup on a background thread,
+        so the network round trip (and the openai import) never delays the first paint.
+        The default list is used until the fetch completes.
+        """
+        logger.info("Attempting to fetch OpenAI models at startup (background)...")
+        current_key = os.getenv("OPENAI_API_KEY")
+        if not current_key:
+            logger.warning("No API key configured, cannot fetch model list at startup. Using default list.")
+            self.available_models = api_handler.DEFAULT_CHAT_MODELS
+            return
+        threading.Thread(target=self._fetch_models_in_background, args=(current_key,), name="ModelFetch", daemon=True).start()
+
+    def _fetch_models_in_background(self, api_key: str):
+        """Worker for fetch_models_startup. Hands the result back to the Tk thread."""
+        fetched_list = None
         try:
-            current_key = os.getenv("OPENAI_API_KEY")
-            if current_key:
+            with profiler.phase("ChatApp.fetch_models"):
                 # Create temporary client instance JUST for listing models
-                # Consider making self.client an instance variable initialized here if key exists
-                temp_client = OpenAI(api_key=current_key)
+                temp_client = api_handler.create_client(api_key)
                 fetched_list = api_handler.get_available_chat_models(temp_client)
-                if fetched_list:
-                    self.available_models = fetched_list # Store fetched list
-                    print(f"Successfully fetched models: {len(self.available_models)} found.")
-                else:
-                     print("WARN: Fetched model list was empty, using default list.")
-                     self.available_models = api_handler.DEFAULT_CHAT_MODELS
-            else:
-                print("WARN: No API key configured, cannot fetch model list at startup. Using default list.")
-                self.available_models = api_handler.DEFAULT_CHAT_MODELS
         except Exception as e:
-             print(f"ERROR fetching model list during startup: {e}. Using default list.")
-             self.available_models = api_handler.DEFAULT_CHAT_MODELS
+            logger.error("Error fetching model list during startup: %s. Using default list.", e)
+        if self._is_shutting_down.is_set(): return
+        self.engine.post_to_ui(self._set_available_models, fetched_list)
+
+    def _set_available_models(self, fetched_list):
+        """Stores the fetched model list (runs on the Tk thread)."""
+        if fetched_list:
+            self.available_models = fetched_list # Store fetched list
+            logger.info("Successfully fetched models: %s found.", len(self.available_models))
+        else:
+            logger.warning("Fetched model list was empty, using default list.")
+            self.available_models = api_handler.DEFAULT_CHAT_MODELS
 
 
     # --- Settings and Loading Methods ---
@@ -196,30 +269,36 @@ class ChatApp(customtkinter.CTk):
     def load_user_settings(self):
         # (Keep implementation from previous step - loads key, mode, model, voice)
         # ... no changes needed here ...
-        self.current_api_key_display = ""; loaded_mode = "System"; loaded_chat_model = config.DEFAULT_CHAT_MODEL; loaded_tts_voice = config.DEFAULT_TTS_VOICE; loaded_tts_speed = config.DEFAULT_TTS_SPEED; key_loaded_from_settings = False; settings_file_path = self.user_settings_file
+        self.current_api_key_display = ""; loaded_mode = "System"; loaded_chat_model = config.DEFAULT_CHAT_MODEL; loaded_tts_voice = config.DEFAULT_TTS_VOICE; loaded_tts_speed = config.DEFAULT_TTS_SPEED; loaded_audio_backfill = config.AUDIO_BACKFILL_ENABLED; loaded_speculative_prefetch = config.SPECULATIVE_PREFETCH; loaded_buffer_calibration = {}; key_loaded_from_settings = False; settings_file_path = self.user_settings_file
         if settings_file_path.exists():
-            print(f"DEBUG: Found settings file: {settings_file_path}")
+            logger.debug("Found settings file: %s", settings_file_path)
             try:
                 with open(settings_file_path, "r", encoding="utf-8") as f: settings_data = json.load(f)
-                print(f"DEBUG: Loaded settings data: {settings_data}")
+                logger.debug("Loaded settings keys: %s", sorted(settings_data))
                 loaded_key = settings_data.get("openai_api_key");
-                if loaded_key and isinstance(loaded_key, str) and loaded_key.startswith("sk-"): os.environ['OPENAI_API_KEY'] = loaded_key; self.current_api_key_display = loaded_key; key_loaded_from_settings = True; print("DEBUG: Loaded API key from settings.")
+                if loaded_key and isinstance(loaded_key, str) and loaded_key.startswith("sk-"): os.environ['OPENAI_API_KEY'] = loaded_key; self.current_api_key_display = loaded_key; key_loaded_from_settings = True; logger.debug("Loaded API key from settings.")
                 loaded_mode_setting = settings_data.get("appearance_mode");
-                if loaded_mode_setting in ["Light", "Dark", "System"]: loaded_mode = loaded_mode_setting; print(f"DEBUG: Loaded appearance mode preference: '{loaded_mode}'")
+                if loaded_mode_setting in ["Light", "Dark", "System"]: loaded_mode = loaded_mode_setting; logger.debug("Loaded appearance mode preference: '%s'", loaded_mode)
                 loaded_model_setting = settings_data.get("chat_model");
-                if loaded_model_setting and isinstance(loaded_model_setting, str): loaded_chat_model = loaded_model_setting; print(f"DEBUG: Loaded chat model preference: '{loaded_chat_model}'")
+                if loaded_model_setting and isinstance(loaded_model_setting, str): loaded_chat_model = loaded_model_setting; logger.debug("Loaded chat model preference: '%s'", loaded_chat_model)
                 loaded_voice_setting = settings_data.get("tts_voice");
-                if loaded_voice_setting and loaded_voice_setting in TTS_VOICES: loaded_tts_voice = loaded_voice_setting; print(f"DEBUG: Loaded tts voice preference: '{loaded_tts_voice}'")
+                if loaded_voice_setting and loaded_voice_setting in TTS_VOICES: loaded_tts_voice = loaded_voice_setting; logger.debug("Loaded tts voice preference: '%s'", loaded_tts_voice)
                 loaded_speed_setting = settings_data.get("tts_speed");
-                if isinstance(loaded_speed_setting, (float, int)) and 0.25 <= loaded_speed_setting <= 4.0: loaded_tts_speed = float(loaded_speed_setting); print(f"DEBUG: Loaded tts speed preference: {loaded_tts_speed}")
-            except Exception as e: print(f"Error loading user settings file {settings_file_path}: {e}"); loaded_mode = "System"; loaded_chat_model = config.DEFAULT_CHAT_MODEL; loaded_tts_voice = config.DEFAULT_TTS_VOICE; loaded_tts_speed = config.DEFAULT_TTS_SPEED
-        else: print(f"DEBUG: Settings file not found: {settings_file_path}")
+                if isinstance(loaded_speed_setting, (float, int)) and 0.25 <= loaded_speed_setting <= 4.0: loaded_tts_speed = float(loaded_speed_setting); logger.debug("Loaded tts speed preference: %s", loaded_tts_speed)
+                loaded_backfill_setting = settings_data.get("audio_backfill")
+                if isinstance(loaded_backfill_setting, bool): loaded_audio_backfill = loaded_backfill_setting
+                loaded_speculative_setting = settings_data.get("speculative_prefetch")
+                if isinstance(loaded_speculative_setting, bool): loaded_speculative_prefetch = loaded_speculative_setting
+                loaded_calibration_setting = settings_data.get("audio_buffer_calibration")
+                if isinstance(loaded_calibration_setting, dict): loaded_buffer_calibration = {str(device): buffer for device, buffer in loaded_calibration_setting.items() if isinstance(buffer, int) and buffer > 0}
+            except Exception as e: logger.error("Error loading user settings file %s: %s", settings_file_path, e); loaded_mode = "System"; loaded_chat_model = config.DEFAULT_CHAT_MODEL; loaded_tts_voice = config.DEFAULT_TTS_VOICE; loaded_tts_speed = config.DEFAULT_TTS_SPEED
+        else: logger.debug("Settings file not found: %s", settings_file_path)
         if not key_loaded_from_settings:
              env_key = os.getenv('OPENAI_API_KEY');
-             if env_key: self.current_api_key_display = env_key; print("DEBUG: Using API key from environment.")
-             else: print("WARN: OpenAI API key not found anywhere."); self.current_api_key_display = ""
-        self.current_appearance_mode = loaded_mode; self.current_chat_model = loaded_chat_model; self.current_tts_voice = loaded_tts_voice; self.current_tts_speed = loaded_tts_speed
-        print(f"DEBUG: Startup mode: {self.current_appearance_mode}, model: {self.current_chat_model}, voice: {self.current_tts_voice}, speed: {self.current_tts_speed}")
+             if env_key: self.current_api_key_display = env_key; logger.debug("Using API key from environment.")
+             else: logger.warning("OpenAI API key not found anywhere."); self.current_api_key_display = ""
+        self.current_appearance_mode = loaded_mode; self.current_chat_model = loaded_chat_model; self.current_tts_voice = loaded_tts_voice; self.current_tts_speed = loaded_tts_speed; self.audio_backfill_enabled = loaded_audio_backfill; self.speculative_prefetch_enabled = loaded_speculative_prefetch; self.audio_buffer_calibration = loaded_buffer_calibration
+        logger.debug("Startup mode: %s, model: %s, voice: %s, speed: %s", self.current_appearance_mode, self.current_chat_model, self.current_tts_voice, self.current_tts_speed)
 
 
     def open_settings_window(self):
@@ -227,34 +306,74 @@ class ChatApp(customtkinter.CTk):
         if self.settings_window is not None and self.settings_window.winfo_exists():
             self.settings_window.focus()
         else:
+            from settings_window import SettingsWindow # Imported on first use to keep startup lean
             # Pass the stored model list to the SettingsWindow constructor
             self.settings_window = SettingsWindow(
                 master_app=self,
                 model_list=self.available_models # Pass the fetched list
             )
 
+    def open_compare_window(self):
+        """Opens the model comparison window for the current input text."""
+        if self.compare_window is not None and self.compare_window.winfo_exists():
+            self.compare_window.focus(); return
+        from compare_window import CompareWindow # Imported on first use to keep startup lean
+        self.text_loader.materialize(self.input_textbox)
+        prompt = self.input_textbox.get("0.0", "end-1c").strip()
+        if prompt == "Enter your text here...": prompt = ""
+        self.compare_window = CompareWindow(self, prompt, self.available_models)
+    async def _add_history_entry(self, prompt: str, response: str, timestamp: str | None = None):
+        """Inserts a history entry on the engine loop, the only thread that mutates self.history (request task, audio backfill)."""
+        self.history.insert(0, (prompt, response, timestamp)); self.engine.post_to_ui(self.update_history_display)
+        if config.SIMILAR_PROMPT_SUGGESTIONS: self.similarity_index.add(prompt, (prompt, response, timestamp))
+    def compare_window_closed(self): logger.debug("Main app notified that compare window closed."); self.compare_window = None
+    def keep_compared_answer(self, prompt: str, response: str, model: str):
+        """Adds an answer picked in the compare window to history (text only) and shows it."""
+        if self._is_shutting_down.is_set(): return
+        logger.info("Keeping compared answer from %s.", model)
+        self.engine.submit(self._add_history_entry(prompt, response), name="KeepComparedAnswer") # History is mutated on the engine thread only
+        if self.prompt_autocomplete is not None: self.prompt_autocomplete.record(prompt)
+        if not self._request_in_progress(): self.load_history_item(prompt, response, None); self.update_status(f"Kept answer from {model} (no audio recorded).")
+
     # --- Callback methods for SettingsWindow ---
     # (Keep update_and_save_settings, apply_app_theme, settings_window_closed)
     # ... Methods from previous step ...
-    def update_and_save_settings(self, api_key, appearance_mode, chat_model, tts_voice, tts_speed) -> bool:
-        print(f"DEBUG: Main app received settings: mode={appearance_mode}, model={chat_model}, voice={tts_voice}, speed={tts_speed}")
+    def update_and_save_settings(self, api_key, appearance_mode, chat_model, tts_voice, tts_speed, audio_backfill: bool | None = None, speculative_prefetch: bool | None = None) -> bool:
+        logger.debug("Main app received settings: mode=%s, model=%s, voice=%s, speed=%s", appearance_mode, chat_model, tts_voice, tts_speed)
         self.current_appearance_mode = appearance_mode; self.current_chat_model = chat_model; self.current_tts_voice = tts_voice; self.current_tts_speed = tts_speed
         key_warning = "";
         if api_key and not api_key.startswith("sk-"): key_warning = "Warning: Key might be invalid. "
-        settings_data = {"appearance_mode": self.current_appearance_mode, "chat_model": self.current_chat_model, "tts_voice": self.current_tts_voice, "tts_speed": self.current_tts_speed}
+        if audio_backfill is not None and audio_backfill != self.audio_backfill_enabled:
+            self.audio_backfill_enabled = audio_backfill
+            if audio_backfill: self.audio_backfill.start()
+            else: self.audio_backfill.stop()
+        if speculative_prefetch is not None: self.speculative_prefetch_enabled = speculative_prefetch; self.speculative_prefetch.set_enabled(speculative_prefetch)
+        settings_data = {"appearance_mode": self.current_appearance_mode, "chat_model": self.current_chat_model, "tts_voice": self.current_tts_voice, "tts_speed": self.current_tts_speed, "audio_backfill": self.audio_backfill_enabled, "speculative_prefetch": self.speculative_prefetch_enabled, "audio_buffer_calibration": self.audio_buffer_calibration}
         if api_key: settings_data["openai_api_key"] = api_key
         try:
             self.user_settings_file.parent.mkdir(parents=True, exist_ok=True)
             with open(self.user_settings_file, "w", encoding="utf-8") as f: json.dump(settings_data, f, indent=4)
             key_saved_message = ""
-            if api_key and api_key.startswith("sk-"): os.environ['OPENAI_API_KEY'] = api_key; self.current_api_key_display = api_key; key_saved_message = "API Key Saved. "; print("Saved new API key.")
+            if api_key and api_key.startswith("sk-"): os.environ['OPENAI_API_KEY'] = api_key; self.current_api_key_display = api_key; key_saved_message = "API Key Saved. "; logger.info("Saved new API key.")
             elif not api_key: self.current_api_key_display = "";
-            if 'OPENAI_API_KEY' in os.environ and not api_key: del os.environ['OPENAI_API_KEY']; key_saved_message = "API Key Cleared. "; print("API key cleared in settings & os.environ.")
-            print(f"Saved settings: mode='{self.current_appearance_mode}', model='{self.current_chat_model}', voice='{self.current_tts_voice}', speed={self.current_tts_speed}")
+            if 'OPENAI_API_KEY' in os.environ and not api_key: del os.environ['OPENAI_API_KEY']; key_saved_message = "API Key Cleared. "; logger.info("API key cleared in settings & os.environ.")
+            logger.info("Saved settings: mode='%s', model='%s', voice='%s', speed=%s", self.current_appearance_mode, self.current_chat_model, self.current_tts_voice, self.current_tts_speed)
             return True
-        except Exception as e: print(f"Error saving user settings from main app: {e}"); return False
-    def apply_app_theme(self, mode): print(f"DEBUG: Main app applying theme: {mode}"); self.current_appearance_mode = mode; theme_manager.apply_theme(self, mode)
-    def settings_window_closed(self): print("DEBUG: Main app notified that settings window closed."); self.settings_window = None
+        except Exception as e: logger.error("Error saving user settings from main app: %s", e); return False
+    def _save_audio_calibration(self, calibration: dict):
+        """Stores a new mixer buffer calibration in user_settings.json, keeping the other settings (posted from the audio init thread)."""
+        self.audio_buffer_calibration = dict(calibration)
+        try:
+            settings_data = {}
+            if self.user_settings_file.exists():
+                with open(self.user_settings_file, "r", encoding="utf-8") as f: settings_data = json.load(f)
+            settings_data["audio_buffer_calibration"] = self.audio_buffer_calibration
+            self.user_settings_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.user_settings_file, "w", encoding="utf-8") as f: json.dump(settings_data, f, indent=4)
+            logger.debug("Saved audio buffer calibration for %s output devices.", len(calibration))
+        except (OSError, ValueError) as e: logger.error("Error saving audio buffer calibration: %s", e)
+    def apply_app_theme(self, mode): logger.debug("Main app applying theme: %s", mode); self.current_appearance_mode = mode; theme_manager.apply_theme(self, mode)
+    def settings_window_closed(self): logger.debug("Main app notified that settings window closed."); self.settings_window = None
 
 
     # --- UI Update & Control Methods ---
@@ -262,11 +381,48 @@ class ChatApp(customtkinter.CTk):
     # (Keep update_status, update_output_textbox, set_ui_state, set_stop_button_state)
     # (Keep _safe_ui_update helper method)
     # ... Methods from previous versions ...
-    def toggle_tts(self): self.tts_enabled = bool(self.tts_checkbox.get()); print(f"TTS: {self.tts_enabled}")
-    def toggle_speak_input(self): self.speak_input_enabled = bool(self.speak_input_checkbox.get()); print(f"SpeakInput: {self.speak_input_enabled}")
-    def handle_ctrl_enter(self, event): print("Ctrl+Enter"); self.start_processing_thread(); return "break"
+    def toggle_tts(self): self.tts_enabled = bool(self.tts_checkbox.get()); logger.debug("TTS: %s", self.tts_enabled)
+    def toggle_speak_input(self): self.speak_input_enabled = bool(self.speak_input_checkbox.get()); logger.debug("SpeakInput: %s", self.speak_input_enabled)
+    def handle_ctrl_enter(self, event): logger.debug("Ctrl+Enter"); self.start_processing_thread(); return "break"
+    def handle_profiler_shortcut(self, event): self.toggle_sampling_profiler(); return "break"
+    def handle_compare_shortcut(self, event): self.open_compare_window(); return "break"
+
+    def handle_lag_report_shortcut(self, event):
+        """Logs the event-loop lag histogram and exports it with the recorded stalls."""
+        logger.info("Event-loop lag: %s", self.lag_watchdog.summary())
+        output_file = self.lag_watchdog.export()
+        if output_file: self.update_status(f"Lag report saved: {output_file.name}")
+        return "break"
+
+    def toggle_sampling_profiler(self) -> bool:
+        """Starts a sampling-profiler capture, or ends the running one early. Returns True if now running."""
+        if self.sampling_profiler.is_running():
+            self.sampling_profiler.stop()
+            self.update_status("Finishing profile...")
+            return False
+        self.sampling_profiler.start(on_finished=self._on_profile_written)
+        self.update_status(f"Profiling all threads for {config.PROFILER_DURATION_S:.0f}s (Ctrl+Shift+P to stop)...")
+        return True
+
+    def _on_profile_written(self, output_path):
+        # Runs on the sampler thread
+        if self._is_shutting_down.is_set(): return
+        message = f"Profile saved: {output_path.name}" if output_path else "Profile capture failed (see log)"
+        self.engine.post_to_ui(self._profile_finished_ui, message)
+
+    def _profile_finished_ui(self, message):
+        self.update_status(message)
+        if self.settings_window is not None and self.settings_window.winfo_exists():
+            self.settings_window.profiler_switch.deselect()
     def update_status(self, message): self._safe_ui_update(self.status_label, configure_options={"text": f"Status: {message}"})
-    def update_output_textbox(self, text): self._safe_ui_update(self.output_textbox, configure_options={"state": "normal"}, insert_text=text, final_configure_options={"state": "disabled"})
+    def update_output_textbox(self, text): self._set_textbox_text("output_textbox", text)
+    def _set_textbox_text(self, widget_name, text):
+        """Replaces a textbox's contents via the chunked loader (safe to call from any thread)."""
+        if threading.current_thread() is not threading.main_thread(): self.engine.post_to_ui(self._set_textbox_text, widget_name, text); return
+        if self._is_shutting_down.is_set(): return
+        widget = getattr(self, widget_name, None)
+        if widget is not None and widget.winfo_exists(): self.text_loader.set_text(widget, text)
+        else: logger.debug("Widget '%s' no longer exists, skipping update.", widget_name)
     def set_ui_state(self, processing: bool): submit_state = "disabled" if processing else "normal"; input_state = "disabled" if processing else "normal"; self._safe_ui_update(self.submit_button, configure_options={"state": submit_state}); self._safe_ui_update(self.input_textbox, configure_options={"state": input_state})
     def set_stop_button_state(self, enabled: bool): state = "normal" if enabled else "disabled"; self._safe_ui_update(self.stop_button, configure_options={"state": state})
     def _safe_ui_update(self, widget, configure_options={}, insert_text=None, final_configure_options=None):
@@ -277,11 +433,11 @@ class ChatApp(customtkinter.CTk):
                 if configure_options: widget_ref.configure(**configure_options)
                 if insert_text is not None: widget_ref.delete("0.0", "end"); widget_ref.insert("0.0", insert_text or "")
                 if final_configure_options: widget_ref.configure(**final_configure_options)
-            else: print(f"DEBUG: Widget '{widget_name}' no longer exists, skipping update.")
+            else: logger.debug("Widget '%s' no longer exists, skipping update.", widget_name)
         widget_name = "UnknownWidget";
         for name, value in self.__dict__.items():
              if value is widget: widget_name = name; break
-        if threading.current_thread() is not threading.main_thread(): self.after(0, _update)
+        if threading.current_thread() is not threading.main_thread(): self.engine.post_to_ui(_update)
         else: _update()
 
 
@@ -289,32 +445,50 @@ class ChatApp(customtkinter.CTk):
     # (Keep update_history_display, load_history_item)
     # ... Methods from previous versions ...
     def update_history_display(self):
+        """Shows self.history in the history panel, reusing existing row buttons instead of recreating them."""
         if self._is_shutting_down.is_set(): return
         if not hasattr(self, 'history_frame') or not self.history_frame.winfo_exists(): return
-        for widget in self.history_frame.winfo_children(): widget.destroy()
         if not isinstance(self.history, list): self.history = []
+        row = 0
         for i, item in enumerate(self.history):
              if isinstance(item, (list, tuple)) and len(item) >= 2:
                  prompt, response = item[0], item[1]; timestamp = item[2] if len(item) > 2 else None
                  display_prompt = (prompt[:35] + '...') if len(prompt) > 38 else prompt
-                 history_button = customtkinter.CTkButton(self.history_frame, text=display_prompt.replace("\n", " "), anchor="w", command=lambda p=prompt, r=response, ts=timestamp: self.load_history_item(p, r, ts))
-                 history_button.grid(row=i, column=0, padx=5, pady=3, sticky="ew")
-             else: print(f"Warning: Skipping invalid history item at index {i}: {item}")
+                 row_text = display_prompt.replace("\n", " "); row_command = lambda p=prompt, r=response, ts=timestamp: self.load_history_item(p, r, ts)
+                 if row < len(self.history_buttons):
+                     history_button = self.history_buttons[row]; history_button.configure(text=row_text, command=row_command)
+                 else:
+                     history_button = customtkinter.CTkButton(self.history_frame, text=row_text, anchor="w", command=row_command)
+                     self.history_buttons.append(history_button); theme_manager.register_widget(self, history_button, "history_button")
+                 history_button.grid(row=row, column=0, padx=5, pady=3, sticky="ew"); row += 1
+             else: logger.warning("Skipping invalid history item at index %s: %s", i, item)
+        for spare_button in self.history_buttons[row:]: spare_button.grid_remove() # Hide unused rows, keep them for reuse
     def load_history_item(self, prompt, response, timestamp):
         if self._is_shutting_down.is_set(): return
-        if self.processing_thread and self.processing_thread.is_alive(): self.update_status("Error: Cannot load history while processing."); return
-        if hasattr(self, 'input_textbox') and self.input_textbox.winfo_exists(): self.input_textbox.configure(state="normal"); self.input_textbox.delete("0.0", "end"); self.input_textbox.insert("0.0", prompt)
+        if self._request_in_progress(): self.update_status("Error: Cannot load history while processing."); return
+        if hasattr(self, 'input_textbox') and self.input_textbox.winfo_exists(): self.input_textbox.configure(state="normal"); self._set_textbox_text("input_textbox", prompt); self.speculative_prefetch.discard()
         self.update_output_textbox(response)
         self.selected_history_timestamp = None; play_button_state = "disabled"; status_msg = "Loaded item. "
         if timestamp:
-            audio_path = config.RESPONSES_DIR / f"response_{timestamp}.mp3"
-            if audio_path.exists(): self.selected_history_timestamp = timestamp; play_button_state = "normal"; status_msg += "Audio available."
+            if self._has_response_audio(timestamp): self.selected_history_timestamp = timestamp; play_button_state = "normal"; status_msg += "Audio available."
             else: status_msg += "Audio file missing."
         else: status_msg += "No audio recorded for this entry."
         self.update_status(status_msg)
         if hasattr(self, 'play_history_button') and self.play_history_button.winfo_exists(): self.play_history_button.configure(state=play_button_state)
 
 
+    def reuse_history_answer(self, item):
+        """Shows a past answer for the current prompt and replays its audio (if recorded and speech is on)."""
+        if self._is_shutting_down.is_set(): return
+        response = item[1]; timestamp = item[2] if len(item) > 2 else None
+        self.update_output_textbox(response)
+        has_audio = self._has_response_audio(timestamp)
+        self.selected_history_timestamp = timestamp if has_audio else None
+        if hasattr(self, 'play_history_button') and self.play_history_button.winfo_exists(): self.play_history_button.configure(state="normal" if has_audio else "disabled")
+        if has_audio and self.tts_enabled: self.play_selected_history()
+        else: self.update_status("Reused past answer." + ("" if has_audio else " No audio recorded for it."))
+
+
     # --- Playback Methods ---
     # (Keep play_selected_history, _start_playback_thread, _execute_playback_and_reenable)
     # (Keep _play_audio_blocking using Pygame Sound + delay)
@@ -323,157 +497,322 @@ class ChatApp(customtkinter.CTk):
     def play_selected_history(self):
         if self._is_shutting_down.is_set(): return
         if not self.selected_history_timestamp: self.update_status("Error: No history item with audio selected."); return
-        if self.processing_thread and self.processing_thread.is_alive(): self.update_status("Error: Cannot play history while processing."); return
-        if self.is_playing: self.update_status("Error: Already playing audio."); return
-        audio_path = config.RESPONSES_DIR / f"response_{self.selected_history_timestamp}.mp3"
-        if not audio_path.exists(): self.update_status(f"Error: Audio file not found: {audio_path.name}"); self._safe_ui_update(self.play_history_button, {"state": "disabled"}); self.selected_history_timestamp = None; return
-        self._safe_ui_update(self.play_history_button, {"state": "disabled"}); self._start_playback_thread(str(audio_path), "Playing history audio...")
-    def _start_playback_thread(self, audio_path_str: str, status_playing: str):
+        if self._request_in_progress(): self.update_status("Error: Cannot play history while processing."); return
+        if self.is_playing or (self.playback_task is not None and not self.playback_task.done()): self.update_status("Error: Already playing audio."); return
+        packed = self.audio_store is not None and self.audio_store.contains(self.selected_history_timestamp)
+        audio_path = None if packed else find_response_audio(config.RESPONSES_DIR, self.selected_history_timestamp)
+        if not packed and audio_path is None: self.update_status(f"Error: Audio file not found for {self.selected_history_timestamp}"); self._safe_ui_update(self.play_history_button, {"state": "disabled"}); self.selected_history_timestamp = None; return
+        replay_speed = TTS_SPEEDS.get(self.replay_speed_menu.get(), 1.0) # Applied locally, no new TTS call
+        status_playing = "Playing history audio..." if replay_speed == 1.0 else f"Playing history audio at {replay_speed}x..."
+        self._safe_ui_update(self.play_history_button, {"state": "disabled"}); self._start_playback_task(str(audio_path) if audio_path else None, status_playing, replay_speed, packed_timestamp=self.selected_history_timestamp if packed else None)
+    def _start_playback_task(self, audio_path_str: str | None, status_playing: str, speed: float = 1.0, packed_timestamp: str | None = None):
         if self._is_shutting_down.is_set(): return
-        if not self.player.initialized: self.update_status("Error: Audio player not initialized."); self._safe_reenable_play_history_button_after_thread(); return
-        playback_thread = threading.Thread(target=self._execute_playback_and_reenable, args=(audio_path_str, status_playing), daemon=True); playback_thread.start()
-    def _execute_playback_and_reenable(self, audio_path_str: str, status_playing: str):
-        playback_completed_naturally = False
+        self.playback_task = self.engine.submit(self._play_and_reenable(audio_path_str, status_playing, speed, packed_timestamp), name="Playback")
+    async def _play_and_reenable(self, audio_path_str: str | None, status_playing: str, speed: float = 1.0, packed_timestamp: str | None = None):
         try:
             if self._is_shutting_down.is_set(): return
-            playback_completed_naturally = self._play_audio_blocking(audio_path_str, status_playing)
-            if self._is_shutting_down.is_set(): return
-        finally: self.after(0, self._safe_reenable_play_history_button_after_thread)
-        current_status = "";
-        if hasattr(self, 'status_label') and self.status_label.winfo_exists(): current_status = self.status_label.cget("text")
+            if packed_timestamp is not None:
+                audio_data = await asyncio.to_thread(self.audio_store.read, packed_timestamp) # Slice of the segment's mmap
+                if audio_data is None: self.update_status(f"Error: Audio not readable for {packed_timestamp}"); return
+                await self._play_audio(f"segment:{packed_timestamp}", status_playing, speed=speed, audio_data=audio_data)
+            else: await self._play_audio(audio_path_str, status_playing, speed=speed)
+        finally: self.engine.post_to_ui(self._after_history_playback)
+    def _after_history_playback(self):
+        self._safe_reenable_play_history_button()
+        if self._is_shutting_down.is_set() or not hasattr(self, 'status_label') or not self.status_label.winfo_exists(): return
+        current_status = self.status_label.cget("text")
         if "Error" not in current_status and "stopped" not in current_status and "finished" not in current_status: self.after(100, lambda: self.update_status("Ready"))
-    def _safe_reenable_play_history_button_after_thread(self):
+    def _has_response_audio(self, timestamp: str | None) -> bool:
+        """O(1) index lookup in the packed store, falling back to loose files not yet packed."""
+        if not timestamp: return False
+        if self.audio_store is not None and self.audio_store.contains(timestamp): return True
+        return find_response_audio(config.RESPONSES_DIR, timestamp) is not None
+    def _safe_reenable_play_history_button(self):
         if self._is_shutting_down.is_set(): return
         if not hasattr(self, 'play_history_button') or not self.play_history_button.winfo_exists(): return
         current_selected_ts = self.selected_history_timestamp; new_state = "disabled"
-        if current_selected_ts and (config.RESPONSES_DIR / f"response_{current_selected_ts}.mp3").exists(): new_state = "normal"
+        if self._has_response_audio(current_selected_ts): new_state = "normal"
         self.play_history_button.configure(state=new_state)
-    def _play_audio_blocking(self, audio_path_str: str, status_playing: str = "Playing audio...") -> bool:
-        # (Keep implementation using Pygame Sound + delay)
-        print(f"DEBUG: _play_audio_blocking started for path: {audio_path_str}");
+    async def _play_audio(self, audio_path_str: str, status_playing: str = "Playing audio...", pcm_data: bytes | None = None, speed: float = 1.0, audio_data: bytes | None = None, pcm_chunks=None) -> bool:
+        """
+        Plays a clip on the engine loop; returns True if it finished naturally. Decoding runs on the blocking pool.
+        pcm_chunks (async iterator of PCM) are queued gaplessly behind pcm_data as they arrive (chunked TTS).
+        """
+        logger.debug("_play_audio started for path: %s", audio_path_str);
         if self._is_shutting_down.is_set(): return False
-        if not audio_path_str or not self.player.initialized: return False
-        natural_finish = False
+        if not audio_path_str: return False
+        if not self.player.initialized:
+            # Mixer is initialized in the background after the window appears; wait for it briefly
+            self.update_status("Waiting for audio device...")
+            try: audio_ready = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.player.ready)), config.AUDIO_READY_TIMEOUT_S)
+            except asyncio.TimeoutError: audio_ready = False
+            if not audio_ready:
+                logger.debug("_play_audio: audio not ready, skipping playback.")
+                self.update_status("Audio unavailable (clip saved, retrying audio in background).")
+                return False
+        natural_finish = False; feeder = None
         try:
             if self._is_shutting_down.is_set(): return False
-            self.after(0, lambda: self.update_status("Loading audio..."))
-            playback_started = self.player.play_sound(audio_path_str) # Assumes this loads + plays + includes delay
+            self.update_status("Loading audio...")
+            if pcm_data is not None: playback_started = await asyncio.to_thread(self.player.play_pcm, pcm_data, sound_id=audio_path_str if pcm_chunks is None else None) # Raw samples straight from memory; a first chunk is not the whole clip, so it is not cached
+            elif audio_data is not None: playback_started = await asyncio.to_thread(self.player.play_encoded, audio_data, audio_path_str, speed=speed) # Encoded clip from memory (packed store)
+            else: playback_started = await asyncio.to_thread(self.player.play_sound, audio_path_str, speed=speed) # Loads (or time-stretches) + plays
             if not playback_started: raise RuntimeError(f"AudioPlayer failed to start playback for {audio_path_str}")
             if self._is_shutting_down.is_set(): self.player.stop(); return False
             self.is_playing = True; self.set_stop_button_state(enabled=True); self.update_status(status_playing)
-            print(f"DEBUG: _play_audio_blocking: Playback started. Entering wait loop.")
-            while self.player.is_busy() and self.is_playing:
-                if self._is_shutting_down.is_set(): print("DEBUG: Shutdown detected during playback loop."); self.player.stop(); self.is_playing = False; break
-                time.sleep(0.1)
-            print(f"DEBUG: _play_audio_blocking: Exited wait loop. is_playing={self.is_playing}")
-            if self.is_playing: print("DEBUG: Playback finished naturally."); self.update_status("Playback finished."); self.is_playing = False; natural_finish = True
-        except Exception as e: print(f"DEBUG: _play_audio_blocking - Error during playback section: {e}"); self.update_status(f"Error during playback: {e}"); self.is_playing = False; self.player.stop()
-        finally: print("DEBUG: _play_audio_blocking: finally block."); self.player.stop(); self.set_stop_button_state(enabled=False)
-        print(f"DEBUG: _play_audio_blocking finished. Returning: {natural_finish}")
+            logger.debug("_play_audio: Playback started. Entering wait loop.")
+            if pcm_chunks is not None: feeder = asyncio.create_task(self._feed_pcm_chunks(pcm_chunks))
+            while (self.player.is_busy() or (feeder is not None and not feeder.done())) and self.is_playing: # A later chunk may still be synthesizing
+                if self._is_shutting_down.is_set(): logger.debug("Shutdown detected during playback loop."); self.player.stop(); self.is_playing = False; break
+                await asyncio.sleep(0.1)
+            logger.debug("_play_audio: Exited wait loop. is_playing=%s", self.is_playing)
+            if feeder is not None and feeder.done() and not feeder.cancelled() and feeder.exception() is not None: raise feeder.exception()
+            if self.is_playing: logger.debug("Playback finished naturally."); self.update_status("Playback finished."); self.is_playing = False; natural_finish = True
+        except asyncio.CancelledError: self.is_playing = False; raise
+        except Exception as e: logger.error("_play_audio - Error during playback section: %s", e); self.update_status(f"Error during playback: {e}"); self.is_playing = False; self.player.stop()
+        finally:
+            logger.debug("_play_audio: finally block.")
+            if feeder is not None: feeder.cancel()
+            self.player.stop(); self.set_stop_button_state(enabled=False)
+        logger.debug("_play_audio finished. Returning: %s", natural_finish)
         return natural_finish
+    async def _feed_pcm_chunks(self, pcm_chunks):
+        """Queues each further chunk behind the one playing as soon as it is synthesized (the channel holds one queued clip)."""
+        async for chunk_pcm in pcm_chunks:
+            while self.is_playing and not await asyncio.to_thread(self.player.queue_pcm, chunk_pcm):
+                await asyncio.sleep(0.05)
+            if not self.is_playing: return
     def stop_playback(self):
         # (Keep implementation using Pygame Sound player stop)
-        if self.is_playing: print("Stop playback requested."); self.is_playing = False; self.player.stop(); self.update_status("Playback stopped."); self.set_stop_button_state(enabled=False)
-        else: print("DEBUG: Stop requested but not currently playing.")
+        if self.is_playing: logger.info("Stop playback requested."); self.is_playing = False; self.player.stop(); self.update_status("Playback stopped."); self.set_stop_button_state(enabled=False)
+        else: logger.debug("Stop requested but not currently playing.")
 
 
-    # --- Core Logic and Threading ---
+    # --- Core Logic (runs on the async engine) ---
 
     def start_processing_thread(self):
         # (Keep implementation)
         if self._is_shutting_down.is_set(): return
+        self.text_loader.materialize(self.input_textbox) # A long history prompt may still be loading
         user_prompt = self.input_textbox.get("0.0", "end-1c").strip()
         if not user_prompt or user_prompt == "Enter your text here...": self.update_status("Error: Please enter some text."); return
-        if self.processing_thread and self.processing_thread.is_alive(): self.update_status("Error: Processing already in progress."); return
+        if self._request_in_progress(): self.update_status("Error: Processing already in progress."); return
+        if config.SIMILAR_PROMPT_SUGGESTIONS and not self.speak_input_enabled:
+            matches = self.similarity_index.query(user_prompt, k=config.SIMILAR_PROMPT_MAX_SUGGESTIONS, min_score=config.SIMILAR_PROMPT_MIN_SCORE)
+            if matches:
+                from similar_answers_window import SimilarAnswersWindow # Imported on first use to keep startup lean
+                logger.debug("Found %s similar past prompts (best %.2f).", len(matches), matches[0][0])
+                SimilarAnswersWindow(self, user_prompt, matches, on_reuse=self.reuse_history_answer, on_ask=self._launch_request); return
+        self._launch_request(user_prompt)
+
+    def _launch_request(self, user_prompt):
+        if self._is_shutting_down.is_set(): return
+        if self._request_in_progress(): self.update_status("Error: Processing already in progress."); return
+        if self.prompt_autocomplete is not None: self.prompt_autocomplete.hide(); self.prompt_autocomplete.record(user_prompt)
+        if self.speak_input_enabled: speculation = None; self.speculative_prefetch.discard()
+        else: speculation = self.speculative_prefetch.claim(user_prompt, self.resolve_chat_model()) # Answer already requested while typing paused
         self.set_ui_state(processing=True); self.update_status("Processing..."); self.update_output_textbox("")
-        self.processing_thread = threading.Thread(target=self.process_request_in_background, args=(user_prompt,), daemon=True); self.processing_thread.start()
-
-    def process_request_in_background(self, prompt):
-        """Handles background processing logic, using the selected chat model and TTS voice/speed."""
-        # (Keep implementation from previous step, ensuring it passes self.current_tts_voice AND self.current_tts_speed to generate_speech)
+        self.current_request = self.engine.submit(self._process_request(user_prompt, speculation), name="ChatRequest")
+
+    def _request_in_progress(self) -> bool:
+        return self.current_request is not None and not self.current_request.done()
+
+    def _get_async_client(self):
+        """The shared AsyncOpenAI client, recreated when the API key changes (e.g. via Settings)."""
+        api_key = os.getenv('OPENAI_API_KEY')
+        if self._async_client is None or self._async_client_key != api_key:
+            self._async_client = api_handler.create_async_client(); self._async_client_key = api_key
+        return self._async_client
+
+    @staticmethod
+    async def _with_timeout(coro, timeout_s: float, what: str):
+        """Awaits coro, turning a timeout into the ConnectionError the request path already reports."""
+        try: return await asyncio.wait_for(coro, timeout_s)
+        except asyncio.TimeoutError: raise ConnectionError(f"{what} timed out after {timeout_s:.0f}s") from None
+
+    async def _process_request(self, prompt, speculation=None):
+        """Prompt -> answer -> speech as one engine task, using the selected chat model and TTS voice/speed."""
         client = None; generated_text = None; playback_completed_naturally = True; timestamp_for_history = None
         try:
             if self._is_shutting_down.is_set(): return
-            print("DEBUG: Background thread started."); client = OpenAI();
+            logger.debug("Request task started."); client = self._get_async_client();
             if not client.api_key: raise ValueError("OpenAI API key missing.")
-            print("DEBUG: OpenAI client initialized.")
+            logger.debug("OpenAI client initialized.")
             if self.speak_input_enabled: # Path 1: Speak Input ONLY
                  if self._is_shutting_down.is_set(): return
                  self.update_status("Generating speech for input..."); prompt_audio_path_str = None; audio_generated = False
-                 timestamp_for_history = datetime.now().strftime("%Y%m%d_%H%M%S"); output_filename = config.RESPONSES_DIR / f"response_{timestamp_for_history}.mp3"; print(f"DEBUG: Input TTS - Target output file: {output_filename}")
-                 try:
-                     # --- Use selected voice AND speed --- ## CHECKED ##
-                     api_handler.generate_speech(client, prompt, output_filename,
-                                                 config.DEFAULT_TTS_MODEL,
-                                                 self.current_tts_voice, # Pass voice
-                                                 self.current_tts_speed) # Pass speed
-                     prompt_audio_path_str = str(output_filename); audio_generated = True; print(f"DEBUG: Input TTS - API call succeeded for {prompt_audio_path_str}")
-                 except (ConnectionError, RuntimeError, Exception) as prompt_tts_error: print(f"DEBUG: Input TTS - ERROR during generation: {prompt_tts_error}"); self.update_status(f"Error generating prompt audio: {prompt_tts_error}"); timestamp_for_history = None
+                 timestamp_for_history = datetime.now().strftime("%Y%m%d_%H%M%S"); output_filename = response_audio_path(config.RESPONSES_DIR, timestamp_for_history, config.TTS_RESPONSE_FORMAT); prompt_pcm = None; logger.debug("Input TTS - Target output file: %s", output_filename)
+                 spoken_prompt = tts_text.speech_text(prompt)
+                 if chunked_tts.needs_chunking(spoken_prompt):
+                     output_filename = response_audio_path(config.RESPONSES_DIR, timestamp_for_history, "pcm") # Chunks are joined as PCM and archived as .wav
+                     audio_generated, playback_completed_naturally = await self._speak_chunked(client, prompt, output_filename, "Speaking input...", spoken=spoken_prompt)
+                     if not audio_generated: timestamp_for_history = None
+                 else:
+                     try:
+                         # --- Use selected voice AND speed --- ## CHECKED ##
+                         prompt_pcm = await self._with_timeout(api_handler.generate_speech_async(client, prompt, output_filename,
+                                                     config.DEFAULT_TTS_MODEL,
+                                                     self.current_tts_voice, # Pass voice
+                                                     self.current_tts_speed, # Pass speed
+                                                     config.TTS_RESPONSE_FORMAT, spoken=spoken_prompt), config.TTS_REQUEST_TIMEOUT_S, "Speech generation")
+                         if prompt_pcm is not None: self._archive_pcm_in_background(prompt_pcm, output_filename)
+                         prompt_audio_path_str = str(output_filename); audio_generated = True; logger.debug("Input TTS - API call succeeded for %s", prompt_audio_path_str)
+                     except (ConnectionError, RuntimeError, Exception) as prompt_tts_error: logger.error("Input TTS - error during generation: %s", prompt_tts_error); self.update_status(f"Error generating prompt audio: {prompt_tts_error}"); timestamp_for_history = None
                  if audio_generated and prompt_audio_path_str:
                      if self._is_shutting_down.is_set(): return
-                     print("DEBUG: Input TTS - Generation succeeded."); playback_completed_naturally = self._play_audio_blocking(prompt_audio_path_str, status_playing="Speaking input..."); print(f"DEBUG: Input TTS - Playback finished. Completed naturally: {playback_completed_naturally}")
-                 elif not audio_generated: print("DEBUG: Input TTS - Generation failed.")
+                     logger.debug("Input TTS - Generation succeeded."); playback_completed_naturally = await self._play_audio(prompt_audio_path_str, status_playing="Speaking input...", pcm_data=prompt_pcm); logger.debug("Input TTS - Playback finished. Completed naturally: %s", playback_completed_naturally)
+                 elif not audio_generated: logger.debug("Input TTS - Generation failed.")
                  if self._is_shutting_down.is_set(): return
-                 print(f"DEBUG: Adding input-only history. Timestamp: {timestamp_for_history}"); placeholder_response = "(Input Spoken - No AI Response)"; self.history.insert(0, (prompt, placeholder_response, timestamp_for_history)); self.after(0, self.update_history_display)
+                 logger.debug("Adding input-only history. Timestamp: %s", timestamp_for_history); placeholder_response = "(Input Spoken - No AI Response)"; self.history.insert(0, (prompt, placeholder_response, timestamp_for_history)); self.engine.post_to_ui(self.update_history_display)
                  final_status = "Ready";
                  if not audio_generated: final_status = "Ready (Input audio generation failed)."
                  elif playback_completed_naturally: final_status = "Ready (Input spoken)."
                  else: final_status = "Ready (Input speech stopped)."
-                 self.update_status(final_status); print("DEBUG: Input TTS path finished."); return
+                 self.update_status(final_status); logger.debug("Input TTS path finished."); return
             else: # Path 2: Get AI Response
                  if self._is_shutting_down.is_set(): return
                  self.update_status("Generating AI response.")
                  # --- Use selected chat model --- (Keep this)
-                 generated_text = api_handler.get_chat_response(client, prompt, self.current_chat_model)
+                 generated_text = await self._get_chat_response_async(client, prompt, speculation)
                  if self._is_shutting_down.is_set(): return
-                 self.after(0, lambda: self.update_output_textbox(generated_text))
+                 self.update_output_textbox(generated_text)
                  if generated_text and not generated_text.startswith(("(No text response", "Error:")):
                      if self._is_shutting_down.is_set(): return
                      timestamp_for_history = None;
                      if self.tts_enabled: timestamp_for_history = datetime.now().strftime("%Y%m%d_%H%M%S")
-                     print(f"DEBUG: Saving history item: (prompt='{prompt[:20]}...', response='{generated_text[:20]}...', timestamp='{timestamp_for_history}')"); self.history.insert(0, (prompt, generated_text, timestamp_for_history)); self.after(0, self.update_history_display)
+                     logger.debug("Saving history item: (prompt='%s...', response='%s...', timestamp='%s')", prompt[:20], generated_text[:20], timestamp_for_history); self.history.insert(0, (prompt, generated_text, timestamp_for_history)); self.engine.post_to_ui(self.update_history_display)
+                     if config.SIMILAR_PROMPT_SUGGESTIONS: self.similarity_index.add(prompt, (prompt, generated_text, timestamp_for_history))
                      status_msg = "Response received. Generating audio..." if self.tts_enabled else "Response received (Speech disabled)."; self.update_status(status_msg)
                  else: self.update_status("Failed to get valid text response."); return
                  if self.tts_enabled and timestamp_for_history:
                      if self._is_shutting_down.is_set(): return
-                     output_filename = config.RESPONSES_DIR / f"response_{timestamp_for_history}.mp3"; response_audio_path = None; response_audio_generated = False
-                     try:
-                         print(f"DEBUG: Response TTS - Attempting generation for file: {output_filename}")
-                         # --- Use selected voice AND speed --- ## CHECKED ##
-                         api_handler.generate_speech(client, generated_text, output_filename,
-                                                     config.DEFAULT_TTS_MODEL,
-                                                     self.current_tts_voice, # Pass voice
-                                                     self.current_tts_speed) # Pass speed
-                         response_audio_path = str(output_filename); response_audio_generated = True; print(f"DEBUG: Response TTS - API call succeeded for {output_filename}")
-                     except (ConnectionError, RuntimeError, Exception) as response_tts_error: print(f"DEBUG: Response TTS - ERROR during generation: {response_tts_error}"); self.update_status(f"Error generating response audio: {response_tts_error}")
+                     output_filename = response_audio_path(config.RESPONSES_DIR, timestamp_for_history, config.TTS_RESPONSE_FORMAT); response_audio_path_str = None; response_pcm = None; response_audio_generated = False; tts_metrics = {}
+                     spoken_response = tts_text.speech_text(generated_text)
+                     if chunked_tts.needs_chunking(spoken_response):
+                         output_filename = response_audio_path(config.RESPONSES_DIR, timestamp_for_history, "pcm") # Chunks are joined as PCM and archived as .wav
+                         response_audio_generated, playback_completed_naturally = await self._speak_chunked(client, generated_text, output_filename, "Playing response...", spoken=spoken_response)
+                     else:
+                         try:
+                             logger.debug("Response TTS - Attempting generation for file: %s", output_filename)
+                             # --- Use selected voice AND speed --- ## CHECKED ##
+                             response_pcm = await self._with_timeout(api_handler.generate_speech_async(client, generated_text, output_filename,
+                                                         config.DEFAULT_TTS_MODEL,
+                                                         self.current_tts_voice, # Pass voice
+                                                         self.current_tts_speed, # Pass speed
+                                                         config.TTS_RESPONSE_FORMAT, metrics=tts_metrics, spoken=spoken_response), config.TTS_REQUEST_TIMEOUT_S, "Speech generation")
+                             if response_pcm is not None: self._archive_pcm_in_background(response_pcm, output_filename)
+                             if tts_metrics.get("chars_saved"): logger.info("Response TTS - Preprocessing: %s -> %s chars, ~%.1fs of audio saved.", tts_metrics["chars_in"], tts_metrics["chars_out"], tts_metrics["audio_s_saved"])
+                             response_audio_path_str = str(output_filename); response_audio_generated = True; logger.debug("Response TTS - API call succeeded for %s", output_filename)
+                         except (ConnectionError, RuntimeError, Exception) as response_tts_error: logger.error("Response TTS - error during generation: %s", response_tts_error); self.update_status(f"Error generating response audio: {response_tts_error}")
+                         if response_audio_generated:
+                             if self._is_shutting_down.is_set(): return
+                             logger.debug("Response TTS - Generation succeeded."); playback_completed_naturally = await self._play_audio(response_audio_path_str, status_playing="Playing response...", pcm_data=response_pcm); logger.debug("Response TTS - Playback finished. Completed naturally: %s", playback_completed_naturally)
                      if response_audio_generated:
                          if self._is_shutting_down.is_set(): return
-                         print("DEBUG: Response TTS - Generation succeeded."); playback_completed_naturally = self._play_audio_blocking(response_audio_path, status_playing="Playing response..."); print(f"DEBUG: Response TTS - Playback finished. Completed naturally: {playback_completed_naturally}")
-                         if self._is_shutting_down.is_set(): return
-                         print("DEBUG: Response TTS - Initiating cleanup."); cleanup_old_recordings(config.RESPONSES_DIR, config.MAX_RECORDINGS)
+                         logger.debug("Response TTS - Initiating cleanup."); await asyncio.to_thread(maintain_recordings, config.RESPONSES_DIR, config.MAX_RECORDINGS, self.audio_store)
                          if playback_completed_naturally: self.update_status("Ready")
-                     else: print("DEBUG: Response TTS - Generation failed."); self.update_status("Ready (Response audio generation failed).")
-                 elif self.tts_enabled and not timestamp_for_history: print("DEBUG: Warning - TTS enabled but no timestamp captured."); self.update_status("Ready (Internal history timestamp error).")
-                 else: print("DEBUG: Response TTS is disabled."); self.update_status("Ready (Speech disabled).")
-        except (ValueError, ConnectionError, RuntimeError, Exception) as e: error_msg_thread = f"Error: {e}"; print(error_msg_thread); final_text = generated_text or f"Error: {e}"; self.after(0, lambda: self.update_output_textbox(final_text)); self.update_status(f"Error: {e}"); self.is_playing = False
-        finally: self.after(0, self._safe_reenable_ui_after_thread)
+                     else: logger.debug("Response TTS - Generation failed."); self.update_status("Ready (Response audio generation failed).")
+                 elif self.tts_enabled and not timestamp_for_history: logger.warning("TTS enabled but no timestamp captured."); self.update_status("Ready (Internal history timestamp error).")
+                 else: logger.debug("Response TTS is disabled."); self.update_status("Ready (Speech disabled).")
+        except asyncio.CancelledError: logger.info("Request task cancelled."); self.is_playing = False; raise
+        except (ValueError, ConnectionError, RuntimeError, Exception) as e: logger.error("Background request failed: %s", e); final_text = generated_text or f"Error: {e}"; self.update_output_textbox(final_text); self.update_status(f"Error: {e}"); self.is_playing = False
+        finally: self.engine.post_to_ui(self._safe_reenable_ui_after_request)
+
+
+    def resolve_chat_model(self) -> str:
+        """The model to call: the selected one, or the fastest measured candidate when set to auto."""
+        if self.current_chat_model != config.AUTO_CHAT_MODEL:
+            return self.current_chat_model
+        allowed = [m for m in config.AUTO_MODEL_CANDIDATES if m in self.available_models] or config.AUTO_MODEL_CANDIDATES
+        chosen = self.model_stats.choose_fastest(allowed, config.DEFAULT_CHAT_MODEL)
+        logger.debug("Auto model selection chose '%s' from %s", chosen, allowed)
+        return chosen
+
+    async def _get_chat_response_async(self, client, prompt: str, speculation=None) -> str:
+        """Gets the chat response on the engine loop and records its latency per model. A claimed speculation is awaited instead of a new request."""
+        if speculation is not None:
+            try:
+                generated_text = await self._with_timeout(asyncio.wrap_future(speculation.future), config.CHAT_REQUEST_TIMEOUT_S, "Chat request")
+                metrics = speculation.metrics
+                if "latency_s" in metrics: self.model_stats.record(metrics["model"], metrics["latency_s"], metrics.get("completion_tokens"))
+                return generated_text
+            except (ValueError, ConnectionError, RuntimeError, Exception) as e: logger.warning("Speculative request failed (%s); sending the prompt again.", e)
+        model = self.resolve_chat_model(); metrics = {}
+        if config.HEDGE_ENABLED:
+            # Both hedge attempts are tasks on this loop: the timeout (or Stop) cancels them and closes their streams
+            fallback_client = self._get_hedge_fallback_client(client); fallback_model = config.HEDGE_FALLBACK_MODEL or model
+            chat_call = hedging.get_chat_response_hedged_async(client, prompt, model, fallback_client, fallback_model, self.hedge_stats, metrics=metrics)
+        else: chat_call = api_handler.get_chat_response_async(client, prompt, model, metrics=metrics)
+        generated_text = await self._with_timeout(chat_call, config.CHAT_REQUEST_TIMEOUT_S, "Chat request")
+        if metrics: self.model_stats.record(metrics["model"], metrics["latency_s"], metrics.get("completion_tokens"))
+        return generated_text
+
+    def _get_hedge_fallback_client(self, client):
+        """The client for hedged fallback requests: the shared one, or a cached one for HEDGE_FALLBACK_BASE_URL."""
+        if not config.HEDGE_FALLBACK_BASE_URL: return client
+        api_key = os.getenv('OPENAI_API_KEY')
+        if self._hedge_fallback_client is None or self._hedge_fallback_key != api_key:
+            self._hedge_fallback_client = api_handler.create_async_client(base_url=config.HEDGE_FALLBACK_BASE_URL); self._hedge_fallback_key = api_key
+        return self._hedge_fallback_client
+
+    async def _speak_chunked(self, client, text: str, output_path: Path, status_playing: str, spoken: str | None = None) -> tuple[bool, bool]:
+        """
+        Speaks a long text via parallel chunked synthesis: playback starts with the first chunk and the rest are
+        queued as they arrive; the joined clip is archived to output_path. Returns (audio generated, completed naturally).
+        """
+        synthesis = chunked_tts.ChunkedSynthesis(client, text, config.DEFAULT_TTS_MODEL, self.current_tts_voice, self.current_tts_speed, spoken=spoken)
+        pcm_chunks = synthesis.iter_chunks()
+        try:
+            try: first_pcm = await anext(pcm_chunks)
+            except (ConnectionError, RuntimeError, Exception) as e: logger.error("Chunked TTS - error during generation: %s", e); self.update_status(f"Error generating audio: {e}"); synthesis.cancel(); return False, True
+            metrics = synthesis.metrics
+            if metrics.get("chars_saved"): logger.info("Chunked TTS - Preprocessing: %s -> %s chars, ~%.1fs of audio saved.", metrics["chars_in"], metrics["chars_out"], metrics["audio_s_saved"])
+            if self._is_shutting_down.is_set(): synthesis.cancel(); return False, False
+            completed = await self._play_audio(str(output_path), status_playing=status_playing, pcm_data=first_pcm, pcm_chunks=pcm_chunks)
+            try: pcm_data = await synthesis.joined() # Also after a stop: the whole clip goes to history
+            except (ConnectionError, RuntimeError, Exception) as e: logger.error("Chunked TTS - a later chunk failed: %s", e); self.update_status(f"Error generating audio: {e}"); return False, completed
+        except asyncio.CancelledError: synthesis.cancel(); raise
+        self._archive_pcm_in_background(pcm_data, output_path)
+        logger.debug("Chunked TTS - %s chunks archived to %s", len(synthesis.chunks), output_path)
+        return True, completed
+
+    def _archive_pcm_in_background(self, pcm_data: bytes, output_path: Path):
+        """Writes PCM audio to disk as .wav off the playback path, so playback starts from memory immediately."""
+        self.engine.executor.submit(write_pcm_as_wav, pcm_data, output_path, config.TTS_NATIVE_SAMPLE_RATE)
 
 
     # --- Closing Method ---
     def on_closing(self):
         # (Keep implementation from previous step)
-        print("Closing application..."); self._is_shutting_down.set()
-        if self.is_playing: print("Stopping active playback..."); self.player.stop(); self.is_playing = False
-        print("Saving history..."); save_history(self.history_file, self.history)
-        print("Quitting audio player..."); self.player.quit()
-        print("Destroying main window..."); self.destroy()
+        logger.info("Closing application..."); self._is_shutting_down.set()
+        if self.is_playing: logger.info("Stopping active playback..."); self.player.stop(); self.is_playing = False
+        self.audio_backfill.stop()
+        if self.prompt_autocomplete is not None: self.prompt_autocomplete.close()
+        self.speculative_prefetch.close()
+        if self.compare_window is not None and self.compare_window.winfo_exists(): self.compare_window.close_window()
+        logger.info("Stopping request engine..."); self.engine.stop()
+        if self.audio_store is not None: self.audio_store.close()
+        self.sampling_profiler.stop()
+        self.lag_watchdog.stop()
+        if config.LAG_WATCHDOG_ENABLED: logger.info("Event-loop lag: %s", self.lag_watchdog.summary()); self.lag_watchdog.export()
+        logger.info("Saving history..."); save_history_merged(self.history_file, self.history) # Keeps entries service.py added meanwhile
+        if config.HEDGE_ENABLED: self.hedge_stats.save(config.HEDGE_STATS_FILE)
+        self.model_stats.save(config.MODEL_STATS_FILE)
+        logger.info("Quitting audio player..."); self.player.quit()
+        logger.info("Destroying main window..."); self.destroy()
+
+    def _pump_engine_results(self):
+        """Runs UI callbacks posted by the engine (and other worker threads), then re-arms itself."""
+        if self._is_shutting_down.is_set(): return
+        self.engine.drain_ui_queue()
+        self.after(config.ENGINE_UI_POLL_MS, self._pump_engine_results)
 
     # --- Safe UI Re-enable Helper ---
-    def _safe_reenable_ui_after_thread(self):
+    def _safe_reenable_ui_after_request(self):
          # (Keep implementation from previous step)
          if self._is_shutting_down.is_set(): return
          if not self.winfo_exists(): return
-         print("DEBUG: Background thread finished cleanly. Re-enabling UI.")
+         logger.debug("Request task finished. Re-enabling UI.")
          self.set_ui_state(processing=False);
          if self.is_playing: self.is_playing = False
          self.set_stop_button_state(enabled=False)
@@ -0,0 +1,102 @@
+# async_engine.py
+# One asyncio event loop on one dedicated thread for all request work (chat, TTS,
+# playback supervision), instead of a new thread per request. Blocking libraries
+# (pygame decoding, file writes) run on a small fixed executor owned by the loop,
+# so the thread count stays constant under load.
+# Results reach Tk through a thread-safe queue that the Tk thread drains with after().
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Coroutine
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEngine:
+    """Runs coroutines on a background event loop and hands UI callbacks back to the Tk thread."""
+
+    def __init__(self, blocking_workers: int = config.ENGINE_BLOCKING_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix="EngineBlocking")
+        self.ui_queue: queue.SimpleQueue = queue.SimpleQueue() # (callback, args) for the Tk thread
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._started = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_loop, name="AsyncEngine", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.set_default_executor(self.executor) # run_in_executor(None, ...) / asyncio.to_thread use the fixed pool
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def submit(self, coro: Coroutine, timeout: float | None = None, name: str = "task") -> Future:
+        """
+        Schedules coro on the engine loop from any thread. Returns a concurrent Future:
+        future.cancel() cancels the task; with a timeout the task is cancelled and the
+        future raises TimeoutError once it runs longer than that.
+        """
+        if timeout is not None:
+            coro = asyncio.wait_for(coro, timeout)
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        future.add_done_callback(lambda f: self._log_failure(f, name))
+        return future
+
+    @staticmethod
+    def _log_failure(future: Future, name: str):
+        if future.cancelled():
+            logger.debug("Engine task '%s' cancelled.", name)
+        elif future.exception() is not None:
+            logger.error("Engine task '%s' failed: %r", name, future.exception())
+
+    def post_to_ui(self, callback: Callable, *args):
+        """Queues callback(*args) to run on the Tk thread (safe from any thread)."""
+        self.ui_queue.put((callback, args))
+
+    def drain_ui_queue(self, budget_s: float = 0.008):
+        """Runs queued UI callbacks (call on the Tk thread) until the queue is empty or the time budget is used."""
+        deadline = time.perf_counter() + budget_s
+        while time.perf_counter() < deadline:
+            try:
+                callback, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error("UI callback %s failed: %s", getattr(callback, "__name__", callback), e, exc_info=True)
+
+    def stop(self, timeout: float = 2.0):
+        """Cancels outstanding tasks and stops the loop thread."""
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        async def _cancel_all():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_all(), self._loop).result(timeout=timeout)
+        except Exception as e:
+            logger.debug("Engine task cancellation incomplete: %s", e)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,274 @@
+# audio_backfill.py
+# Opt-in background job that synthesizes audio for history entries that have none
+# (answered with speech off, or whose clip was removed by retention), so playing a
+# past answer is instant.
+#
+# The job runs as one task on the app's engine loop at idle priority: it never
+# starts a synthesis while a chat request or playback is active, paces requests
+# (minimum interval, bounded concurrency) and backs off on HTTP 429. Progress is
+# durable by construction: each finished clip is on disk and its timestamp is saved
+# into the history right away, so a restarted job simply rescans. Entries that keep
+# failing are counted in BACKFILL_STATE_FILE and skipped after a few attempts.
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import config
+import api_handler
+import chunked_tts
+import tts_text
+from file_utils import response_audio_path, write_pcm_as_wav
+from history_manager import save_history_merged
+
+logger = logging.getLogger(__name__)
+
+# Placeholder answer of input-only entries; their clip is the spoken prompt, not this text
+INPUT_ONLY_RESPONSE = "(Input Spoken - No AI Response)"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def _parse_timestamp(timestamp: str | None) -> float | None:
+    """Epoch seconds of a history timestamp (the first 15 chars are YYYYmmdd_HHMMSS)."""
+    if not timestamp:
+        return None
+    try:
+        return datetime.strptime(timestamp[:15], TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+def _rate_limit_delay(error: Exception) -> float | None:
+    """Seconds the API asked us to wait if error was an HTTP 429 (0.0 without Retry-After), else None."""
+    cause = error.__cause__
+    if getattr(cause, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(cause, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class AudioBackfill:
+    """Fills in missing history audio on the app's AsyncEngine without competing with interactive work."""
+
+    def __init__(self, app, concurrency: int = config.BACKFILL_CONCURRENCY,
+                 min_interval_s: float = config.BACKFILL_MIN_INTERVAL_S,
+                 max_entries: int = config.MAX_RECORDINGS):
+        self.app = app
+        self.concurrency = concurrency
+        self.min_interval_s = min_interval_s
+        # Only the newest entries retention would keep; older clips would just be deleted again
+        self.max_entries = max_entries
+        self.completed = 0
+        self._future = None
+        self._failures: dict[str, int] = {}
+        self._next_start = 0.0 # Loop time before which no new synthesis starts (pacing / 429 backoff)
+        self._backoff_s = 0.0
+        self._no_api_key = False # Set when the client could not be created; cleared once a key is set
+
+    def is_running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def start(self, delay_s: float = config.BACKFILL_START_DELAY_S):
+        if self.is_running():
+            return
+        self._future = self.app.engine.submit(self._run(delay_s), name="AudioBackfill")
+        logger.info("Audio backfill enabled (starts in %.0fs).", delay_s)
+
+    def stop(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+            logger.info("Audio backfill stopped (%s clips generated).", self.completed)
+
+    # --- Engine-loop side ---
+    async def _run(self, delay_s: float):
+        await asyncio.sleep(delay_s)
+        self._failures = await asyncio.to_thread(self._load_state)
+        slots = asyncio.Semaphore(self.concurrency)
+        running: set[asyncio.Task] = set()
+        try:
+            while True:
+                await self._wait_for_api_key()
+                targets = self._collect_targets()
+                if targets:
+                    logger.info("Audio backfill: %s history entries without audio.", len(targets))
+                for item, entry_time in targets:
+                    if self._no_api_key:
+                        break # Paused; rescanned once a key is set
+                    await slots.acquire()
+                    try:
+                        await self._wait_turn()
+                    except BaseException:
+                        slots.release()
+                        raise
+                    task = asyncio.create_task(self._backfill_one(item, entry_time))
+                    running.add(task)
+                    task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+                if running:
+                    await asyncio.gather(*running, return_exceptions=True)
+                if self._no_api_key and not os.getenv('OPENAI_API_KEY'):
+                    continue # Resume as soon as a key is set, not after the rescan interval
+                await asyncio.sleep(config.BACKFILL_RESCAN_INTERVAL_S) # Pick up entries added since
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _wait_for_api_key(self):
+        """Pauses the job while no OpenAI API key is set (Settings puts a new key into the environment)."""
+        if not os.getenv('OPENAI_API_KEY'):
+            logger.warning("Audio backfill paused until an OpenAI API key is set.")
+            while not os.getenv('OPENAI_API_KEY'):
+                await asyncio.sleep(config.BACKFILL_IDLE_POLL_S)
+            logger.info("Audio backfill resumed.")
+        self._no_api_key = False
+
+    def _interactive_busy(self) -> bool:
+        playback_task = self.app.playback_task
+        return self.app._request_in_progress() or self.app.is_playing or (playback_task is not None and not playback_task.done())
+
+    async def _wait_turn(self):
+        """Waits until pacing/backoff allow a new synthesis and nothing interactive is running."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now < self._next_start:
+                await asyncio.sleep(self._next_start - now)
+            elif self._interactive_busy():
+                await asyncio.sleep(config.BACKFILL_IDLE_POLL_S)
+            else:
+                self._next_start = now + self.min_interval_s
+                return
+
+    @staticmethod
+    def _key(item) -> str:
+        timestamp = item[2] if len(item) > 2 else None
+        return timestamp or hashlib.sha1(f"{item[0]}\0{item[1]}".encode("utf-8")).hexdigest()[:16]
+
+    def _collect_targets(self) -> list[tuple[tuple, float | None]]:
+        """(history item, clip mtime) for recent entries without audio. Runs on the engine thread, which also appends history."""
+        history = list(self.app.history)[:self.max_entries]
+        times = [_parse_timestamp(item[2]) if isinstance(item, (list, tuple)) and len(item) > 2 else None for item in history]
+        targets = []
+        for index, item in enumerate(history):
+            if not isinstance(item, (list, tuple)) or len(item) < 2:
+                continue
+            timestamp = item[2] if len(item) > 2 else None
+            text = (item[1] or "").strip()
+            if timestamp and self.app._has_response_audio(timestamp):
+                continue
+            if not text or text == INPUT_ONLY_RESPONSE or text.startswith("Error:"):
+                continue
+            if self._failures.get(self._key(item), 0) >= config.BACKFILL_MAX_ATTEMPTS:
+                continue
+            targets.append((item, self._entry_time(times, index)))
+        return targets
+
+    @staticmethod
+    def _entry_time(times: list[float | None], index: int) -> float | None:
+        """
+        Time to stamp the clip with, so mtime-based retention keeps history order:
+        the entry's own timestamp, else just after the nearest older timestamped
+        entry, else just before the nearest newer one (history is newest first).
+        """
+        if times[index] is not None:
+            return times[index]
+        older = next((t for t in times[index + 1:] if t is not None), None)
+        if older is not None:
+            return older + 1.0
+        newer = next((t for t in reversed(times[:index]) if t is not None), None)
+        return newer - 1.0 if newer is not None else None
+
+    def _new_timestamp(self, entry_time: float | None) -> str:
+        base = datetime.fromtimestamp(entry_time if entry_time is not None else time.time()).strftime(TIMESTAMP_FORMAT)
+        taken = {item[2] for item in self.app.history if isinstance(item, (list, tuple)) and len(item) > 2 and item[2]}
+        candidate, suffix = base, 0
+        while candidate in taken or self.app._has_response_audio(candidate):
+            suffix += 1
+            candidate = f"{base}_{suffix}"
+        return candidate
+
+    async def _backfill_one(self, item, entry_time: float | None):
+        if not any(existing is item for existing in self.app.history):
+            return # Removed since the scan
+        timestamp = (item[2] if len(item) > 2 else None) or self._new_timestamp(entry_time)
+        try:
+            client = self.app._get_async_client()
+        except Exception as e: # OpenAIError without an API key; not the entry's fault, so no failure is counted
+            if not self._no_api_key: logger.warning("Audio backfill: no usable OpenAI client (%s).", e)
+            self._no_api_key = True
+            return
+        spoken = tts_text.speech_text(item[1].strip())
+        chunked = chunked_tts.needs_chunking(spoken) # Long answers (even above the TTS input limit) are synthesized in chunks
+        output_path = response_audio_path(config.RESPONSES_DIR, timestamp, "pcm" if chunked else config.TTS_RESPONSE_FORMAT)
+        while True:
+            try:
+                if chunked:
+                    pcm_data = await chunked_tts.ChunkedSynthesis(
+                        client, item[1].strip(), config.DEFAULT_TTS_MODEL, self.app.current_tts_voice,
+                        self.app.current_tts_speed, max_workers=self.concurrency, spoken=spoken).joined()
+                else:
+                    pcm_data = await self.app._with_timeout(api_handler.generate_speech_async(
+                        client, item[1].strip(), output_path, config.DEFAULT_TTS_MODEL,
+                        self.app.current_tts_voice, self.app.current_tts_speed, config.TTS_RESPONSE_FORMAT, spoken=spoken),
+                        config.TTS_REQUEST_TIMEOUT_S, "Backfill speech generation")
+                if pcm_data is not None:
+                    await asyncio.to_thread(write_pcm_as_wav, pcm_data, output_path, config.TTS_NATIVE_SAMPLE_RATE)
+                break
+            except (ConnectionError, RuntimeError) as e:
+                retry_after = _rate_limit_delay(e)
+                if retry_after is None:
+                    self._failures[self._key(item)] = self._failures.get(self._key(item), 0) + 1
+                    await asyncio.to_thread(self._save_state)
+                    logger.warning("Audio backfill failed for %s: %s", timestamp, e)
+                    return
+                self._backoff_s = min(max(self._backoff_s * 2, self.min_interval_s * 2), config.BACKFILL_MAX_BACKOFF_S)
+                delay_s = max(retry_after, self._backoff_s)
+                self._next_start = max(self._next_start, asyncio.get_running_loop().time() + delay_s)
+                logger.warning("Audio backfill rate-limited; pausing %.1fs.", delay_s)
+                await self._wait_turn()
+        self._backoff_s = 0.0
+        if not output_path.exists(): # The archive write failed (write_pcm_as_wav only logs): don't point history at a missing file
+            self._failures[self._key(item)] = self._failures.get(self._key(item), 0) + 1
+            await asyncio.to_thread(self._save_state)
+            logger.warning("Audio backfill: %s was not written.", output_path.name)
+            return
+        if entry_time is not None:
+            await asyncio.to_thread(os.utime, output_path, (entry_time, entry_time))
+        self.completed += 1
+        logger.info("Audio backfill: generated %s", output_path.name)
+        if len(item) > 2 and item[2]:
+            return
+        for index, existing in enumerate(self.app.history):
+            if existing is item:
+                self.app.history[index] = (item[0], item[1], timestamp)
+                break
+        else:
+            return
+        await asyncio.to_thread(save_history_merged, self.app.history_file, list(self.app.history)) # Durable before the next clip
+        self.app.engine.post_to_ui(self.app.update_history_display) # Row commands carry the new timestamp
+
+    # --- Failure counts (resume state) ---
+    def _load_state(self) -> dict[str, int]:
+        try:
+            with open(config.BACKFILL_STATE_FILE, "r", encoding="utf-8") as f:
+                return {str(key): int(count) for key, count in json.load(f).get("failures", {}).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning("Could not read backfill state %s: %s", config.BACKFILL_STATE_FILE, e)
+            return {}
+
+    def _save_state(self):
+        try:
+            config.BACKFILL_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(config.BACKFILL_STATE_FILE, "w", encoding="utf-8") as f:
+                json.dump({"failures": self._failures}, f, indent=4)
+        except OSError as e:
+            logger.warning("Could not save backfill state %s: %s", config.BACKFILL_STATE_FILE, e)
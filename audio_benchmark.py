@@ -0,0 +1,269 @@
+# audio_benchmark.py
+# Headless playback-latency benchmarks for AudioPlayer.
+#
+# Runs the real AudioPlayer on SDL's "dummy" audio driver (no sound card needed, it
+# consumes audio in real time like a device) over generated tone fixtures: WAV and
+# raw PCM at the TTS native format, plus MP3 when ffmpeg is available to encode it.
+# For each format and length it records:
+#   - load_ms:        preload_sound() decode time (PCM: building the Sound via play_pcm)
+#   - start_ms:       play_sound()/play_pcm() call until the channel reports busy (uncached)
+#   - start_cached_ms same for a preloaded clip
+#   - stop_ms:        stop() until is_busy() is False
+#   - end_detect_ms:  how late the end of a clip is noticed when is_busy() is polled at
+#                     the GUI's interval (ChatApp._play_audio), for clips up to --max-play-s
+# plus the process's peak RSS. Results are written as JSON and checked against
+# thresholds (and optionally a previous results file); the exit code is 1 on failure.
+#
+# Usage:
+#   python audio_benchmark.py --lengths 1,10,60 --repeats 5
+#   python audio_benchmark.py --baseline data/benchmarks/audio_<stamp>.json
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Default pass/fail limits on the median of each metric: (base ms, extra ms per second
+# of audio). Override with --thresholds.
+DEFAULT_THRESHOLDS = {
+    "load_ms": (50.0, 10.0),
+    "start_ms": (60.0, 10.0), # Uncached start includes the decode (or the stream open)
+    "start_cached_ms": (20.0, 0.0),
+    "stop_ms": (20.0, 0.0),
+    "end_detect_ms": (200.0, 0.0), # Poll interval + mixer buffer + scheduler slack
+}
+DEFAULT_MAX_PEAK_RSS_MB = 400.0
+GUI_POLL_INTERVAL_S = 0.1 # ChatApp._play_audio's is_busy() loop
+FIXTURE_RATE = config.TTS_NATIVE_SAMPLE_RATE
+
+
+def tone_pcm(seconds: float, rate: int = FIXTURE_RATE) -> bytes:
+    """16-bit mono PCM of a quiet 440 Hz tone (speech-like size, no silence the mixer could skip)."""
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * 440.0 * t) * 8000).astype("<i2").tobytes()
+
+
+def make_fixtures(fixture_dir: Path, lengths: list[float]) -> list[dict]:
+    """Writes the fixtures; MP3 ones are encoded with ffmpeg and skipped if it is not installed."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        logger.warning("ffmpeg not found: MP3 fixtures skipped.")
+    fixtures = []
+    for seconds in lengths:
+        pcm_data = tone_pcm(seconds)
+        wav_path = fixture_dir / f"tone_{seconds:g}s.wav"
+        with wave.open(str(wav_path), "wb") as wav_file:
+            wav_file.setnchannels(1); wav_file.setsampwidth(2); wav_file.setframerate(FIXTURE_RATE)
+            wav_file.writeframes(pcm_data)
+        fixtures.append({"format": "wav", "seconds": seconds, "path": wav_path})
+        fixtures.append({"format": "pcm", "seconds": seconds, "pcm": pcm_data})
+        if ffmpeg is not None:
+            mp3_path = wav_path.with_suffix(".mp3")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-i", str(wav_path), "-codec:a", "libmp3lame", "-b:a", "128k", str(mp3_path)], check=True)
+            fixtures.append({"format": "mp3", "seconds": seconds, "path": mp3_path})
+    return fixtures
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far (None where the resource module is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB elsewhere
+
+
+def threshold_for(thresholds: dict, seconds: float) -> dict:
+    return {metric: base + per_second * seconds for metric, (base, per_second) in thresholds.items()}
+
+
+class AudioBenchmark:
+    """Times one AudioPlayer's load/start/stop/end-detection paths over the fixtures."""
+
+    def __init__(self, player, repeats: int, max_play_s: float, poll_interval_s: float, thresholds: dict):
+        self.player = player
+        self.repeats = repeats
+        self.max_play_s = max_play_s
+        self.poll_interval_s = poll_interval_s
+        self.thresholds = thresholds
+        self.cases: list[dict] = []
+
+    def _wait_busy(self, timeout_s: float = 2.0) -> bool:
+        deadline = time.perf_counter() + timeout_s
+        while not self.player.is_busy():
+            if time.perf_counter() > deadline:
+                return False
+            time.sleep(0.0005)
+        return True
+
+    def _start(self, fixture: dict) -> float:
+        """Starts playback; returns ms until the channel is busy."""
+        start = time.perf_counter()
+        if fixture["format"] == "pcm":
+            started = self.player.play_pcm(fixture["pcm"], FIXTURE_RATE)
+        else:
+            started = self.player.play_sound(str(fixture["path"]))
+        if not started or not self._wait_busy():
+            raise RuntimeError(f"Playback of {fixture['format']} {fixture['seconds']:g}s did not start.")
+        return (time.perf_counter() - start) * 1000.0
+
+    def _stop(self) -> float:
+        start = time.perf_counter()
+        self.player.stop()
+        while self.player.is_busy():
+            time.sleep(0.0005)
+        return (time.perf_counter() - start) * 1000.0
+
+    def _end_detection(self, fixture: dict) -> float:
+        """Plays the clip to its end, polling like the GUI; returns ms between the nominal end and its detection."""
+        self._start(fixture)
+        started = time.perf_counter()
+        while self.player.is_busy():
+            time.sleep(self.poll_interval_s)
+        return (time.perf_counter() - started - fixture["seconds"]) * 1000.0
+
+    def measure(self, fixture: dict) -> dict:
+        player = self.player
+        samples = {metric: [] for metric in DEFAULT_THRESHOLDS}
+        for _ in range(self.repeats):
+            player.clear_cache()
+            if fixture["format"] == "pcm":
+                start = time.perf_counter(); player.play_pcm(fixture["pcm"], FIXTURE_RATE, sound_id="fixture")
+                samples["load_ms"].append((time.perf_counter() - start) * 1000.0); player.stop()
+                samples["start_ms"].append(self._start(fixture))
+                samples["stop_ms"].append(self._stop())
+            else:
+                samples["start_ms"].append(self._start(fixture)) # Uncached: decodes (or opens the stream) first
+                samples["stop_ms"].append(self._stop())
+                player.clear_cache()
+                start = time.perf_counter(); player.preload_sound(str(fixture["path"]))
+                samples["load_ms"].append((time.perf_counter() - start) * 1000.0)
+                samples["start_cached_ms"].append(self._start(fixture))
+                self._stop()
+            if fixture["seconds"] <= self.max_play_s:
+                samples["end_detect_ms"].append(self._end_detection(fixture))
+        name = f"{fixture['format']}.{fixture['seconds']:g}s"
+        case = {"name": name, "format": fixture["format"], "seconds": fixture["seconds"],
+                "streamed": fixture["format"] != "pcm" and player.should_stream(str(fixture["path"]))}
+        for metric, values in samples.items():
+            if values:
+                case[metric] = round(statistics.median(values), 2)
+                case[f"{metric}_max"] = round(max(values), 2)
+        limits = {metric: limit for metric, limit in threshold_for(self.thresholds, fixture["seconds"]).items() if metric in case}
+        case["thresholds"] = {metric: round(limit, 1) for metric, limit in limits.items()}
+        case["failures"] = [f"{metric} {case[metric]} > {limit:.1f}" for metric, limit in limits.items() if case[metric] > limit]
+        case["peak_rss_mb"] = peak_rss_mb()
+        logger.info("%-10s load %7.2f  start %7.2f  cached %7s  stop %6.2f  end %7s ms%s", name, case["load_ms"], case["start_ms"],
+                    case.get("start_cached_ms", "-"), case["stop_ms"], case.get("end_detect_ms", "-"), "  FAIL" if case["failures"] else "")
+        self.cases.append(case)
+        return case
+
+
+def compare_to_baseline(cases: list[dict], baseline_file: Path, max_regression: float, min_delta_ms: float = 2.0):
+    """Adds a failure for every metric whose median grew by more than max_regression (and min_delta_ms) over the baseline."""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {case["name"]: case for case in json.load(f).get("cases", [])}
+    for case in cases:
+        previous = baseline.get(case["name"])
+        if previous is None:
+            continue
+        for metric in DEFAULT_THRESHOLDS:
+            if metric in case and metric in previous:
+                allowed_ms = max(previous[metric] * (1.0 + max_regression), previous[metric] + min_delta_ms) # Tiny times are mostly noise
+                if case[metric] > allowed_ms:
+                    case["failures"].append(f"{metric} {case[metric]} > baseline {previous[metric]} +{max_regression:.0%}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless AudioPlayer playback-latency benchmarks (SDL dummy driver).")
+    parser.add_argument("--lengths", default="1,10,60", help="Comma-separated fixture lengths in seconds.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-play-s", type=float, default=2.0, help="Only clips up to this length are played to the end (real time).")
+    parser.add_argument("--poll-ms", type=float, default=GUI_POLL_INTERVAL_S * 1000, help="is_busy() poll interval for end detection.")
+    parser.add_argument("--buffer", type=int, default=config.AUDIO_BUFFER_SIZE, help="Mixer buffer size (frames).")
+    parser.add_argument("--driver", default="dummy", help="SDL_AUDIODRIVER to use (default: dummy).")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON (default: data/benchmarks/audio_<timestamp>.json).")
+    parser.add_argument("--thresholds", type=Path, default=None, help="JSON overriding DEFAULT_THRESHOLDS ({metric: [base_ms, per_second_ms]}).")
+    parser.add_argument("--max-peak-rss-mb", type=float, default=DEFAULT_MAX_PEAK_RSS_MB)
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier results file to check for regressions.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed median slowdown vs. the baseline (0.25 = 25%%).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("audio_player").setLevel(logging.WARNING) # Per-repeat cache/stop messages
+
+    os.environ["SDL_AUDIODRIVER"] = args.driver # Must be set before SDL's audio subsystem starts
+    lengths = sorted({float(length) for length in args.lengths.split(",") if length.strip()})
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if args.thresholds is not None:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds.update({metric: tuple(limit) for metric, limit in json.load(f).items()})
+    output_file = args.output or config.BENCHMARKS_DIR / f"audio_{datetime.now():%Y%m%d_%H%M%S}.json"
+
+    from audio_player import AudioPlayer
+    native_rate = config.TTS_RESPONSE_FORMAT in ("wav", "pcm") # Same mixer format as main.py
+    player = AudioPlayer(buffer_size=args.buffer, frequency=FIXTURE_RATE if native_rate else None, channels=1 if native_rate else None)
+    if not player.initialized:
+        logger.error("Audio mixer could not be initialized with SDL_AUDIODRIVER=%s.", args.driver)
+        return 1
+    import pygame
+    environment = {
+        "python": platform.python_version(), "platform": platform.platform(), "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())), "driver": args.driver, "mixer": list(pygame.mixer.get_init()),
+        "buffer": args.buffer,
+    }
+    rss_before_mb = peak_rss_mb()
+    benchmark = AudioBenchmark(player, args.repeats, args.max_play_s, args.poll_ms / 1000.0, thresholds)
+    try:
+        with tempfile.TemporaryDirectory(prefix="audio_benchmark_") as fixture_dir:
+            for fixture in make_fixtures(Path(fixture_dir), lengths):
+                benchmark.measure(fixture)
+            player.clear_cache()
+    finally:
+        player.quit()
+
+    if args.baseline is not None:
+        compare_to_baseline(benchmark.cases, args.baseline, args.max_regression)
+    final_peak_mb = peak_rss_mb()
+    rss_failures = [f"peak_rss_mb {final_peak_mb:.1f} > {args.max_peak_rss_mb:.1f}"] if final_peak_mb is not None and final_peak_mb > args.max_peak_rss_mb else []
+    passed = not rss_failures and not any(case["failures"] for case in benchmark.cases)
+    results = {
+        "benchmark": "audio",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment,
+        "parameters": {"lengths": lengths, "repeats": args.repeats, "max_play_s": args.max_play_s, "poll_ms": args.poll_ms},
+        "peak_rss_mb": {"before_fixtures": rss_before_mb, "final": final_peak_mb, "failures": rss_failures},
+        "cases": benchmark.cases,
+        "passed": passed,
+    }
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    logger.info("Peak RSS %s MB. Results written to %s (%s)", f"{final_peak_mb:.1f}" if final_peak_mb is not None else "n/a",
+                output_file, "PASS" if passed else "FAIL")
+    for failure in rss_failures:
+        logger.error("%s", failure)
+    for case in benchmark.cases:
+        for failure in case["failures"]:
+            logger.error("%s: %s", case["name"], failure)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# audio_calibration.py
+# Finds the smallest stable mixer buffer for the current output device.
+#
+# The mixer buffer is most of the delay between play() and audible output
+# (buffer / sample rate: 2048 frames at 44.1 kHz is ~46 ms), but a buffer that is
+# too small underruns on slow machines or devices. calibrate() re-opens the mixer
+# with decreasing buffer sizes and plays a short silent probe a few times at each
+# size. A size counts as unstable if the mixer fails to open, no channel is free,
+# or a probe finishes late (the mixer fell behind the device). The smallest stable
+# size wins. AudioPlayer stores the result per output device, so calibration only
+# runs again when the device set changes.
+
+import logging
+import os
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def output_device_fingerprint() -> str:
+    """Identifies the audio output setup (SDL driver + output device names). Needs the mixer initialized."""
+    import pygame
+    try:
+        from pygame._sdl2 import audio as sdl2_audio
+        names = [str(name) for name in sdl2_audio.get_audio_device_names(False)]
+    except (ImportError, AttributeError, pygame.error) as e:
+        logger.debug("Could not list audio output devices: %s", e)
+        names = []
+    return "|".join([os.getenv("SDL_AUDIODRIVER", "") or "default", *sorted(names)])
+
+
+def _buffer_is_stable(pygame, buffer: int, init_kwargs: dict, trials: int, probe_ms: int) -> bool:
+    pygame.mixer.quit()
+    try:
+        pygame.mixer.init(buffer=buffer, **init_kwargs)
+    except pygame.error as e:
+        logger.debug("Buffer %s: mixer init failed: %s", buffer, e)
+        return False
+    frequency, size, channels = pygame.mixer.get_init()
+    frames = frequency * probe_ms // 1000
+    probe = pygame.mixer.Sound(buffer=bytes(frames * channels * (abs(size) // 8))) # Silence
+    # A probe ends within about two buffer periods of its length; later means the mixer fell behind
+    allowed_s = frames / frequency + 2 * buffer / frequency + config.AUDIO_CALIBRATION_SLACK_MS / 1000
+    worst_s = 0.0
+    for _ in range(trials):
+        channel = probe.play()
+        if channel is None:
+            logger.debug("Buffer %s: no channel for the probe.", buffer)
+            return False
+        start = time.perf_counter()
+        while channel.get_busy() and time.perf_counter() - start < allowed_s * 3:
+            time.sleep(0.001)
+        worst_s = max(worst_s, time.perf_counter() - start)
+        if worst_s > allowed_s:
+            logger.debug("Buffer %s: probe of %s ms took %.0f ms (limit %.0f ms).", buffer, probe_ms, worst_s * 1000, allowed_s * 1000)
+            return False
+    logger.debug("Buffer %s stable (worst probe %.0f ms for %s ms of audio).", buffer, worst_s * 1000, probe_ms)
+    return True
+
+
+def calibrate(init_kwargs: dict, candidates: tuple[int, ...] = config.AUDIO_BUFFER_CANDIDATES,
+              trials: int = config.AUDIO_CALIBRATION_TRIALS, probe_ms: int = config.AUDIO_CALIBRATION_PROBE_MS) -> int | None:
+    """
+    Tries the buffer sizes largest first with the given pygame.mixer.init() arguments
+    (frequency/size/channels) and returns the smallest stable one, or None if none
+    was stable. Leaves the mixer uninitialized. Takes up to a few seconds.
+    """
+    import pygame
+    started = time.perf_counter()
+    stable = None
+    for buffer in sorted(candidates, reverse=True):
+        if not _buffer_is_stable(pygame, buffer, init_kwargs, trials, probe_ms):
+            break # Smaller buffers only get worse
+        stable = buffer
+    pygame.mixer.quit()
+    logger.info("Audio buffer calibration: %s (%.1fs).", f"{stable} frames" if stable else "no stable size", time.perf_counter() - started)
+    return stable
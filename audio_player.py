@@ -1,30 +1,195 @@
 # audio_player.py
 # Handles audio playback using pygame.mixer.Sound
 
-import pygame
 from pathlib import Path
+import io
+import wave
 import logging
+import threading
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FuturesTimeoutError
 import config # Although unused directly, keep it if config module sets up logging
+import audio_calibration
 
-# Configure logging (basic setup, can be configured externally)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Logging is configured by the application entry point (main.py), not at import time
 logger = logging.getLogger(__name__)
 
+# pygame is imported lazily (by AudioPlayer.__init__) to keep app startup fast
+pygame = None
+
+def _import_pygame():
+    """Imports pygame on first use and caches it in the module global."""
+    global pygame
+    if pygame is None:
+        import pygame as _pygame
+        pygame = _pygame
+    return pygame
+
 class AudioPlayer:
     """Handles audio playback using pygame.mixer.Sound."""
-    def __init__(self, buffer_size: int = 2048):
+    def __init__(self, buffer_size: int | None = config.AUDIO_BUFFER_SIZE, defer_init: bool = False,
+                 frequency: int | None = None, channels: int | None = None):
+        """
+        If defer_init is True the mixer is not touched here; call
+        init_in_background() once the GUI is up. Playback paths can wait on
+        the `ready` future (or wait_until_ready()) for the mixer.
+
+        frequency/channels default to pygame's own defaults. Passing the TTS
+        native format (24000 Hz, mono) lets play_pcm() hand raw samples to the
+        mixer with no decoding or resampling.
+
+        buffer_size None means calibrated: the smallest stable buffer for the
+        output device is looked up in buffer_calibration (see
+        use_buffer_calibration()) or measured, and the mixer is re-opened when
+        the output device changes.
+        """
         self.initialized: bool = False
+        self.buffer_size = buffer_size
+        self.active_buffer: int | None = None # Buffer the mixer was actually opened with
+        self.buffer_calibration: dict[str, int] = {} # Output device fingerprint -> calibrated buffer
+        self.on_calibrated = None # Called (on the init thread) with the updated calibration dict
+        self.output_device: str | None = None
+        self.frequency = frequency
+        self.channels = channels
         self.current_channel: pygame.mixer.Channel | None = None
         self.sound_cache: dict[str, pygame.mixer.Sound] = {}  # Dictionary to store preloaded sounds
         self.logger = logging.getLogger(f"{__name__}.AudioPlayer") # Create instance-specific logger if desired, or use module logger
+        # Resolves to True once the mixer is ready, or False if the player is quit before that
+        self.ready: Future = Future()
+        self._init_lock = threading.Lock()
+        self._stop_init = threading.Event()
+        self._init_thread: threading.Thread | None = None
+        # Long clips are streamed through pygame.mixer.music instead of decoded into a Sound
+        self.stream_threshold_bytes = config.AUDIO_STREAM_THRESHOLD_BYTES
+        self.streaming: bool = False
+        # Locally time-stretched versions of clips, keyed by (sound_id, speed)
+        self.stretch_cache: dict[tuple[str, float], pygame.mixer.Sound] = {}
+        self._stretch_pool = None # ProcessPoolExecutor, created on first heavy stretch
+
+        if not defer_init:
+            self._try_init_mixer()
+
+    def _try_init_mixer(self) -> bool:
+        """Single attempt to import pygame and initialize the mixer. Resolves `ready` on success."""
+        with self._init_lock:
+            if self.initialized:
+                return True
+            if self._stop_init.is_set():
+                return False
+            try:
+                _import_pygame()
+            except ImportError as e:
+                self.logger.error("pygame is not available: %s. Audio playback disabled.", e)
+                return False
+
+            try:
+                # Initialize pygame mixer with configurable rate/channels/buffer size
+                init_kwargs = {}
+                if self.frequency: init_kwargs["frequency"] = self.frequency; init_kwargs["size"] = -16
+                if self.channels: init_kwargs["channels"] = self.channels
+                if self.buffer_size is None:
+                    self.active_buffer = self._init_calibrated_mixer(init_kwargs)
+                else:
+                    pygame.mixer.init(buffer=self.buffer_size, **init_kwargs)
+                    self.active_buffer = self.buffer_size
+                self.initialized = True
+                mixer_rate = pygame.mixer.get_init()[0]
+                self.logger.info("Pygame mixer initialized successfully (%s, buffer=%s, ~%.0f ms output latency).",
+                                 pygame.mixer.get_init(), self.active_buffer, self.active_buffer / mixer_rate * 1000)
+            except pygame.error as e:
+                self.logger.error("Error initializing pygame mixer: %s. Audio playback disabled.", e, exc_info=True)
+                return False
+
+        self._resolve_ready(True)
+        return True
+
+    def use_buffer_calibration(self, calibration: dict[str, int], on_calibrated=None) -> None:
+        """Sets previously saved buffer calibrations (call before init); on_calibrated(dict) is told about new ones."""
+        self.buffer_calibration = dict(calibration)
+        self.on_calibrated = on_calibrated
+
+    def _device_key(self) -> str:
+        # Stability depends on the rate too, so e.g. a switch to wav/pcm output recalibrates
+        return f"{audio_calibration.output_device_fingerprint()}@{self.frequency or 'default'}"
+
+    def _init_calibrated_mixer(self, init_kwargs: dict) -> int:
+        """Opens the mixer with the calibrated buffer for the current output device, calibrating first if it is new."""
+        pygame.mixer.init(buffer=config.AUDIO_BUFFER_SIZE, **init_kwargs) # The audio subsystem must be up to list devices
+        device = self._device_key()
+        buffer = self.buffer_calibration.get(device)
+        if buffer is None:
+            self.logger.info("Calibrating audio buffer for output device '%s'...", device)
+            buffer = audio_calibration.calibrate(init_kwargs)
+            if buffer is not None:
+                self.buffer_calibration[device] = buffer
+                if self.on_calibrated is not None:
+                    self.on_calibrated(dict(self.buffer_calibration))
+            else:
+                buffer = config.AUDIO_BUFFER_SIZE # Not saved, so the next start tries again
+        if buffer != config.AUDIO_BUFFER_SIZE or not pygame.mixer.get_init():
+            pygame.mixer.quit()
+            pygame.mixer.init(buffer=buffer, **init_kwargs)
+        self.output_device = device
+        return buffer
+
+    def _watch_output_device(self) -> None:
+        """Re-opens the mixer when the output device changes (never during playback). Runs on the AudioInit thread."""
+        while not self._stop_init.wait(config.AUDIO_DEVICE_POLL_S):
+            if not self.initialized:
+                self._try_init_mixer() # Lost on an earlier device change; keep retrying
+                continue
+            if self.is_busy():
+                continue
+            with self._init_lock:
+                if self._stop_init.is_set() or not self.initialized:
+                    return
+                device = self._device_key()
+                if device == self.output_device:
+                    continue
+                self.logger.info("Audio output device changed ('%s' -> '%s'); re-opening the mixer.", self.output_device, device)
+                self.stop()
+                self.clear_cache() # Sounds belong to the old mixer
+                self.initialized = False
+                pygame.mixer.quit()
+            self._try_init_mixer()
 
+    def _resolve_ready(self, value: bool) -> None:
+        """Completes the `ready` future once; later calls are ignored."""
         try:
-            # Initialize pygame mixer with configurable buffer size
-            pygame.mixer.init(buffer=buffer_size)
-            self.initialized = True
-            self.logger.info(f"Pygame mixer initialized successfully (buffer={buffer_size}).")
-        except pygame.error as e:
-            self.logger.error(f"Error initializing pygame mixer: {e}. Audio playback disabled.", exc_info=True)
+            self.ready.set_result(value)
+        except InvalidStateError:
+            pass
+
+    def init_in_background(self, retry_delay: float = 2.0, max_retry_delay: float = 30.0) -> None:
+        """
+        Initializes the mixer on a daemon thread, retrying with exponential
+        backoff until it succeeds or quit() is called. Safe to call repeatedly.
+        """
+        if self.initialized or (self._init_thread and self._init_thread.is_alive()):
+            return
+
+        def _init_loop():
+            delay = retry_delay
+            while not self._stop_init.is_set():
+                if self._try_init_mixer():
+                    if self.buffer_size is None:
+                        self._watch_output_device()
+                    return
+                self.logger.warning("Audio init failed, retrying in %.0fs (text chat keeps working).", delay)
+                if self._stop_init.wait(delay):
+                    break
+                delay = min(delay * 2, max_retry_delay)
+
+        self._init_thread = threading.Thread(target=_init_loop, name="AudioInit", daemon=True)
+        self._init_thread.start()
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Blocks (off the UI thread) until the mixer is ready. Returns False on timeout or if audio never came up."""
+        if self.initialized:
+            return True
+        try:
+            return bool(self.ready.result(timeout=timeout))
+        except FuturesTimeoutError:
+            return False
 
     def preload_sound(self, filepath: str, sound_id: str | None = None) -> bool:
         """
@@ -42,48 +207,60 @@ class AudioPlayer:
         try:
             sound = pygame.mixer.Sound(filepath)
             self.sound_cache[sound_id] = sound
-            self.logger.debug(f"Preloaded sound '{sound_id}' from {filepath}")
+            self.logger.debug("Preloaded sound '%s' from %s", sound_id, filepath)
             return True
         except pygame.error as e:
-            self.logger.error(f"Pygame error preloading sound '{sound_id}' from {filepath}: {e}", exc_info=True)
+            self.logger.error("Pygame error preloading sound '%s' from %s: %s", sound_id, filepath, e, exc_info=True)
             return False
         except FileNotFoundError:
-            self.logger.error(f"Sound file not found at {filepath} during preload for '{sound_id}'")
+            self.logger.error("Sound file not found at %s during preload for '%s'", filepath, sound_id)
             return False
         except Exception as e:
-            self.logger.error(f"Unexpected error preloading sound '{sound_id}': {e}", exc_info=True)
+            self.logger.error("Unexpected error preloading sound '%s': %s", sound_id, e, exc_info=True)
             return False
 
-    def play_sound(self, filepath: str, use_cache: bool = True) -> bool:
+    def play_sound(self, filepath: str, use_cache: bool = True, speed: float = 1.0) -> bool:
         """
         Loads a sound file and plays it on an available channel.
         Returns True if playback started successfully, False otherwise.
         Stores the channel used for potential stopping.
 
         If use_cache is True, will check for preloaded sound first.
+        A speed other than 1.0 replays the clip time-stretched locally
+        (pitch preserved) instead of regenerating it through the TTS API.
+        Files larger than stream_threshold_bytes (and not already cached) are
+        streamed via pygame.mixer.music, so memory use does not grow with clip
+        length and playback starts without decoding the whole file first.
         """
         if not self.initialized:
             self.logger.warning("AudioPlayer not initialized, cannot play sound.")
             return False
 
-        if self.current_channel and self.current_channel.get_busy():
-            self.logger.warning("Already playing a sound, stopping previous one.")
-            self.current_channel.stop()
+        self._stop_previous_playback()
+
+        if speed != 1.0:
+            stretched = self.get_stretched_sound(filepath, speed)
+            if stretched is not None:
+                return self._play_sound_object(stretched, f"{filepath} @ {speed}x")
+            self.logger.warning("Time-stretch unavailable, playing '%s' at normal speed.", filepath)
+
+        if not (use_cache and filepath in self.sound_cache) and self.should_stream(filepath):
+            return self._play_streamed(filepath)
 
         try:
             sound: pygame.mixer.Sound | None = None
             if use_cache and filepath in self.sound_cache:
                 sound = self.sound_cache[filepath]
-                self.logger.debug(f"Using cached sound for {filepath}")
+                self.logger.debug("Using cached sound for %s", filepath)
             else:
-                self.logger.debug(f"Loading sound: {filepath}")
+                self.logger.debug("Loading sound: %s", filepath)
                 sound = pygame.mixer.Sound(filepath)
                 # Optionally cache for future use
                 if use_cache:
                     self.sound_cache[filepath] = sound
 
             # Play the sound immediately without delay
-            self.logger.debug(f"Playing sound '{filepath}'...")
+            self.logger.debug("Playing sound '%s'...", filepath)
             self.current_channel = sound.play()
 
             if self.current_channel is None:
@@ -94,19 +271,223 @@ class AudioPlayer:
             return True
 
         except pygame.error as e:
-            self.logger.error(f"Pygame error loading/playing sound file {filepath}: {e}", exc_info=True)
+            self.logger.error("Pygame error loading/playing sound file %s: %s", filepath, e, exc_info=True)
             self.current_channel = None
             return False
         except FileNotFoundError:
-            self.logger.error(f"Error: Sound file not found at {filepath}")
+            self.logger.error("Error: Sound file not found at %s", filepath)
             self.current_channel = None
             return False
         except Exception as e:
-            self.logger.error(f"Unexpected error playing sound '{filepath}': {e}", exc_info=True)
+            self.logger.error("Unexpected error playing sound '%s': %s", filepath, e, exc_info=True)
             self.current_channel = None
             return False
 
 
+    def _sound_from_pcm(self, pcm_data: bytes, sample_rate: int) -> "pygame.mixer.Sound":
+        """
+        Builds a Sound from raw 16-bit mono PCM. If the mixer runs at the same
+        format the bytes are used as-is; otherwise they are wrapped in a WAV
+        header and pygame converts them (the slow path).
+        """
+        mixer_rate, mixer_size, mixer_channels = pygame.mixer.get_init()
+        if mixer_rate == sample_rate and mixer_size == -16 and mixer_channels == 1:
+            return pygame.mixer.Sound(buffer=pcm_data)
+        self.logger.debug("Mixer format %s != PCM (%s, -16, 1); converting.", pygame.mixer.get_init(), sample_rate)
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm_data)
+        wav_buffer.seek(0)
+        return pygame.mixer.Sound(file=wav_buffer)
+
+    def play_pcm(self, pcm_data: bytes, sample_rate: int = config.TTS_NATIVE_SAMPLE_RATE,
+                 sound_id: str | None = None) -> bool:
+        """
+        Plays raw 16-bit mono PCM from memory. Returns True if playback started.
+        If sound_id is given the Sound is cached under it (e.g. the archive path).
+        """
+        if not self.initialized:
+            self.logger.warning("AudioPlayer not initialized, cannot play PCM audio.")
+            return False
+
+        self._stop_previous_playback()
+
+        try:
+            sound = self._sound_from_pcm(pcm_data, sample_rate)
+            if sound_id is not None:
+                self.sound_cache[sound_id] = sound
+            self.current_channel = sound.play()
+            if self.current_channel is None:
+                self.logger.error("Failed to get channel for PCM playback.")
+                return False
+            self.logger.debug("PCM sound playing (%s bytes).", len(pcm_data))
+            return True
+        except pygame.error as e:
+            self.logger.error("Pygame error playing PCM audio: %s", e, exc_info=True)
+            self.current_channel = None
+            return False
+        except Exception as e:
+            self.logger.error("Unexpected error playing PCM audio: %s", e, exc_info=True)
+            self.current_channel = None
+            return False
+
+    def queue_pcm(self, pcm_data: bytes, sample_rate: int = config.TTS_NATIVE_SAMPLE_RATE) -> bool:
+        """
+        Appends raw PCM to the current channel so it plays right after the current
+        clip with no gap (or starts it if nothing is playing). A pygame channel
+        holds one queued sound: returns False if that slot is taken - try again
+        shortly. Decoding errors are raised.
+        """
+        if not self.initialized:
+            raise RuntimeError("AudioPlayer not initialized, cannot queue PCM audio.")
+        channel = self.current_channel
+        if channel is not None and channel.get_busy():
+            if channel.get_queue() is not None:
+                return False
+            channel.queue(self._sound_from_pcm(pcm_data, sample_rate))
+            self.logger.debug("Queued %s bytes of PCM behind the current clip.", len(pcm_data))
+            return True
+        self.current_channel = self._sound_from_pcm(pcm_data, sample_rate).play() # Previous chunk already finished (underrun)
+        if self.current_channel is None:
+            raise RuntimeError("Failed to get channel for queued PCM playback.")
+        return True
+
+    def play_encoded(self, audio_data: bytes, sound_id: str, speed: float = 1.0) -> bool:
+        """
+        Plays an encoded clip (MP3/WAV bytes, e.g. read from the packed segment
+        store) from memory, with no file on disk. The decoded Sound is cached
+        under sound_id; a speed other than 1.0 is time-stretched as in play_sound().
+        """
+        if not self.initialized:
+            self.logger.warning("AudioPlayer not initialized, cannot play in-memory audio.")
+            return False
+
+        self._stop_previous_playback()
+
+        try:
+            sound = self.sound_cache.get(sound_id)
+            if sound is None:
+                sound = pygame.mixer.Sound(file=io.BytesIO(audio_data))
+                self.sound_cache[sound_id] = sound
+            if speed != 1.0:
+                stretched = self.get_stretched_sound(sound_id, speed) # Uses the cached Sound as its source
+                if stretched is not None:
+                    return self._play_sound_object(stretched, f"{sound_id} @ {speed}x")
+                self.logger.warning("Time-stretch unavailable, playing '%s' at normal speed.", sound_id)
+            return self._play_sound_object(sound, sound_id)
+        except pygame.error as e:
+            self.logger.error("Pygame error decoding in-memory audio '%s': %s", sound_id, e, exc_info=True)
+            self.current_channel = None
+            return False
+        except Exception as e:
+            self.logger.error("Unexpected error playing in-memory audio '%s': %s", sound_id, e, exc_info=True)
+            self.current_channel = None
+            return False
+
+    def _play_sound_object(self, sound: "pygame.mixer.Sound", label: str) -> bool:
+        """Plays an already-built Sound and remembers its channel."""
+        try:
+            self.current_channel = sound.play()
+            if self.current_channel is None:
+                self.logger.error("Failed to get channel for playback of '%s'.", label)
+                return False
+            self.logger.debug("Sound '%s' playing.", label)
+            return True
+        except pygame.error as e:
+            self.logger.error("Pygame error playing '%s': %s", label, e, exc_info=True)
+            self.current_channel = None
+            return False
+
+    def get_stretched_sound(self, filepath: str, speed: float) -> "pygame.mixer.Sound | None":
+        """
+        Returns the clip time-stretched to `speed`, cached per (clip, speed).
+        Long clips are stretched in a worker process so the GIL stays free for
+        the UI. Blocking - call from a playback thread. Returns None if NumPy
+        or pygame.sndarray is unavailable or stretching fails.
+        """
+        cache_key = (filepath, speed)
+        if cache_key in self.stretch_cache:
+            self.logger.debug("Using cached stretched sound for %s", cache_key)
+            return self.stretch_cache[cache_key]
+        try:
+            import time_stretch
+            from pygame import sndarray
+        except ImportError as e:
+            self.logger.warning("Local time-stretch needs NumPy: %s", e)
+            return None
+
+        try:
+            source = self.sound_cache.get(filepath)
+            if source is None:
+                source = pygame.mixer.Sound(filepath)
+            samples = sndarray.array(source)
+            if len(samples) > config.TIME_STRETCH_POOL_MIN_SAMPLES:
+                stretched_samples = self._get_stretch_pool().submit(time_stretch.stretch_int16, samples, speed).result()
+            else:
+                stretched_samples = time_stretch.stretch_int16(samples, speed)
+            sound = sndarray.make_sound(stretched_samples)
+            self.stretch_cache[cache_key] = sound
+            self.logger.debug("Stretched '%s' to %sx (%s -> %s frames).", filepath, speed, len(samples), len(stretched_samples))
+            return sound
+        except Exception as e:
+            self.logger.error("Error time-stretching '%s' to %sx: %s", filepath, speed, e, exc_info=True)
+            return None
+
+    def _get_stretch_pool(self):
+        """Creates the single-worker process pool used for heavy time-stretching."""
+        if self._stretch_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._stretch_pool = ProcessPoolExecutor(max_workers=1)
+        return self._stretch_pool
+
+    def should_stream(self, filepath: str) -> bool:
+        """True if the file is large enough that play_sound() streams it instead of decoding it fully into RAM."""
+        try:
+            return Path(filepath).stat().st_size > self.stream_threshold_bytes
+        except OSError:
+            return False # Let the normal path report the missing file
+
+    def _play_streamed(self, filepath: str) -> bool:
+        """Streams a long file through pygame.mixer.music (decoded in small chunks by SDL_mixer)."""
+        try:
+            self.logger.debug("Streaming long sound '%s' via mixer.music...", filepath)
+            pygame.mixer.music.load(filepath)
+            pygame.mixer.music.play()
+            self.current_channel = None
+            self.streaming = True
+            return True
+        except pygame.error as e:
+            self.logger.error("Pygame error streaming sound file %s: %s", filepath, e, exc_info=True)
+            self.streaming = False
+            return False
+        except Exception as e:
+            self.logger.error("Unexpected error streaming sound '%s': %s", filepath, e, exc_info=True)
+            self.streaming = False
+            return False
+
+    def _stop_streamed(self) -> None:
+        """Stops and unloads the streamed track, if any."""
+        if not self.streaming:
+            return
+        try:
+            pygame.mixer.music.stop()
+            pygame.mixer.music.unload()
+        except pygame.error as e:
+            self.logger.error("Pygame error stopping streamed playback: %s", e, exc_info=True)
+        self.streaming = False
+
+    def _stop_previous_playback(self) -> None:
+        """Stops whatever is playing (channel or stream) before starting something new."""
+        if self.streaming:
+            self.logger.warning("Already streaming a sound, stopping previous one.")
+            self._stop_streamed()
+        if self.current_channel and self.current_channel.get_busy():
+            self.logger.warning("Already playing a sound, stopping previous one.")
+            self.current_channel.stop()
+
     def play_cached_sound(self, sound_id: str) -> bool:
         """Play a sound that has been previously cached by ID."""
         if not self.initialized:
@@ -114,30 +495,28 @@ class AudioPlayer:
              return False
 
         if sound_id not in self.sound_cache:
-            self.logger.warning(f"Sound '{sound_id}' not found in cache")
+            self.logger.warning("Sound '%s' not found in cache", sound_id)
             return False
 
-        if self.current_channel and self.current_channel.get_busy():
-            self.logger.warning("Already playing a sound, stopping previous one.")
-            self.current_channel.stop()
+        self._stop_previous_playback()
 
         try:
             sound = self.sound_cache[sound_id]
-            self.logger.debug(f"Playing cached sound '{sound_id}'...")
+            self.logger.debug("Playing cached sound '%s'...", sound_id)
             self.current_channel = sound.play()
 
             if self.current_channel is None:
-                self.logger.error(f"Failed to get channel for playback of cached sound '{sound_id}'.")
+                self.logger.error("Failed to get channel for playback of cached sound '%s'.", sound_id)
                 return False
 
-            self.logger.debug(f"Cached sound '{sound_id}' playing.")
+            self.logger.debug("Cached sound '%s' playing.", sound_id)
             return True
         except pygame.error as e:
-            self.logger.error(f"Pygame error playing cached sound '{sound_id}': {e}", exc_info=True)
+            self.logger.error("Pygame error playing cached sound '%s': %s", sound_id, e, exc_info=True)
             self.current_channel = None
             return False
         except Exception as e:
-            self.logger.error(f"Unexpected error playing cached sound '{sound_id}': {e}", exc_info=True)
+            self.logger.error("Unexpected error playing cached sound '%s': %s", sound_id, e, exc_info=True)
             self.current_channel = None
             return False
 
@@ -148,6 +527,10 @@ class AudioPlayer:
 
         self.logger.debug("AudioPlayer stop requested.")
 
+        if self.streaming:
+            self._stop_streamed()
+            self.logger.debug("Stopped streamed playback.")
+
         if self.current_channel and self.current_channel.get_busy():
             self.current_channel.stop()
             self.logger.debug("Stopped playback on specific channel.")
@@ -157,16 +540,23 @@ class AudioPlayer:
                 pygame.mixer.stop()
                 self.logger.debug("Called pygame.mixer.stop() (fallback/ensure stopped).")
             except pygame.error as e:
-                 self.logger.error(f"Pygame error during mixer.stop(): {e}", exc_info=True)
+                 self.logger.error("Pygame error during mixer.stop(): %s", e, exc_info=True)
 
 
         self.current_channel = None  # Clear channel reference
 
     def is_busy(self) -> bool:
-        """Checks if the stored channel is currently playing."""
+        """Checks if the stored channel (or the streamed track) is currently playing."""
         if not self.initialized:
             return False
 
+        if self.streaming:
+            if pygame.mixer.music.get_busy():
+                return True
+            self.logger.debug("Streamed playback finished.")
+            self._stop_streamed()
+            return False
+
         # Check if the specific channel we started is busy
         if self.current_channel and self.current_channel.get_busy():
             return True
@@ -181,10 +571,17 @@ class AudioPlayer:
     def clear_cache(self) -> None:
         """Clear the sound cache to free memory."""
         self.sound_cache.clear()
+        self.stretch_cache.clear()
         self.logger.info("Sound cache cleared.")
 
     def quit(self) -> None:
         """Stops playback, clears cache, and quits the pygame mixer."""
+        # Stop any pending background init and release waiters
+        self._stop_init.set()
+        self._resolve_ready(False)
+        if self._stretch_pool is not None:
+            self._stretch_pool.shutdown(wait=False, cancel_futures=True)
+            self._stretch_pool = None
         if self.initialized:
             try:
                 self.logger.info("Quitting AudioPlayer...")
@@ -197,5 +594,5 @@ class AudioPlayer:
                 self.initialized = False
                 self.logger.info("Pygame mixer quit successfully.")
             except pygame.error as e:
-                self.logger.error(f"Error quitting pygame mixer: {e}", exc_info=True)
+                self.logger.error("Error quitting pygame mixer: %s", e, exc_info=True)
 
@@ -0,0 +1,145 @@
+# chunked_text.py
+# Incremental loading of large strings into CTkTextbox / tk.Text widgets.
+#
+# A single insert() of a 100 KB string blocks the Tk main thread for the whole
+# layout. Here the first (visible) chunk is inserted immediately and the rest is
+# appended from idle callbacks under a small per-step time budget. Beyond
+# TEXTBOX_EAGER_CHARS the remainder is only loaded when the user scrolls near the
+# end, copies/selects all, or the app needs the full text (materialize()).
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# How often a paused (lazy) load checks whether the user has scrolled near its end
+LAZY_POLL_MS = 250
+LAZY_RESUME_FRACTION = 0.9
+
+
+@dataclass
+class _TextJob:
+    text: str
+    position: int # Characters of text already inserted
+    eager_until: int # Load automatically up to here, then wait for scroll/copy
+    after_id: str | None = None
+
+
+def _split_point(text: str, start: int, size: int) -> int:
+    """End index of the next chunk, preferring to break just after a newline."""
+    end = start + size
+    if end >= len(text):
+        return len(text)
+    newline = text.rfind("\n", start + size // 2, end)
+    return newline + 1 if newline != -1 else end
+
+
+class ChunkedTextLoader:
+    """Replaces widget contents with large texts without blocking the event loop for more than one step."""
+
+    def __init__(self, app, first_chunk_chars: int = config.TEXTBOX_FIRST_CHUNK_CHARS,
+                 chunk_chars: int = config.TEXTBOX_CHUNK_CHARS,
+                 step_budget_ms: float = config.TEXTBOX_STEP_BUDGET_MS,
+                 eager_chars: int = config.TEXTBOX_EAGER_CHARS):
+        self.app = app
+        self.first_chunk_chars = first_chunk_chars
+        self.chunk_chars = chunk_chars
+        self.step_budget_s = step_budget_ms / 1000.0
+        self.eager_chars = eager_chars
+        self._jobs: dict = {} # widget -> _TextJob
+        self._bound_widgets: set = set()
+
+    def set_text(self, widget, text: str):
+        """Replaces the widget's contents with text; the widget's state (e.g. disabled) is preserved."""
+        self.cancel(widget)
+        text = text or ""
+        self._bind_materialize_triggers(widget)
+        first_end = _split_point(text, 0, self.first_chunk_chars)
+        with _writable(widget):
+            widget.delete("0.0", "end")
+            widget.insert("end", text[:first_end])
+        if first_end < len(text):
+            job = _TextJob(text=text, position=first_end, eager_until=max(self.eager_chars, first_end))
+            self._jobs[widget] = job
+            job.after_id = self.app.after_idle(self._step, widget)
+
+    def is_loading(self, widget) -> bool:
+        return widget in self._jobs
+
+    def cancel(self, widget):
+        """Drops any pending chunks for widget (its current contents are left as they are)."""
+        job = self._jobs.pop(widget, None)
+        if job is not None and job.after_id is not None:
+            try: self.app.after_cancel(job.after_id)
+            except Exception: pass
+
+    def materialize(self, widget):
+        """Inserts everything still pending for widget right now (used before reading or copying its text)."""
+        job = self._jobs.get(widget)
+        if job is None:
+            return
+        self.cancel(widget)
+        if widget.winfo_exists():
+            with _writable(widget):
+                widget.insert("end", job.text[job.position:])
+        logger.debug("Materialized %s remaining characters in one step.", len(job.text) - job.position)
+
+    def _step(self, widget):
+        job = self._jobs.get(widget)
+        if job is None:
+            return
+        job.after_id = None
+        if not widget.winfo_exists():
+            self._jobs.pop(widget, None)
+            return
+        deadline = time.perf_counter() + self.step_budget_s
+        with _writable(widget):
+            while job.position < len(job.text) and job.position < job.eager_until and time.perf_counter() < deadline:
+                end = _split_point(job.text, job.position, self.chunk_chars)
+                widget.insert("end", job.text[job.position:end])
+                job.position = end
+        if job.position >= len(job.text):
+            self._jobs.pop(widget, None)
+        elif job.position >= job.eager_until:
+            job.after_id = self.app.after(LAZY_POLL_MS, self._poll_scroll, widget)
+        else:
+            job.after_id = self.app.after_idle(self._step, widget)
+
+    def _poll_scroll(self, widget):
+        """While paused, resumes loading once the user has scrolled near the end of what is loaded."""
+        job = self._jobs.get(widget)
+        if job is None:
+            return
+        if not widget.winfo_exists():
+            self._jobs.pop(widget, None)
+            return
+        if widget.yview()[1] >= LAZY_RESUME_FRACTION:
+            job.eager_until = job.position + self.eager_chars
+            job.after_id = self.app.after_idle(self._step, widget)
+        else:
+            job.after_id = self.app.after(LAZY_POLL_MS, self._poll_scroll, widget)
+
+    def _bind_materialize_triggers(self, widget):
+        if widget in self._bound_widgets:
+            return
+        # Handlers return None, so the widget's own copy/select-all bindings still run afterwards
+        for sequence in ("<<Copy>>", "<<Cut>>", "<<SelectAll>>"):
+            widget.bind(sequence, lambda event, w=widget: self.materialize(w), add="+")
+        self._bound_widgets.add(widget)
+
+
+@contextmanager
+def _writable(widget):
+    """Temporarily sets a (possibly disabled) text widget to state="normal"."""
+    state = str(widget.cget("state"))
+    if state != "normal":
+        widget.configure(state="normal")
+    try:
+        yield widget
+    finally:
+        if state != "normal":
+            widget.configure(state=state)
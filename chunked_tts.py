@@ -0,0 +1,121 @@
+# chunked_tts.py
+# Parallel synthesis of long texts.
+#
+# One TTS call for a multi-thousand-character text is slow (synthesis time grows
+# with length) or fails outright above the API's input limit. Long texts are split
+# at paragraph and sentence boundaries into chunks below the limit - the first one
+# short, so playback can start early - and the chunks are synthesized concurrently
+# with at most TTS_CHUNK_WORKERS calls in flight. Chunks are requested as raw PCM,
+# so joining them in order is a lossless byte concatenation; the joined clip is
+# archived as .wav.
+
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import AsyncIterator
+
+import config
+import api_handler
+import tts_text
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])[\"')\]]*\s+")
+
+
+def needs_chunking(spoken: str) -> bool:
+    """True if spoken (text already prepared by tts_text.speech_text) is long enough for chunked synthesis."""
+    return len(spoken) > config.TTS_CHUNK_THRESHOLD_CHARS
+
+
+def _units(text: str, max_chars: int) -> list[str]:
+    """Paragraphs, else sentences, else whitespace-split pieces - each at most max_chars."""
+    units = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars: # A single run-on sentence: break at the last space that fits
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                units.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                units.append(sentence)
+    return units
+
+
+def split_for_speech(text: str, max_chars: int = config.TTS_CHUNK_MAX_CHARS,
+                     first_chunk_chars: int = config.TTS_FIRST_CHUNK_CHARS) -> list[str]:
+    """Packs paragraph/sentence units greedily into chunks; the first chunk is kept short."""
+    chunks, current = [], ""
+    units = _units(text, max_chars)
+    if units and len(units[0]) > first_chunk_chars:
+        units[:1] = _units(units[0], first_chunk_chars) # A long opening paragraph is split further, so playback starts early
+    for unit in units:
+        limit = first_chunk_chars if not chunks else max_chars
+        joined = f"{current}\n{unit}" if current else unit
+        if current and len(joined) > limit:
+            chunks.append(current)
+            current = unit
+        else:
+            current = joined
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ChunkedSynthesis:
+    """Synthesizes the chunks of one text concurrently; results are consumed in order."""
+
+    def __init__(self, client, text: str, model: str = config.DEFAULT_TTS_MODEL,
+                 voice: str = config.DEFAULT_TTS_VOICE, speed: float = config.DEFAULT_TTS_SPEED,
+                 max_workers: int = config.TTS_CHUNK_WORKERS, timeout_s: float = config.TTS_REQUEST_TIMEOUT_S,
+                 spoken: str | None = None):
+        self.client = client
+        self.model, self.voice, self.speed = model, voice, speed
+        self.timeout_s = timeout_s
+        if spoken is None: spoken = tts_text.speech_text(text) # Callers that checked needs_chunking() pass it, preprocessing runs once
+        self.metrics = tts_text.preprocessing_metrics(text, spoken, speed)
+        self.chunks = split_for_speech(spoken)
+        self._slots = asyncio.Semaphore(max_workers)
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """Schedules every chunk (call on the event loop); the semaphore admits them in order."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._synthesize(index, chunk)) for index, chunk in enumerate(self.chunks)]
+            logger.info("Chunked TTS: %s chars in %s chunks.", sum(len(c) for c in self.chunks), len(self.chunks))
+
+    async def _synthesize(self, index: int, chunk: str) -> bytes:
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(api_handler.generate_speech_async(
+                    self.client, chunk, Path(), self.model, self.voice, self.speed, "pcm", spoken=chunk), self.timeout_s) # Chunks are already prepared; PCM is returned, no file written
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"Speech generation for chunk {index + 1}/{len(self.chunks)} timed out after {self.timeout_s:.0f}s") from None
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yields each chunk's PCM in order, as soon as that chunk is done."""
+        self.start()
+        for task in self._tasks:
+            yield await asyncio.shield(task) # A consumer that stops early must not cancel the synthesis
+
+    async def joined(self) -> bytes:
+        """The whole clip: all chunks' PCM concatenated in order. Cancels the rest if one chunk fails."""
+        self.start()
+        try:
+            return b"".join(await asyncio.gather(*self._tasks))
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,149 @@
+# compare_window.py
+# Defines the "Compare Models" Toplevel: one prompt, several models, answers side by side
+
+import customtkinter
+import logging
+
+import config
+import model_compare
+from model_stats import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class CompareWindow(customtkinter.CTkToplevel):
+    """
+    Streams the same prompt from the selected models at once (model_compare.py). Each
+    answer fills its own pane with live timings; one of them can be kept in history.
+    Completed answers are recorded in the app's per-model statistics.
+    """
+    def __init__(self, master_app, prompt: str, model_list: list):
+        super().__init__(master_app)
+
+        self.master_app = master_app
+        self.comparison = None # concurrent Future of the running comparison
+        self._generation = 0 # Bumped per comparison; updates from an abandoned one are ignored
+        self._prompt = ""
+        self._panes: dict[str, dict] = {}
+        self._runs: dict[str, model_compare.CompareRun] = {}
+
+        self.title("Compare Models")
+        self.geometry("1000x640")
+        self.transient(master_app)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(3, weight=1)
+
+        # --- Prompt --- (Row 0)
+        self.prompt_textbox = customtkinter.CTkTextbox(self, height=70, wrap="word")
+        self.prompt_textbox.grid(row=0, column=0, padx=15, pady=(15, 5), sticky="ew")
+        self.prompt_textbox.insert("0.0", prompt)
+        self.prompt_textbox.bind("<Control-Return>", lambda event: (self.start_comparison(), "break")[1])
+
+        # --- Model checkboxes (current model and COMPARE_DEFAULT_MODELS preselected) --- (Row 1)
+        models = [m for m in model_list if m != config.AUTO_CHAT_MODEL]
+        current_model = master_app.resolve_chat_model()
+        if current_model not in models: models.insert(0, current_model)
+        preselected = [m for m in [current_model, *config.COMPARE_DEFAULT_MODELS] if m in models]
+        preselected = list(dict.fromkeys(preselected))[:config.COMPARE_MAX_MODELS]
+        models_frame = customtkinter.CTkScrollableFrame(self, height=60, label_text=f"Models (up to {config.COMPARE_MAX_MODELS})")
+        models_frame.grid(row=1, column=0, padx=15, pady=5, sticky="ew")
+        self.model_checkboxes = {}
+        for i, model in enumerate(models):
+            checkbox = customtkinter.CTkCheckBox(models_frame, text=model)
+            checkbox.grid(row=i // 4, column=i % 4, padx=5, pady=2, sticky="w")
+            if model in preselected: checkbox.select()
+            self.model_checkboxes[model] = checkbox
+
+        # --- Compare button + status --- (Row 2)
+        controls_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        controls_frame.grid(row=2, column=0, padx=15, pady=5, sticky="ew")
+        controls_frame.grid_columnconfigure(1, weight=1)
+        self.compare_button = customtkinter.CTkButton(controls_frame, text="Compare", width=120, command=self.start_comparison)
+        self.compare_button.grid(row=0, column=0, padx=(0, 10), sticky="w")
+        self.status_label = customtkinter.CTkLabel(controls_frame, text="Select models and press Compare (Ctrl+Enter).", anchor="w")
+        self.status_label.grid(row=0, column=1, sticky="ew")
+
+        # --- One pane per model, created per comparison --- (Row 3)
+        self.panes_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.panes_frame.grid(row=3, column=0, padx=10, pady=(5, 15), sticky="nsew")
+        self.panes_frame.grid_rowconfigure(0, weight=1)
+
+        self.protocol("WM_DELETE_WINDOW", self.close_window)
+
+    def start_comparison(self):
+        prompt = self.prompt_textbox.get("0.0", "end-1c").strip()
+        models = [model for model, checkbox in self.model_checkboxes.items() if checkbox.get()]
+        if not prompt: self.status_label.configure(text="Enter a prompt to compare."); return
+        if not models: self.status_label.configure(text="Select at least one model."); return
+        if len(models) > config.COMPARE_MAX_MODELS: self.status_label.configure(text=f"Select at most {config.COMPARE_MAX_MODELS} models."); return
+        self._cancel_comparison()
+        self._generation += 1; self._prompt = prompt; self._runs = {}
+        self._build_panes(models)
+        self.status_label.configure(text=f"Asking {len(models)} models...")
+        self.comparison = self.master_app.engine.submit(self._run_comparison(self._generation, prompt, models), name="ModelCompare")
+
+    def _build_panes(self, models: list[str]):
+        for child in self.panes_frame.winfo_children(): child.destroy()
+        for column in range(config.COMPARE_MAX_MODELS): self.panes_frame.grid_columnconfigure(column, weight=0, uniform="")
+        self._panes = {}
+        for column, model in enumerate(models):
+            self.panes_frame.grid_columnconfigure(column, weight=1, uniform="pane")
+            pane = customtkinter.CTkFrame(self.panes_frame)
+            pane.grid(row=0, column=column, padx=5, sticky="nsew")
+            pane.grid_columnconfigure(0, weight=1); pane.grid_rowconfigure(2, weight=1)
+            title_label = customtkinter.CTkLabel(pane, text=model, font=customtkinter.CTkFont(weight="bold"), anchor="w")
+            title_label.grid(row=0, column=0, padx=8, pady=(6, 0), sticky="ew")
+            metrics_label = customtkinter.CTkLabel(pane, text="Waiting for first token...", anchor="w", justify="left", wraplength=200)
+            metrics_label.grid(row=1, column=0, padx=8, pady=(0, 4), sticky="ew")
+            textbox = customtkinter.CTkTextbox(pane, wrap="word", state="disabled")
+            textbox.grid(row=2, column=0, padx=6, pady=4, sticky="nsew")
+            keep_button = customtkinter.CTkButton(pane, text="Keep This Answer", state="disabled", command=lambda m=model: self.keep_answer(m))
+            keep_button.grid(row=3, column=0, padx=6, pady=(4, 8), sticky="ew")
+            self._panes[model] = {"metrics": metrics_label, "text": textbox, "keep": keep_button}
+
+    # --- Engine loop ---
+    async def _run_comparison(self, generation: int, prompt: str, models: list[str]):
+        post_to_ui = self.master_app.engine.post_to_ui
+        try:
+            client = self.master_app._get_async_client()
+            if not client.api_key: raise ValueError("OpenAI API key missing.")
+            on_progress = lambda run, new_text: post_to_ui(self._update_pane, generation, run.model, new_text, run.summary(), run if run.done else None)
+            runs, wall_s = await model_compare.compare_models(client, prompt, models, on_progress)
+        except Exception as e: # Includes OpenAIError from a client without an API key
+            logger.error("Model comparison failed: %s", e); post_to_ui(self._set_status, generation, f"Error: {e}"); return
+        for run in runs:
+            if run.ok: self.master_app.model_stats.record(run.model, run.latency_s, run.completion_tokens or estimate_tokens(run.text))
+        answered = [run for run in runs if run.ok]
+        slowest = max(answered, key=lambda run: run.latency_s, default=None)
+        status = f"{len(answered)}/{len(runs)} answered in {wall_s:.1f}s"
+        if slowest is not None and len(runs) > 1: status += f" (slowest: {slowest.model}, sequential would take {sum(run.latency_s for run in runs):.1f}s)"
+        post_to_ui(self._set_status, generation, status + ". Keep one answer to add it to history.")
+
+    # --- Tk thread ---
+    def _update_pane(self, generation: int, model: str, new_text: str, summary: str, finished_run):
+        if generation != self._generation or not self.winfo_exists(): return
+        pane = self._panes[model]
+        if new_text:
+            textbox = pane["text"]; textbox.configure(state="normal"); textbox.insert("end", new_text); textbox.configure(state="disabled"); textbox.see("end")
+        pane["metrics"].configure(text=summary)
+        if finished_run is not None:
+            self._runs[model] = finished_run
+            if finished_run.ok: pane["keep"].configure(state="normal")
+
+    def _set_status(self, generation: int, text: str):
+        if generation == self._generation and self.winfo_exists(): self.status_label.configure(text=text)
+
+    def keep_answer(self, model: str):
+        run = self._runs.get(model)
+        if run is None or not run.ok: return
+        self.master_app.keep_compared_answer(self._prompt, run.text, model)
+        for pane_model, pane in self._panes.items(): pane["keep"].configure(state="disabled", text="Kept" if pane_model == model else "Keep This Answer")
+        self.status_label.configure(text=f"Kept the answer from {model} in history.")
+
+    def _cancel_comparison(self):
+        if self.comparison is not None and not self.comparison.done(): self.comparison.cancel(); logger.info("Model comparison cancelled.")
+        self.comparison = None
+
+    def close_window(self):
+        self._cancel_comparison()
+        self.master_app.compare_window_closed()
+        self.destroy()
@@ -1,6 +1,7 @@
 # config.py
 import os
 import sys # <-- Import sys
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -8,6 +9,8 @@ from dotenv import load_dotenv
 # This will work if a .env file is placed next to the final .exe
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- Helper function to get base path ---
 def get_base_path():
     """ Get base path reliably, whether running as script or frozen executable """
@@ -15,12 +18,10 @@ def get_base_path():
         # Running in a PyInstaller bundle (esp. --onefile)
         # sys.executable points to the executable itself
         application_path = Path(os.path.dirname(sys.executable))
-        print(f"DEBUG (Frozen): Base path determined as: {application_path}")
     else:
         # Running as a normal script
         # __file__ points to this config.py file
         application_path = Path(__file__).parent
-        print(f"DEBUG (Script): Base path determined as: {application_path}")
     return application_path
 
 # --- Define Base Data Directory using the helper function ---
@@ -38,15 +39,210 @@ DEFAULT_CHAT_MODEL = os.getenv("DEFAULT_CHAT_MODEL", "gpt-4o")
 DEFAULT_TTS_MODEL = "tts-1"
 DEFAULT_TTS_VOICE = "alloy"
 DEFAULT_TTS_SPEED = 1.0
+# TTS output format: "mp3" (default), "wav" or "pcm". wav/pcm are delivered at the
+# TTS native rate, so the mixer can be opened at that rate and clips play without
+# an MP3 decode or a resample. pcm clips are archived to disk as .wav in the background.
+TTS_RESPONSE_FORMATS = ("mp3", "wav", "pcm")
+TTS_RESPONSE_FORMAT = os.getenv("TTS_RESPONSE_FORMAT", "mp3").lower()
+if TTS_RESPONSE_FORMAT not in TTS_RESPONSE_FORMATS:
+    logger.warning("Unsupported TTS_RESPONSE_FORMAT '%s' (expected one of %s); using mp3.", TTS_RESPONSE_FORMAT, ", ".join(TTS_RESPONSE_FORMATS))
+    TTS_RESPONSE_FORMAT = "mp3"
+TTS_NATIVE_SAMPLE_RATE = 24000 # OpenAI TTS pcm/wav: 24 kHz, 16-bit signed, mono
+RESPONSE_AUDIO_EXTENSIONS = (".mp3", ".wav") # Extensions a saved response clip may have
+# Text sent to TTS is preprocessed (tts_text.py): markdown stripped or verbalized,
+# whitespace collapsed, code blocks optionally skipped.
+TTS_PREPROCESS_ENABLED = os.getenv("TTS_PREPROCESS_ENABLED", "1") != "0"
+TTS_MARKDOWN_MODE = os.getenv("TTS_MARKDOWN_MODE", "strip").lower() # "strip", "verbalize" or "off"
+TTS_SKIP_CODE_BLOCKS = os.getenv("TTS_SKIP_CODE_BLOCKS", "1") != "0"
+TTS_CODE_PLACEHOLDER = "Code omitted." # Spoken in place of a skipped code block
+TTS_CHARS_PER_SECOND = 15.0 # Approximate speaking rate at speed 1.0, for the "audio saved" estimate
+# Texts longer than this (after preprocessing) are split at paragraph/sentence
+# boundaries and the chunks synthesized concurrently (chunked_tts.py). The first
+# chunk is kept short so playback starts early. TTS input limit is 4096 chars.
+TTS_CHUNK_THRESHOLD_CHARS = int(os.getenv("TTS_CHUNK_THRESHOLD_CHARS", "1200"))
+TTS_CHUNK_MAX_CHARS = 800
+TTS_FIRST_CHUNK_CHARS = 250
+TTS_CHUNK_WORKERS = int(os.getenv("TTS_CHUNK_WORKERS", "4"))
+# Optional packed store: recordings are appended to a few segment files (plus an
+# offset index) instead of one file each; retention drops whole segments.
+PACKED_AUDIO_STORE = os.getenv("PACKED_AUDIO_STORE", "0") == "1"
+SEGMENTS_DIR = RESPONSES_DIR / "segments"
+SEGMENT_MAX_BYTES = int(os.getenv("SEGMENT_MAX_BYTES", str(8_000_000)))
+SEGMENT_COMPACT_MIN_AGE_S = 5.0 # Loose clips younger than this may still be being written
+# Background audio backfill for history entries without audio (opt-in; the Settings
+# switch is saved in user_settings.json and overrides this default).
+AUDIO_BACKFILL_ENABLED = os.getenv("AUDIO_BACKFILL_ENABLED", "0") == "1"
+BACKFILL_CONCURRENCY = 1 # Simultaneous TTS calls
+BACKFILL_MIN_INTERVAL_S = 3.0 # Between TTS call starts
+BACKFILL_MAX_BACKOFF_S = 300.0 # Upper bound of the HTTP 429 backoff
+BACKFILL_START_DELAY_S = 15.0 # Leave startup and the first interactions alone
+BACKFILL_IDLE_POLL_S = 1.0 # Re-check interval while a request or playback is active
+BACKFILL_RESCAN_INTERVAL_S = 300.0
+BACKFILL_MAX_ATTEMPTS = 3 # Per entry, before it is skipped for good
+BACKFILL_STATE_FILE = APP_BASE_DATA_DIR / "backfill_state.json"
+
+# TTS voice and speed options (shared by the main app and the Settings window)
+TTS_VOICES = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
+TTS_SPEEDS = { # Dictionary mapping display string to speed float value
+    "0.5x": 0.5, "0.75x": 0.75, "Normal (1.0x)": 1.0,
+    "1.25x": 1.25, "1.5x": 1.5, "2.0x": 2.0,
+}
+
+# --- Model Latency Statistics ---
+AUTO_CHAT_MODEL = "auto (fastest acceptable)" # Chat model setting that picks from measurements
+AUTO_MODEL_CANDIDATES = [m.strip() for m in os.getenv("AUTO_MODEL_CANDIDATES", "gpt-4o-mini,gpt-4o,gpt-3.5-turbo").split(",") if m.strip()]
+AUTO_MODEL_MAX_P95_S = float(os.getenv("AUTO_MODEL_MAX_P95_S", "0")) # 0 = no p95 limit
+MODEL_STATS_MIN_SAMPLES = 3 # Measurements needed before "auto" trusts a model's numbers
+MODEL_STATS_EWMA_ALPHA = 0.3
+MODEL_STATS_FILE = APP_BASE_DATA_DIR / "model_stats.json"
+
+# --- Hedged Chat Requests ---
+# When enabled, a second request goes to the fallback model/endpoint if the primary has not
+# sent its first byte within the HEDGE_PERCENTILE of its observed time-to-first-byte.
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0").lower() in ("1", "true", "yes")
+HEDGE_FALLBACK_MODEL = os.getenv("HEDGE_FALLBACK_MODEL", "") # Empty: same model as the primary
+HEDGE_FALLBACK_BASE_URL = os.getenv("HEDGE_FALLBACK_BASE_URL", "") # Empty: same endpoint
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY_S = 2.0 # Used until HEDGE_MIN_SAMPLES measurements exist
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_S = 0.3
+HEDGE_MAX_DELAY_S = 10.0
+HEDGE_STATS_FILE = APP_BASE_DATA_DIR / "hedge_stats.json"
+
+# --- Logging ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MODULE_LEVELS = os.getenv("LOG_MODULE_LEVELS", "") # e.g. "app_gui=DEBUG,audio_player=WARNING"
+LOG_FILE = APP_BASE_DATA_DIR / "logs" / "app.log"
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUP_COUNT = 3
+
+# --- Startup Performance ---
+# Target for time from process start to the first idle tick of ChatApp's mainloop
+STARTUP_FIRST_PAINT_TARGET_MS = float(os.getenv("STARTUP_FIRST_PAINT_TARGET_MS", "800"))
+STARTUP_PROFILE_FILE = APP_BASE_DATA_DIR / "startup_profile.json"
+# How long a playback request waits for the (background-initialized) audio mixer
+AUDIO_READY_TIMEOUT_S = 5.0
+# Clips larger than this are streamed (pygame.mixer.music) rather than decoded fully into RAM.
+# ~1 MB is about a minute of 128 kbps MP3, or ~20 s of 24 kHz mono WAV.
+AUDIO_STREAM_THRESHOLD_BYTES = int(os.getenv("AUDIO_STREAM_THRESHOLD_BYTES", str(1_000_000)))
+# Replay-speed changes are time-stretched locally; clips longer than this (in sample
+# frames, ~10 s at 44.1 kHz) are stretched in a worker process instead of in-thread.
+TIME_STRETCH_POOL_MIN_SAMPLES = 441_000
+
+# --- Audio Output Latency ---
+# The mixer buffer (in frames) is most of the delay from play() to audible output.
+# With calibration on, the smallest buffer that plays without underruns is measured
+# for each output device on first use (audio_calibration.py) and saved in
+# user_settings.json. The output device is polled, and the mixer is re-opened (and
+# recalibrated for a new device) when it changes. With calibration off,
+# AUDIO_BUFFER_SIZE is used.
+AUDIO_BUFFER_CALIBRATION = os.getenv("AUDIO_BUFFER_CALIBRATION", "1") == "1"
+AUDIO_BUFFER_SIZE = int(os.getenv("AUDIO_BUFFER_SIZE", "2048"))
+AUDIO_BUFFER_CANDIDATES = (4096, 2048, 1024, 512, 256)
+AUDIO_CALIBRATION_TRIALS = 3
+AUDIO_CALIBRATION_PROBE_MS = 150
+AUDIO_CALIBRATION_SLACK_MS = 20 # Timer/scheduler jitter allowed on top of the probe length
+AUDIO_DEVICE_POLL_S = 5.0
+
+# --- On-Demand Sampling Profiler ---
+# Toggled with Ctrl+Shift+P or from Settings; samples every thread's stack for a fixed
+# window and writes "speedscope" JSON (https://www.speedscope.app) or "collapsed" stacks
+# (flamegraph.pl / speedscope both read these). Nothing runs while it is off.
+PROFILES_DIR = APP_BASE_DATA_DIR / "profiles"
+PROFILER_DURATION_S = float(os.getenv("PROFILER_DURATION_S", "15"))
+PROFILER_INTERVAL_S = float(os.getenv("PROFILER_INTERVAL_S", "0.005"))
+PROFILER_OUTPUT_FORMAT = os.getenv("PROFILER_OUTPUT_FORMAT", "speedscope")
+
+# --- Event-Loop Lag Watchdog ---
+# A heartbeat every LAG_TICK_INTERVAL_MS measures Tk scheduling lag; a main-thread stall
+# longer than LAG_STALL_THRESHOLD_MS is logged with its stack. Ctrl+Shift+L logs the
+# histogram and writes LAG_REPORT_FILE (also written on exit).
+LAG_WATCHDOG_ENABLED = os.getenv("LAG_WATCHDOG_ENABLED", "1").lower() not in ("0", "false", "no")
+LAG_TICK_INTERVAL_MS = int(os.getenv("LAG_TICK_INTERVAL_MS", "50"))
+LAG_STALL_THRESHOLD_MS = int(os.getenv("LAG_STALL_THRESHOLD_MS", "200"))
+LAG_REPORT_FILE = APP_BASE_DATA_DIR / "lag_report.json"
+# GUI benchmark results (gui_benchmark.py)
+BENCHMARKS_DIR = APP_BASE_DATA_DIR / "benchmarks"
+
+# --- Large Text Rendering ---
+# Input/output textboxes get the first chunk immediately and the rest in idle-time
+# steps of at most TEXTBOX_STEP_BUDGET_MS. Past TEXTBOX_EAGER_CHARS, more text is
+# loaded only as the user scrolls toward the end (or in full on copy/select-all).
+TEXTBOX_FIRST_CHUNK_CHARS = 4000
+TEXTBOX_CHUNK_CHARS = 4000
+TEXTBOX_STEP_BUDGET_MS = 8.0
+TEXTBOX_EAGER_CHARS = 64_000
+
+# --- Similar Prompt Suggestions ---
+# Before a chat request, history prompts at or above this cosine similarity (hashed
+# TF-IDF) are offered for reuse, answer and audio included, instead of a new round trip.
+SIMILAR_PROMPT_SUGGESTIONS = os.getenv("SIMILAR_PROMPT_SUGGESTIONS", "1").lower() not in ("0", "false", "no")
+SIMILAR_PROMPT_MIN_SCORE = float(os.getenv("SIMILAR_PROMPT_MIN_SCORE", "0.8"))
+SIMILAR_PROMPT_MAX_SUGGESTIONS = 3
+
+# --- Prompt Autocomplete ---
+# Past prompts starting with the typed text are suggested under the input box
+# (prompt_index.py), ranked by frecency: each use counts, halving in weight every
+# AUTOCOMPLETE_HALF_LIFE_S. Lookups run off the Tk thread; results that are not on
+# screen within AUTOCOMPLETE_BUDGET_MS of the keystroke are dropped as stale.
+AUTOCOMPLETE_ENABLED = os.getenv("AUTOCOMPLETE_ENABLED", "1").lower() not in ("0", "false", "no")
+AUTOCOMPLETE_MAX_SUGGESTIONS = 5
+AUTOCOMPLETE_MIN_PREFIX_CHARS = 2
+AUTOCOMPLETE_MAX_INPUT_CHARS = 200 # Longer input is being written, not recalled
+AUTOCOMPLETE_HALF_LIFE_S = 14 * 24 * 3600.0
+AUTOCOMPLETE_BUDGET_MS = 100.0
+
+# --- Speculative Prefetch ---
+# Opt-in (also a Settings switch): once typing pauses for SPECULATIVE_DEBOUNCE_MS, the
+# draft is sent as a streamed chat request in the background, and submitting the same
+# text uses its answer. Edits cancel it. When speculations that were never used have
+# spent SPECULATIVE_WASTE_BUDGET_TOKENS (estimated, prompt + answer) in a session, no
+# new ones start.
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "0").lower() not in ("0", "false", "no")
+SPECULATIVE_DEBOUNCE_MS = int(os.getenv("SPECULATIVE_DEBOUNCE_MS", "900"))
+SPECULATIVE_MIN_CHARS = 12 # Shorter drafts are rarely what gets sent
+SPECULATIVE_WASTE_BUDGET_TOKENS = int(os.getenv("SPECULATIVE_WASTE_BUDGET_TOKENS", "20000"))
+
+# --- Model Comparison ---
+# "Compare models" (Ctrl+Shift+M) streams one prompt from several models at once over
+# the shared async client; the comparison takes as long as the slowest model.
+COMPARE_MAX_MODELS = int(os.getenv("COMPARE_MAX_MODELS", "4"))
+COMPARE_DEFAULT_MODELS = [m.strip() for m in os.getenv("COMPARE_DEFAULT_MODELS", "gpt-4o-mini,gpt-4o").split(",") if m.strip()]
+COMPARE_UI_FLUSH_MS = 50 # Streamed text reaches a pane in batches at most this often
+
+# --- Local Service Mode (service.py) ---
+# Headless HTTP access to chat/TTS/history for local tools. Requests beyond
+# SERVICE_MAX_CONCURRENCY queue; beyond SERVICE_MAX_PENDING they are rejected with 503.
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "4"))
+SERVICE_MAX_PENDING = int(os.getenv("SERVICE_MAX_PENDING", "16"))
+SERVICE_MAX_BODY_BYTES = 1_000_000
+# Streamed chat deltas buffered per request before the upstream read pauses
+SERVICE_STREAM_BUFFER_CHUNKS = 64
+
+# --- Async Request Engine ---
+# Chat/TTS requests run as tasks on one asyncio loop thread; blocking helpers (audio
+# decoding, file writes) share a fixed pool of this many threads.
+ENGINE_BLOCKING_WORKERS = 2
+# How often the Tk thread drains results posted by the engine
+ENGINE_UI_POLL_MS = 20
+# Per-task timeouts (seconds)
+CHAT_REQUEST_TIMEOUT_S = float(os.getenv("CHAT_REQUEST_TIMEOUT_S", "120"))
+TTS_REQUEST_TIMEOUT_S = float(os.getenv("TTS_REQUEST_TIMEOUT_S", "120"))
 
 # --- Ensure Directories Exist ---
-try:
-    APP_BASE_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"Ensured base data directory exists: {APP_BASE_DATA_DIR}")
-    RESPONSES_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"Ensured responses directory exists: {RESPONSES_DIR}")
-except OSError as e:
-    print(f"Warning: Could not create data directories: {e}")
+def ensure_data_dirs():
+    """
+    Creates the data directories if missing. Called explicitly at startup
+    (not at import time) so importing config has no filesystem side effects.
+    """
+    try:
+        APP_BASE_DATA_DIR.mkdir(parents=True, exist_ok=True)
+        RESPONSES_DIR.mkdir(parents=True, exist_ok=True)
+        logger.info("Ensured data directories exist: %s", APP_BASE_DATA_DIR)
+    except OSError as e:
+        logger.warning("Could not create data directories: %s", e)
 
 # Note: OPENAI_API_KEY is still expected as an environment variable,
 # loaded via load_dotenv() from a .env file next to the executable,
@@ -1,31 +1,82 @@
 # file_utils.py
+import wave
+import logging
 from pathlib import Path
 
+import config
+
+logger = logging.getLogger(__name__)
+
+def response_audio_path(responses_dir: Path, timestamp: str, response_format: str = "mp3") -> Path:
+    """Path a new response clip is saved to. pcm clips are archived as .wav."""
+    extension = ".mp3" if response_format == "mp3" else ".wav"
+    return responses_dir / f"response_{timestamp}{extension}"
+
+def find_response_audio(responses_dir: Path, timestamp: str | None) -> Path | None:
+    """Returns the saved clip for a history timestamp (any supported extension), or None."""
+    if not timestamp:
+        return None
+    for extension in config.RESPONSE_AUDIO_EXTENSIONS:
+        candidate = responses_dir / f"response_{timestamp}{extension}"
+        if candidate.exists():
+            return candidate
+    return None
+
+def write_pcm_as_wav(pcm_data: bytes, output_path: Path, sample_rate: int = config.TTS_NATIVE_SAMPLE_RATE):
+    """Archives raw 16-bit mono PCM as a .wav file (header only, no re-encoding)."""
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with wave.open(str(output_path), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm_data)
+        logger.info("Archived PCM audio to: %s", output_path)
+    except Exception as e:
+        logger.error("Error archiving PCM audio to %s: %s", output_path, e)
+        try: output_path.unlink(missing_ok=True) # A truncated file would pass for a recording
+        except OSError: pass
+
 def cleanup_old_recordings(responses_dir: Path, max_recordings: int):
     """Deletes oldest recordings in responses_dir if count exceeds max_recordings."""
     try:
-        print(f"\nChecking recording history in {responses_dir} (keeping latest {max_recordings})...")
+        logger.info("Checking recording history in %s (keeping latest %s)...", responses_dir, max_recordings)
         if not responses_dir.is_dir():
-             print("Responses directory not found for cleanup.")
+             logger.info("Responses directory not found for cleanup.")
              return
 
-        # Use glob to find .mp3 files directly
-        mp3_files = sorted(
-            list(responses_dir.glob("*.mp3")),
+        # Use glob to find saved clips (.mp3 and .wav) directly
+        audio_files = sorted(
+            [f for extension in config.RESPONSE_AUDIO_EXTENSIONS for f in responses_dir.glob(f"*{extension}")],
             key=lambda x: x.stat().st_mtime # Sort by modification time (oldest first)
         )
 
-        if len(mp3_files) > max_recordings:
-            files_to_delete_count = len(mp3_files) - max_recordings
-            files_to_delete = mp3_files[:files_to_delete_count]
-            print(f"Found {len(mp3_files)} recordings. Deleting oldest {files_to_delete_count}:")
+        if len(audio_files) > max_recordings:
+            files_to_delete_count = len(audio_files) - max_recordings
+            files_to_delete = audio_files[:files_to_delete_count]
+            logger.info("Found %s recordings. Deleting oldest %s:", len(audio_files), files_to_delete_count)
             for file_to_delete in files_to_delete:
                 try:
                     file_to_delete.unlink() # Delete the file
-                    print(f"  - Deleted: {file_to_delete.name}")
+                    logger.info("  - Deleted: %s", file_to_delete.name)
                 except OSError as e:
-                    print(f"  - Error deleting file {file_to_delete}: {e}")
+                    logger.error("  - Error deleting file %s: %s", file_to_delete, e)
         else:
-            print(f"Found {len(mp3_files)} recordings. No cleanup needed.")
+            logger.info("Found %s recordings. No cleanup needed.", len(audio_files))
+    except Exception as e:
+        logger.error("An error occurred during old recording cleanup: %s", e)
+
+def maintain_recordings(responses_dir: Path, max_recordings: int, store=None):
+    """
+    Applies the recording retention policy. With a packed SegmentStore, loose clips
+    are first packed into segments and retention drops whole old segments;
+    otherwise the oldest loose files are deleted.
+    """
+    if store is None:
+        cleanup_old_recordings(responses_dir, max_recordings)
+        return
+    try:
+        store.compact(responses_dir)
+        store.retain_latest(max_recordings)
     except Exception as e:
-        print(f"An error occurred during old recording cleanup: {e}")
\ No newline at end of file
+        logger.error("An error occurred during segment store maintenance: %s", e)
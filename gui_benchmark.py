@@ -0,0 +1,309 @@
+# gui_benchmark.py
+# Headless GUI performance benchmarks for ChatApp.
+#
+# Starts the real ChatApp on a virtual X display (Xvfb) with a stub AudioPlayer,
+# an isolated data directory and a synthetic history, then times the operations
+# whose cost grows with history or text size:
+#   - update_history_display with N entries (cold: rows created; warm: rows reused)
+#   - theme_manager.apply_theme switches with N history rows
+#   - load_history_item with a large prompt/response
+#   - Settings window creation
+# Each case records the synchronous time (call + pending idle tasks) and the Tk
+# event-loop lag measured by a heartbeat while the case and its deferred work run.
+# Results are written as JSON and checked against thresholds (and optionally a
+# previous results file); the exit code is 1 if any case regressed.
+#
+# Usage:
+#   python gui_benchmark.py --history-sizes 50,500,2000 --repeats 5
+#   python gui_benchmark.py --baseline data/benchmarks/gui_<stamp>.json
+# An existing DISPLAY (e.g. under xvfb-run) is used; otherwise Xvfb is started.
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Default pass/fail limits per case: (base ms, extra ms per history entry) for the
+# median synchronous time and for the max event-loop lag. Override with --thresholds.
+DEFAULT_THRESHOLDS = {
+    "update_history_display.cold": {"median_ms": (100.0, 4.0), "max_lag_ms": (150.0, 4.0)},
+    "update_history_display.warm": {"median_ms": (50.0, 1.0), "max_lag_ms": (100.0, 1.0)},
+    "apply_theme": {"median_ms": (50.0, 0.5), "max_lag_ms": (100.0, 0.5)},
+    "load_history_item.large_text": {"median_ms": (50.0, 0.0), "max_lag_ms": (100.0, 0.0)},
+    "settings_window.open": {"median_ms": (400.0, 0.0), "max_lag_ms": (500.0, 0.0)},
+}
+HEARTBEAT_INTERVAL_MS = 10
+_WORDS = ("audio", "model", "voice", "answer", "latency", "history", "python", "window", "theme", "buffer",
+          "stream", "token", "request", "speech", "segment", "render", "thread", "queue", "event", "format")
+
+
+class StubAudioPlayer:
+    """AudioPlayer stand-in: always ready, never touches an audio device."""
+
+    def __init__(self):
+        self.initialized = True
+        self.ready: Future = Future()
+        self.ready.set_result(True)
+
+    def init_in_background(self, *args, **kwargs): pass
+    def use_buffer_calibration(self, *args, **kwargs): pass
+    def wait_until_ready(self, timeout: float | None = None) -> bool: return True
+    def play_sound(self, filepath: str, use_cache: bool = True, speed: float = 1.0) -> bool: return True
+    def play_pcm(self, pcm_data: bytes, *args, **kwargs) -> bool: return True
+    def play_encoded(self, audio_data: bytes, sound_id: str, speed: float = 1.0) -> bool: return True
+    def is_busy(self) -> bool: return False
+    def stop(self): pass
+    def clear_cache(self): pass
+    def quit(self): pass
+
+
+def synthetic_history(size: int, seed: int = 1234) -> list[tuple[str, str, str]]:
+    """Deterministic (prompt, response, timestamp) entries, newest first like the real history."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(size):
+        prompt = " ".join(rng.choices(_WORDS, k=rng.randint(4, 40)))
+        response = "\n".join(" ".join(rng.choices(_WORDS, k=rng.randint(8, 30))) for _ in range(rng.randint(1, 12)))
+        items.append((prompt, response, f"20260101_{i:06d}"))
+    return items
+
+
+def large_text(chars: int, seed: int = 99) -> str:
+    rng = random.Random(seed)
+    lines, total = [], 0
+    while total < chars:
+        line = " ".join(rng.choices(_WORDS, k=rng.randint(5, 20)))
+        lines.append(line); total += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+def start_virtual_display() -> subprocess.Popen | None:
+    """Starts Xvfb on a free display unless DISPLAY is already set. Returns the process to terminate."""
+    if os.environ.get("DISPLAY"):
+        logger.info("Using existing display %s", os.environ["DISPLAY"])
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise SystemExit("No DISPLAY set and Xvfb not found; install Xvfb or run under xvfb-run.")
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as display_pipe:
+        display = display_pipe.readline().strip() # Xvfb writes the display number once it accepts connections
+    if not display:
+        process.terminate()
+        raise SystemExit("Xvfb failed to start.")
+    os.environ["DISPLAY"] = f":{display}"
+    logger.info("Started Xvfb on display :%s", display)
+    return process
+
+
+def isolate_data_dir(data_dir: Path):
+    """Points every data path the app reads or writes at data_dir, so a run never touches real user data."""
+    config.APP_BASE_DATA_DIR = data_dir
+    config.RESPONSES_DIR = data_dir / "responses"
+    config.SEGMENTS_DIR = config.RESPONSES_DIR / "segments"
+    config.HISTORY_FILE = data_dir / "chat_history.json"
+    config.MODEL_STATS_FILE = data_dir / "model_stats.json"
+    config.HEDGE_STATS_FILE = data_dir / "hedge_stats.json"
+    config.STARTUP_PROFILE_FILE = data_dir / "startup_profile.json"
+    config.PROFILES_DIR = data_dir / "profiles"
+    config.LAG_REPORT_FILE = data_dir / "lag_report.json"
+    config.PACKED_AUDIO_STORE = False
+    config.BACKFILL_STATE_FILE = data_dir / "backfill_state.json"
+    config.SIMILAR_PROMPT_SUGGESTIONS = False
+    config.AUTOCOMPLETE_ENABLED = False
+    config.AUDIO_BACKFILL_ENABLED = False
+    os.environ.pop("OPENAI_API_KEY", None) # No background model fetch
+    config.ensure_data_dirs()
+
+
+def threshold_for(thresholds: dict, name: str, history_size: int) -> dict:
+    limits = thresholds.get(name, {})
+    return {metric: base + per_entry * history_size for metric, (base, per_entry) in limits.items()}
+
+
+class GuiBenchmark:
+    """Runs benchmark cases against a live ChatApp, pumping its event loop between samples."""
+
+    def __init__(self, app, repeats: int, settle_ms: int, thresholds: dict):
+        from lag_watchdog import EventLoopWatchdog
+        self.app = app
+        self.repeats = repeats
+        self.settle_s = settle_ms / 1000.0
+        self.thresholds = thresholds
+        self.watchdog = EventLoopWatchdog(app, interval_ms=HEARTBEAT_INTERVAL_MS)
+        self.cases: list[dict] = []
+
+    def _pump(self, duration_s: float):
+        """Processes Tk events for duration_s (deferred idle work and heartbeat ticks run here)."""
+        deadline = time.perf_counter() + duration_s
+        while time.perf_counter() < deadline:
+            self.app.update()
+            time.sleep(0.001)
+
+    def measure(self, name: str, history_size: int, operation, setup=None, teardown=None) -> dict:
+        samples_ms, lags_ms, stalls = [], [], []
+        for repeat in range(self.repeats):
+            if setup is not None: setup(repeat)
+            self._pump(self.settle_s / 2) # Let earlier work finish before the clock starts
+            self.watchdog.reset()
+            start = time.perf_counter()
+            operation(repeat)
+            self.app.update_idletasks() # Include layout/redraw work the call queued
+            samples_ms.append((time.perf_counter() - start) * 1000.0)
+            self._pump(self.settle_s)
+            lags_ms.append(self.watchdog.max_lag_ms)
+            stalls.extend(stall["callback"] for stall in self.watchdog.stalls)
+            if teardown is not None: teardown(repeat)
+        median_ms = statistics.median(samples_ms)
+        p95_ms = statistics.quantiles(samples_ms, n=20, method="inclusive")[-1] if len(samples_ms) > 1 else samples_ms[0]
+        limits = threshold_for(self.thresholds, name, history_size)
+        case = {
+            "name": name, "history_size": history_size,
+            "samples_ms": [round(s, 2) for s in samples_ms],
+            "median_ms": round(median_ms, 2), "p95_ms": round(p95_ms, 2), "max_ms": round(max(samples_ms), 2),
+            "max_lag_ms": round(max(lags_ms), 2), "stalls": sorted(set(stalls)),
+            "thresholds": {metric: round(limit, 1) for metric, limit in limits.items()},
+        }
+        case["failures"] = [f"{metric} {case[metric]} > {limit:.1f}" for metric, limit in limits.items() if case[metric] > limit]
+        logger.info("%-32s N=%-5s median %8.2f ms  p95 %8.2f ms  max lag %8.2f ms%s", name, history_size,
+                    case["median_ms"], case["p95_ms"], case["max_lag_ms"], "  FAIL" if case["failures"] else "")
+        self.cases.append(case)
+        return case
+
+    def run(self, history_sizes: list[int], text_chars: int):
+        import theme_manager
+        app = self.app
+        self.watchdog.start()
+        full_history = synthetic_history(max(history_sizes))
+
+        for size in history_sizes:
+            history = full_history[:size]
+
+            def reset_rows(_repeat, history=history):
+                # Cold: drop the recycled row buttons so every row is created again
+                for button in app.history_buttons:
+                    theme_manager.get_registry(app).unregister(button); button.destroy()
+                app.history_buttons.clear()
+                app.history = list(history)
+            self.measure("update_history_display.cold", size, lambda _r: app.update_history_display(), setup=reset_rows)
+
+            def rotate(_repeat):
+                app.history = app.history[1:] + app.history[:1] # Same size, every row's text changes
+            self.measure("update_history_display.warm", size, lambda _r: app.update_history_display(), setup=rotate)
+
+            self.measure("apply_theme", size, lambda r: theme_manager.apply_theme(app, ("Light", "Dark")[r % 2]))
+
+        prompt, response = large_text(text_chars // 4, seed=7), large_text(text_chars)
+        self.measure("load_history_item.large_text", len(app.history), lambda _r: app.load_history_item(prompt, response, None))
+
+        def close_settings(_repeat):
+            if app.settings_window is not None and app.settings_window.winfo_exists(): app.settings_window.close_window()
+        self.measure("settings_window.open", len(app.history), lambda _r: app.open_settings_window(), teardown=close_settings)
+        self.watchdog.stop()
+
+
+def compare_to_baseline(cases: list[dict], baseline_file: Path, max_regression: float):
+    """Adds a failure to every case whose median grew by more than max_regression over the baseline run."""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {(case["name"], case["history_size"]): case for case in json.load(f).get("cases", [])}
+    for case in cases:
+        previous = baseline.get((case["name"], case["history_size"]))
+        if previous is None:
+            continue
+        case["baseline_median_ms"] = previous["median_ms"]
+        allowed_ms = previous["median_ms"] * (1.0 + max_regression)
+        if case["median_ms"] > allowed_ms:
+            case["failures"].append(f"median_ms {case['median_ms']} > baseline {previous['median_ms']} +{max_regression:.0%}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless ChatApp GUI benchmarks (Xvfb).")
+    parser.add_argument("--history-sizes", default="50,500,2000", help="Comma-separated history sizes to benchmark.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--text-chars", type=int, default=200_000, help="Size of the response used by load_history_item.")
+    parser.add_argument("--settle-ms", type=int, default=300, help="Event-loop time after each sample for deferred work and lag.")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON (default: data/benchmarks/gui_<timestamp>.json).")
+    parser.add_argument("--thresholds", type=Path, default=None, help="JSON overriding DEFAULT_THRESHOLDS.")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier results file to check for regressions.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed median slowdown vs. the baseline (0.25 = 25%%).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    history_sizes = sorted({int(size) for size in args.history_sizes.split(",") if size.strip()})
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if args.thresholds is not None:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds.update({name: {metric: tuple(limit) for metric, limit in limits.items()} for name, limits in json.load(f).items()})
+    output_file = args.output or config.BENCHMARKS_DIR / f"gui_{datetime.now():%Y%m%d_%H%M%S}.json"
+
+    xvfb = start_virtual_display()
+    try:
+        with tempfile.TemporaryDirectory(prefix="gui_benchmark_") as data_dir:
+            isolate_data_dir(Path(data_dir))
+            from history_manager import save_history
+            save_history(config.HISTORY_FILE, synthetic_history(max(history_sizes))) # Startup loads the largest history
+
+            import customtkinter
+            from app_gui import ChatApp
+            start = time.perf_counter()
+            app = ChatApp(player=StubAudioPlayer())
+            app.update()
+            startup_ms = (time.perf_counter() - start) * 1000.0
+            logger.info("ChatApp startup with %s history entries: %.1f ms", len(app.history), startup_ms)
+            environment = {
+                "python": platform.python_version(), "platform": platform.platform(),
+                "tk_version": app.tk.call("info", "patchlevel"), "customtkinter": getattr(customtkinter, "__version__", None),
+            }
+
+            benchmark = GuiBenchmark(app, args.repeats, args.settle_ms, thresholds)
+            try:
+                benchmark.run(history_sizes, args.text_chars)
+            finally:
+                app.on_closing()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate(); xvfb.wait(timeout=5)
+
+    if args.baseline is not None:
+        compare_to_baseline(benchmark.cases, args.baseline, args.max_regression)
+    passed = not any(case["failures"] for case in benchmark.cases)
+    results = {
+        "benchmark": "gui",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment,
+        "parameters": {"history_sizes": history_sizes, "repeats": args.repeats, "text_chars": args.text_chars,
+                       "settle_ms": args.settle_ms, "heartbeat_interval_ms": HEARTBEAT_INTERVAL_MS},
+        "startup_ms": round(startup_ms, 1),
+        "cases": benchmark.cases,
+        "passed": passed,
+    }
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    logger.info("Results written to %s (%s)", output_file, "PASS" if passed else "FAIL")
+    for case in benchmark.cases:
+        for failure in case["failures"]:
+            logger.error("%s [N=%s]: %s", case["name"], case["history_size"], failure)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
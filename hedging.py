@@ -0,0 +1,194 @@
+# hedging.py
+# Hedged chat requests: if the primary model has not produced its first byte
+# within a percentile-based delay, a second request is sent to a fallback
+# model/endpoint. The first to respond wins and the other is cancelled. Both
+# requests are tasks on the caller's event loop, so a timeout or Stop cancels them.
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import api_handler
+import config
+from model_stats import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeStats:
+    """Primary time-to-first-byte samples plus how often hedging fired and who won."""
+
+    def __init__(self, max_samples: int = 500):
+        self.primary_ttfb_s: deque = deque(maxlen=max_samples)
+        self.requests = 0
+        self.hedges_fired = 0
+        self.wins = {"primary": 0, "fallback": 0}
+        self._lock = threading.Lock()
+
+    def hedge_delay_s(self, percentile: float = config.HEDGE_PERCENTILE) -> float:
+        """Delay before hedging: the given percentile of observed primary TTFB, clamped to config bounds."""
+        with self._lock:
+            samples = sorted(self.primary_ttfb_s)
+        if len(samples) < config.HEDGE_MIN_SAMPLES:
+            return config.HEDGE_DEFAULT_DELAY_S
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        return min(max(samples[index], config.HEDGE_MIN_DELAY_S), config.HEDGE_MAX_DELAY_S)
+
+    def record(self, primary_ttfb_s: float | None, fired: bool, winner: str | None):
+        with self._lock:
+            self.requests += 1
+            if primary_ttfb_s is not None: self.primary_ttfb_s.append(primary_ttfb_s)
+            if fired: self.hedges_fired += 1
+            if winner in self.wins: self.wins[winner] += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            fire_rate = (self.hedges_fired / self.requests * 100.0) if self.requests else 0.0
+            return (f"{self.requests} requests, hedged {self.hedges_fired} ({fire_rate:.1f}%), "
+                    f"wins primary={self.wins['primary']} fallback={self.wins['fallback']}")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "hedges_fired": self.hedges_fired, "wins": dict(self.wins),
+                    "primary_ttfb_s": [round(sample, 4) for sample in self.primary_ttfb_s]}
+
+    @classmethod
+    def load(cls, stats_file: Path) -> "HedgeStats":
+        stats = cls()
+        if not stats_file.exists():
+            return stats
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            stats.requests = int(data.get("requests", 0))
+            stats.hedges_fired = int(data.get("hedges_fired", 0))
+            stats.wins.update({k: int(v) for k, v in data.get("wins", {}).items() if k in stats.wins})
+            stats.primary_ttfb_s.extend(float(v) for v in data.get("primary_ttfb_s", []))
+        except Exception as e:
+            logger.warning("Could not load hedge stats from %s: %s", stats_file, e)
+        return stats
+
+    def save(self, stats_file: Path):
+        try:
+            stats_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(stats_file, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=4)
+        except Exception as e:
+            logger.warning("Could not save hedge stats to %s: %s", stats_file, e)
+
+
+class _Attempt:
+    """One streamed chat request running as a task on the event loop."""
+
+    def __init__(self, label: str, client, model: str):
+        self.label = label
+        self.client = client
+        self.model = model
+        self.text_parts: list[str] = []
+        self.metrics: dict = {}
+        self.ttfb_s: float | None = None
+        self.started_at: float | None = None
+        self.first_byte: asyncio.Future | None = None # Result: first text arrived; exception: failed before that
+        self.task: asyncio.Task | None = None
+
+    def start(self, prompt: str):
+        self.started_at = time.perf_counter()
+        self.first_byte = asyncio.get_running_loop().create_future()
+        self.first_byte.add_done_callback(_consume_exception) # A loser's failure is not an error
+        self.task = asyncio.create_task(self._run(prompt), name=f"Hedge-{self.label}")
+        self.task.add_done_callback(_consume_exception)
+
+    async def _run(self, prompt: str) -> str:
+        try:
+            async for delta in api_handler.stream_chat_response_async(self.client, prompt, self.model, metrics=self.metrics):
+                if self.ttfb_s is None:
+                    self.ttfb_s = time.perf_counter() - self.started_at
+                    self.first_byte.set_result(self)
+                self.text_parts.append(delta)
+        except Exception as e:
+            if not self.first_byte.done(): self.first_byte.set_exception(e)
+            raise
+        if not self.first_byte.done(): self.first_byte.set_result(self) # Empty answer: finished without text
+        return "".join(self.text_parts)
+
+    def cancel(self):
+        """Stops the attempt; cancelling the task closes its stream."""
+        if self.task is not None and not self.task.done(): self.task.cancel()
+        if self.first_byte is not None and not self.first_byte.done(): self.first_byte.cancel()
+
+
+def _consume_exception(future: asyncio.Future):
+    if not future.cancelled(): future.exception()
+
+
+async def get_chat_response_hedged_async(primary_client, prompt: str, model: str,
+                                         fallback_client, fallback_model: str,
+                                         stats: HedgeStats, metrics: dict | None = None) -> str:
+    """
+    Same contract as api_handler.get_chat_response_async, but hedged: the fallback
+    request only starts if the primary has not sent its first text within
+    stats.hedge_delay_s() (or fails before that). Raises ConnectionError if
+    both attempts fail. metrics (if given) is filled like get_chat_response's,
+    for the winning model, plus ttfb_s. Both attempts run as tasks on the calling
+    loop; cancelling this coroutine (timeout, Stop) cancels them and closes their streams.
+    """
+    primary = _Attempt("primary", primary_client, model)
+    fallback = _Attempt("fallback", fallback_client, fallback_model)
+    delay_s = stats.hedge_delay_s()
+    try:
+        primary.start(prompt)
+        waiting = {primary.first_byte: primary}
+        fired = False
+        winner = None
+        failed = set()
+        deadline = time.perf_counter() + delay_s
+        while winner is None:
+            timeout = max(0.0, deadline - time.perf_counter()) if not fired else None
+            done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                attempt = waiting.pop(future)
+                if future.exception() is None:
+                    winner = attempt
+                    break
+                failed.add(attempt.label)
+                logger.debug("Hedge attempt '%s' failed before first byte: %s", attempt.label, future.exception())
+            if winner is not None:
+                break
+            if not fired and (not done or "primary" in failed): # Silent past the delay, or failed early: fail over
+                fired = True
+                reason = "failed" if "primary" in failed else f"silent after {delay_s:.2f}s"
+                logger.debug("Primary '%s' %s, hedging to '%s'.", model, reason, fallback_model)
+                fallback.start(prompt)
+                waiting[fallback.first_byte] = fallback
+            elif fired and not waiting:
+                break
+
+        if winner is None:
+            stats.record(None, fired, None)
+            error = primary.first_byte.exception() if "primary" in failed else fallback.first_byte.exception()
+            raise ConnectionError(f"Failed to get chat response (hedged): {error}")
+
+        loser = fallback if winner is primary else primary
+        loser.cancel()
+        # A primary that lost is recorded as "at least this slow" so the percentile is not biased low
+        primary_sample = primary.ttfb_s
+        if primary_sample is None and "primary" not in failed:
+            primary_sample = time.perf_counter() - primary.started_at
+        stats.record(primary_sample, fired, winner.label)
+        logger.debug("Hedged request won by %s (ttfb %.2fs). %s", winner.label, winner.ttfb_s or 0.0, stats.summary())
+
+        try:
+            generated_text = await winner.task # Bounded by the caller's timeout; cancellation reaches the finally below
+        except (ConnectionError, RuntimeError) as e:
+            raise ConnectionError(f"Chat response interrupted: {e}") from e
+        if metrics is not None:
+            metrics.update(model=winner.model, latency_s=time.perf_counter() - winner.started_at,
+                           completion_tokens=winner.metrics.get("completion_tokens") or estimate_tokens(generated_text), ttfb_s=winner.ttfb_s)
+        return generated_text or "(No text response received from API.)"
+    finally:
+        primary.cancel()
+        fallback.cancel()
@@ -1,8 +1,12 @@
 # history_manager.py
 import json
+import logging
+import os
 from pathlib import Path
 from typing import List, Tuple
 
+logger = logging.getLogger(__name__)
+
 def load_history(history_file: Path) -> List[Tuple[str, str, str | None]]: # Updated type hint
     """Loads chat history from the JSON file. Handles 3-element tuples."""
     history = []
@@ -25,39 +29,80 @@ def load_history(history_file: Path) -> List[Tuple[str, str, str | None]]: # Upd
                             processed_count += 1
                         # Optional: Handle old 2-element format if needed
                         elif isinstance(item, (list, tuple)) and len(item) == 2:
-                            print("DEBUG: Loading old 2-element history item (no timestamp).")
+                            logger.debug("Loading old 2-element history item (no timestamp).")
                             history.append((str(item[0]), str(item[1]), None)) # Add None for timestamp
                             processed_count += 1
                         else:
-                            print(f"Warning: Skipping invalid item format during history load: {item}")
+                            logger.warning("Skipping invalid item format during history load: %s", item)
                             skipped_count += 1
-                    print(f"Loaded {processed_count} items from {history_file}" + (f", skipped {skipped_count} invalid items." if skipped_count else "."))
+                    logger.info("Loaded %s items from %s%s", processed_count, history_file, f", skipped {skipped_count} invalid items." if skipped_count else ".")
                 else:
-                     print(f"Warning: History file {history_file} does not contain a list. Starting fresh.")
+                     logger.warning("History file %s does not contain a list. Starting fresh.", history_file)
                      history = [] # Ensure history is a list
         except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading/parsing history file {history_file}: {e}. Starting fresh.")
+            logger.error("Error loading/parsing history file %s: %s. Starting fresh.", history_file, e)
             history = [] # Reset on error
         except Exception as e:
-             print(f"Unexpected error loading history: {e}. Starting fresh.")
+             logger.error("Unexpected error loading history: %s. Starting fresh.", e)
              history = [] # Reset on error
     else:
-        print("History file not found, starting fresh.")
+        logger.info("History file not found, starting fresh.")
         history = [] # Ensure history is a list if file doesn't exist
 
     # Ensure it always returns a list
     return history if isinstance(history, list) else []
 
 # (save_history function remains the same)
-def save_history(history_file: Path, history_data: List[Tuple[str, str, str | None]]):
-    """Saves chat history to the JSON file."""
+def save_history(history_file: Path, history_data: List[Tuple[str, str, str | None]]) -> bool:
+    """Saves chat history to the JSON file. Returns False if the write failed."""
     try:
         # Ensure parent directory exists just in case
         history_file.parent.mkdir(parents=True, exist_ok=True)
         with open(history_file, "w", encoding="utf-8") as f:
             json.dump(history_data, f, indent=4) # indent=4 makes the file readable
-        print(f"Saved {len(history_data)} items to {history_file}")
+        logger.info("Saved %s items to %s", len(history_data), history_file)
+        return True
     except IOError as e:
-        print(f"Error saving history file {history_file}: {e}")
+        logger.error("Error saving history file %s: %s", history_file, e)
     except Exception as e:
-         print(f"Unexpected error saving history: {e}")
\ No newline at end of file
+         logger.error("Unexpected error saving history: %s", e)
+    return False
+def merge_history(on_disk: List[Tuple[str, str, str | None]], in_memory: List[Tuple[str, str, str | None]]) -> List[Tuple[str, str, str | None]]:
+    """
+    in_memory plus the entries only found on disk (written by another process, e.g. the
+    GUI and service.py sharing one file). Entries match by (prompt, response) and the
+    in-memory version wins (it may carry a newer audio timestamp). Each disk-only entry
+    is placed after its predecessor in the file, so both orders are kept.
+    """
+    in_memory_keys = {(item[0], item[1]) for item in in_memory}
+    inserts = {} # Key of the in-memory entry they follow (None: top) -> disk-only entries, in file order
+    anchor, seen = None, set()
+    for item in on_disk:
+        key = (item[0], item[1])
+        if key in in_memory_keys: anchor = key
+        elif key not in seen: inserts.setdefault(anchor, []).append(tuple(item)); seen.add(key)
+    if not inserts:
+        return list(in_memory)
+    merged = inserts.pop(None, [])
+    for item in in_memory:
+        merged.append(item)
+        merged.extend(inserts.pop((item[0], item[1]), []))
+    return merged
+
+def save_history_merged(history_file: Path, history_data: List[Tuple[str, str, str | None]]) -> List[Tuple[str, str, str | None]]:
+    """
+    Re-reads history_file, merges it with history_data (merge_history) and writes the
+    result atomically, so processes sharing the file do not overwrite each other's
+    entries. history_file is only replaced after a complete write; on failure it is left
+    as it was. Returns the merged list.
+    """
+    merged = merge_history(load_history(history_file), history_data)
+    temp_file = history_file.with_name(history_file.name + ".tmp")
+    try:
+        if save_history(temp_file, merged):
+            os.replace(temp_file, history_file)
+    except OSError as e:
+        logger.error("Error replacing history file %s: %s", history_file, e)
+    finally:
+        temp_file.unlink(missing_ok=True) # Only left behind by a failed write or replace
+    return merged
@@ -0,0 +1,168 @@
+# lag_watchdog.py
+# Measures Tk event-loop responsiveness. A heartbeat scheduled with after() records
+# how late each tick runs (a histogram of frame lag); a helper thread notices when the
+# heartbeat stops for longer than a threshold and captures the main thread's stack,
+# so a stall is logged together with the callback that caused it.
+
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bucket edges in ms; the last bucket is everything above the final edge
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+LAG_BUCKET_LABELS = [f"<={edge} ms" for edge in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]} ms"]
+MAX_STALL_RECORDS = 50
+
+
+_TK_PACKAGES = {"tkinter", "customtkinter"}
+
+
+def _is_tk_frame(frame: traceback.FrameSummary) -> bool:
+    return not _TK_PACKAGES.isdisjoint(Path(frame.filename).parts)
+
+
+def _format_frame(frame: traceback.FrameSummary) -> str:
+    return f"{frame.name} ({Path(frame.filename).name}:{frame.lineno})"
+
+
+def _find_tk_callback(stack: traceback.StackSummary) -> str:
+    """
+    Names the app callback Tk dispatched to: the first frame after tkinter's CallWrapper.__call__
+    that is not tkinter/customtkinter code (after() callbacks run through tkinter's callit,
+    button commands through customtkinter's _clicked).
+    """
+    for index in reversed(range(len(stack))): # Innermost dispatch first (update() can nest callbacks)
+        frame = stack[index]
+        if frame.name == "__call__" and Path(frame.filename).parent.name == "tkinter":
+            callback = next((f for f in stack[index + 1:] if not _is_tk_frame(f)), None)
+            if callback is not None:
+                return _format_frame(callback)
+    # Not inside an app callback (e.g. the mainloop itself or Tk internals): report the innermost frame
+    return _format_frame(stack[-1])
+
+
+class EventLoopWatchdog:
+    """Heartbeat-based main-loop lag monitor with stall attribution."""
+
+    def __init__(self, app, interval_ms: int = config.LAG_TICK_INTERVAL_MS,
+                 stall_threshold_ms: int = config.LAG_STALL_THRESHOLD_MS):
+        self.app = app
+        self.interval_ms = interval_ms
+        self.stall_threshold_ms = stall_threshold_ms
+        self.counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.max_lag_ms = 0.0
+        self.stalls: list[dict] = []
+        self._expected_at = 0.0
+        self._last_beat = 0.0 # perf_counter of the last heartbeat (read by the helper thread)
+        self._beat_id = 0
+        self._main_ident: int | None = None
+        self._after_id = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the heartbeat and the helper thread. Must be called on the Tk main thread."""
+        if self._main_ident is not None:
+            return
+        self._main_ident = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._schedule()
+        threading.Thread(target=self._monitor, name="LagWatchdog", daemon=True).start()
+        logger.info("Event-loop watchdog started (tick %s ms, stall threshold %s ms).", self.interval_ms, self.stall_threshold_ms)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._after_id is not None:
+            try: self.app.after_cancel(self._after_id)
+            except Exception: pass
+            self._after_id = None
+
+    def reset(self):
+        """Clears the histogram, max lag and stall records (e.g. between benchmark cases)."""
+        with self._lock:
+            self.counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+            self.max_lag_ms = 0.0
+            self.stalls = []
+
+    def _schedule(self):
+        self._expected_at = time.perf_counter() + self.interval_ms / 1000.0
+        self._after_id = self.app.after(self.interval_ms, self._beat)
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._expected_at) * 1000.0)
+        with self._lock:
+            self.counts[bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+            if lag_ms > self.max_lag_ms: self.max_lag_ms = lag_ms
+        self._last_beat = now
+        self._beat_id += 1
+        if not self._stop_event.is_set():
+            self._schedule()
+
+    def _monitor(self):
+        """Helper thread: detects a missing heartbeat and samples the main thread while it is stalled."""
+        threshold_s = self.stall_threshold_ms / 1000.0
+        expected_gap_s = self.interval_ms / 1000.0
+        reported_beat = -1
+        while not self._stop_event.wait(threshold_s / 4):
+            beat_id = self._beat_id
+            stalled_for_s = time.perf_counter() - self._last_beat - expected_gap_s
+            if stalled_for_s < threshold_s or beat_id == reported_beat:
+                continue
+            reported_beat = beat_id # One report per stall
+            frame = sys._current_frames().get(self._main_ident)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            callback = _find_tk_callback(stack)
+            record = {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "stalled_ms": round(stalled_for_s * 1000.0, 1),
+                "callback": callback,
+                "stack": traceback.format_list(stack[-12:]),
+            }
+            with self._lock:
+                self.stalls.append(record)
+                del self.stalls[:-MAX_STALL_RECORDS]
+            logger.warning("Main loop stalled >%.0f ms in %s\n%s", stalled_for_s * 1000.0, callback, "".join(record["stack"]))
+
+    def histogram(self) -> list[tuple[str, int]]:
+        """[(bucket label, count)] for the frame-lag histogram."""
+        with self._lock:
+            counts = list(self.counts)
+        return list(zip(LAG_BUCKET_LABELS, counts))
+
+    def summary(self) -> str:
+        histogram = self.histogram()
+        total = sum(count for _, count in histogram)
+        parts = [f"{label}: {count}" for label, count in histogram if count]
+        return f"{total} ticks, max lag {self.max_lag_ms:.0f} ms, {len(self.stalls)} stalls | " + ", ".join(parts)
+
+    def export(self, output_file: Path = config.LAG_REPORT_FILE) -> Path | None:
+        """Writes the histogram and recent stalls as JSON."""
+        with self._lock:
+            data = {
+                "tick_interval_ms": self.interval_ms,
+                "stall_threshold_ms": self.stall_threshold_ms,
+                "max_lag_ms": round(self.max_lag_ms, 1),
+                "histogram": [{"bucket": label, "count": count} for label, count in zip(LAG_BUCKET_LABELS, self.counts)],
+                "stalls": list(self.stalls),
+            }
+        try:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+            return output_file
+        except Exception as e:
+            logger.warning("Could not write lag report to %s: %s", output_file, e)
+            return None
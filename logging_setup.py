@@ -0,0 +1,86 @@
+# logging_setup.py
+# Unified, asynchronous logging for the whole app.
+#
+# Every module logs through logging.getLogger(__name__). Records go into a queue
+# (QueueHandler) and a single QueueListener thread does the formatting and the
+# writing (rotating file under data/, plus the console when one exists), so the
+# Tk main thread and the worker threads never block on I/O. Use %-style
+# arguments (logger.debug("x=%s", x)) so disabled levels cost nothing.
+
+import logging
+import logging.handlers
+import queue
+import sys
+
+import config
+
+LOG_FORMAT = '%(asctime)s - %(threadName)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues the record as-is. The stock QueueHandler formats the message in the
+    calling thread; here the listener thread does it, so even enabled log calls
+    only cost an enqueue on the UI/worker threads. Log arguments should
+    therefore not be mutated after the call.
+    """
+    def prepare(self, record):
+        return record
+
+
+def parse_module_levels(spec: str) -> dict[str, int]:
+    """Parses 'app_gui=DEBUG,audio_player=WARNING' into {logger_name: level}."""
+    levels = {}
+    for entry in spec.split(","):
+        if "=" not in entry:
+            continue
+        name, level_name = (part.strip() for part in entry.split("=", 1))
+        level = logging.getLevelName(level_name.upper())
+        if name and isinstance(level, int):
+            levels[name] = level
+    return levels
+
+
+def setup_logging(level: str = config.LOG_LEVEL, module_levels: str = config.LOG_MODULE_LEVELS):
+    """Installs the queue-based logging pipeline. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    handlers: list[logging.Handler] = []
+    try:
+        config.LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            config.LOG_FILE, maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT, encoding="utf-8")
+        handlers.append(file_handler)
+    except OSError as e:
+        if sys.stderr is not None: sys.stderr.write(f"Warning: Could not open log file {config.LOG_FILE}: {e}\n")
+    # Windowed (console=False) builds have no stdout; skip the console handler there
+    if sys.stdout is not None:
+        handlers.append(logging.StreamHandler(sys.stdout))
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(_DeferredQueueHandler(log_queue))
+    root_level = logging.getLevelName(level.upper())
+    root_logger.setLevel(root_level if isinstance(root_level, int) else logging.INFO)
+    for logger_name, logger_level in parse_module_levels(module_levels).items():
+        logging.getLogger(logger_name).setLevel(logger_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records and stops the listener thread (call on exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,23 +1,58 @@
 # main.py - Application Entry Point
-import customtkinter
-from app_gui import ChatApp
+# startup_profiler is stdlib-only and imported first so it can time everything else
+from startup_profiler import profiler, preload_modules_in_background
+import importlib
+import multiprocessing
+
+with profiler.phase("import config"):
+    import config
+from logging_setup import setup_logging, shutdown_logging
+with profiler.phase("import customtkinter"):
+    importlib.import_module("customtkinter") # Only timed here, so the profile shows its cost apart from app_gui
+
+# Warm up heavy modules off the main thread while the window is being built
+preload_modules_in_background(["openai", "pygame"])
+
+with profiler.phase("import app_gui"):
+    from app_gui import ChatApp
 from audio_player import AudioPlayer
-# config is loaded automatically when app_gui imports it, ensuring dir exists
+
+
+def _on_first_paint(app: ChatApp, player: AudioPlayer):
+    """Runs on the first idle tick of the mainloop, i.e. once the window has drawn."""
+    profiler.mark_first_paint()
+    # Lag is only meaningful once startup is done
+    if config.LAG_WATCHDOG_ENABLED:
+        app.lag_watchdog.start()
+    # Audio comes up after the window, so a slow or missing device never delays startup
+    player.init_in_background()
+    profiler.report(config.STARTUP_FIRST_PAINT_TARGET_MS, config.STARTUP_PROFILE_FILE)
+
 
 if __name__ == "__main__":
-    # Create the audio player instance first (initializes pygame mixer)
-    player = AudioPlayer()
+    # Required for the time-stretch process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+
+    # Configure logging here rather than at import time in library modules
+    with profiler.phase("logging_setup.setup_logging"):
+        setup_logging()
+
+    with profiler.phase("config.ensure_data_dirs"):
+        config.ensure_data_dirs()
+
+    # The mixer is initialized in the background once the window is up.
+    # Text-only chat works without it; playback waits on player.ready.
+    # For wav/pcm TTS output the mixer runs at the TTS native rate so clips need no resampling.
+    native_rate = config.TTS_RESPONSE_FORMAT in ("wav", "pcm")
+    # The buffer is calibrated per output device (sizes saved by ChatApp in user settings)
+    player = AudioPlayer(defer_init=True,
+                         buffer_size=None if config.AUDIO_BUFFER_CALIBRATION else config.AUDIO_BUFFER_SIZE,
+                         frequency=config.TTS_NATIVE_SAMPLE_RATE if native_rate else None,
+                         channels=1 if native_rate else None)
 
-    # Check if player initialized successfully before starting app
-    if player.initialized:
+    with profiler.phase("ChatApp()"):
         app = ChatApp(player=player) # Pass player to the app
-        app.mainloop()
-        # Quit is handled by app.on_closing now
-    else:
-        # Handle pygame mixer init failure (optional: show an error message GUI)
-        print("Application exiting due to audio initialization failure.")
-        # You could show a simple Tkinter error message window here if desired
-        root = customtkinter.CTk()
-        root.withdraw() # Hide the root window
-        customtkinter.CTkMessagebox(title="Error", message="Failed to initialize audio system (Pygame Mixer).\nPlease check audio drivers and pygame installation.\nApplication will exit.", icon="cancel")
-        root.destroy()
\ No newline at end of file
+    app.after_idle(lambda: _on_first_paint(app, player))
+    app.mainloop()
+    # Quit is handled by app.on_closing now; flush the log queue last
+    shutdown_logging()
@@ -0,0 +1,110 @@
+# model_compare.py
+# Sends one prompt to several chat models at once and measures each answer as it streams.
+#
+# All models stream concurrently over the app's shared AsyncOpenAI client (one
+# connection pool), so a comparison takes as long as its slowest model, not the sum
+# of all of them. Each run records time to first token, total time, token usage and
+# tokens/sec; a model that fails or times out ends with an error and does not affect
+# the others. Streamed text is handed on in batches (at most every
+# COMPARE_UI_FLUSH_MS), not per token, so a fast model cannot flood the Tk thread.
+
+import asyncio
+import logging
+import time
+from typing import Callable
+
+import config
+import api_handler
+from model_stats import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_MIN_RATE_WINDOW_S = 0.25 # Live tokens/sec is noise until the stream has run this long
+
+
+class CompareRun:
+    """One model's answer and timings within a comparison."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.parts: list[str] = []
+        self.started: float | None = None
+        self.ttft_s: float | None = None
+        self.latency_s: float | None = None
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        self.error: str | None = None
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.error is None and bool(self.parts)
+
+    def tokens_per_s(self, now: float | None = None) -> float | None:
+        """Generation speed after the first token (usage-reported tokens once done, estimated while streaming)."""
+        if self.ttft_s is None or self.started is None:
+            return None
+        elapsed_s = (self.latency_s if self.done else (now or time.perf_counter()) - self.started) - self.ttft_s
+        if elapsed_s <= 0 or (not self.done and elapsed_s < _MIN_RATE_WINDOW_S):
+            return None
+        return (self.completion_tokens or estimate_tokens(self.text)) / elapsed_s
+
+    def summary(self) -> str:
+        """One-line metrics, e.g. 'TTFT 0.42s · total 3.1s · 58 tok/s · 12 in / 170 out tokens'."""
+        if self.error:
+            return f"Error: {self.error}"
+        if self.ttft_s is None:
+            return "Waiting for first token..."
+        parts = [f"TTFT {self.ttft_s:.2f}s"]
+        parts.append(f"total {self.latency_s:.1f}s" if self.done else f"{time.perf_counter() - self.started:.1f}s...")
+        tps = self.tokens_per_s()
+        if tps: parts.append(f"{tps:.0f} tok/s" if self.done else f"~{tps:.0f} tok/s")
+        if self.done: parts.append(f"{self.prompt_tokens} in / {self.completion_tokens} out tokens" if self.completion_tokens else f"~{estimate_tokens(self.text)} tokens")
+        return " · ".join(parts)
+
+
+async def _stream_run(client, prompt: str, run: CompareRun, on_progress: Callable, timeout_s: float):
+    metrics = {}
+    pending: list[str] = []
+    last_flush = 0.0
+
+    async def consume():
+        nonlocal last_flush
+        async for delta in api_handler.stream_chat_response_async(client, prompt, run.model, metrics=metrics):
+            now = time.perf_counter()
+            if run.ttft_s is None: run.ttft_s = now - run.started
+            run.parts.append(delta); pending.append(delta)
+            if (now - last_flush) * 1000 >= config.COMPARE_UI_FLUSH_MS: # Also true for the first token
+                on_progress(run, "".join(pending)); pending.clear(); last_flush = now
+
+    run.started = time.perf_counter()
+    try:
+        await asyncio.wait_for(consume(), timeout_s)
+    except asyncio.TimeoutError: run.error = f"timed out after {timeout_s:.0f}s"
+    except (ConnectionError, RuntimeError) as e: run.error = str(e)
+    run.latency_s = time.perf_counter() - run.started
+    run.prompt_tokens, run.completion_tokens = metrics.get("prompt_tokens"), metrics.get("completion_tokens")
+    if run.error is None and not run.parts: run.error = "no text response received"
+    run.done = True
+    on_progress(run, "".join(pending))
+
+
+async def compare_models(client, prompt: str, models: list[str], on_progress: Callable[[CompareRun, str], None],
+                         timeout_s: float = config.CHAT_REQUEST_TIMEOUT_S) -> tuple[list[CompareRun], float]:
+    """
+    Streams prompt from every model concurrently. on_progress(run, new_text) is called on
+    the event loop with each batch of new text and once more when the run is done.
+    Returns the runs (in the order of models) and the wall time of the whole comparison.
+    """
+    runs = [CompareRun(model) for model in models]
+    started = time.perf_counter()
+    await asyncio.gather(*(_stream_run(client, prompt, run, on_progress, timeout_s) for run in runs))
+    wall_s = time.perf_counter() - started
+    finished = [run for run in runs if run.ok]
+    logger.info("Compared %s models in %.1fs (%s answered; sum of model times %.1fs).",
+                len(runs), wall_s, len(finished), sum(run.latency_s for run in runs))
+    return runs, wall_s
@@ -0,0 +1,137 @@
+# model_stats.py
+# Measured per-model chat latency (EWMA + percentiles) and throughput, persisted
+# across sessions. Used to annotate the model dropdown and to pick a model for
+# the "auto (fastest acceptable)" setting.
+
+import json
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for responses without usage data."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class _ModelRecord:
+    """Latency/throughput measurements for one model."""
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.ewma_latency_s: float | None = None
+        self.latencies_s: deque = deque(maxlen=max_samples)
+        self.tokens_per_s: deque = deque(maxlen=max_samples)
+
+    def percentile(self, percentile: float) -> float | None:
+        if not self.latencies_s:
+            return None
+        samples = sorted(self.latencies_s)
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def mean_tokens_per_s(self) -> float | None:
+        return (sum(self.tokens_per_s) / len(self.tokens_per_s)) if self.tokens_per_s else None
+
+
+class ModelStats:
+    """Per-model EWMA/percentile latency and tokens/sec for the models this app has used."""
+
+    def __init__(self, alpha: float = config.MODEL_STATS_EWMA_ALPHA, max_samples: int = 200):
+        self.alpha = alpha
+        self.max_samples = max_samples
+        self.models: dict[str, _ModelRecord] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency_s: float, completion_tokens: int | None = None):
+        """Records one completed chat request."""
+        if not model or latency_s <= 0:
+            return
+        with self._lock:
+            record = self.models.setdefault(model, _ModelRecord(self.max_samples))
+            record.count += 1
+            record.latencies_s.append(latency_s)
+            if record.ewma_latency_s is None: record.ewma_latency_s = latency_s
+            else: record.ewma_latency_s = self.alpha * latency_s + (1 - self.alpha) * record.ewma_latency_s
+            if completion_tokens: record.tokens_per_s.append(completion_tokens / latency_s)
+
+    def format_label(self, model: str) -> str:
+        """Dropdown label, e.g. 'gpt-4o  (1.4s avg, p95 3.1s, 52 tok/s)'."""
+        with self._lock:
+            record = self.models.get(model)
+            if record is None or record.ewma_latency_s is None:
+                return model
+            ewma = record.ewma_latency_s
+            p95 = record.percentile(95)
+            tps = record.mean_tokens_per_s()
+        details = f"{ewma:.1f}s avg, p95 {p95:.1f}s"
+        if tps: details += f", {tps:.0f} tok/s"
+        return f"{model}  ({details})"
+
+    def choose_fastest(self, allowed_models: list[str], fallback_model: str) -> str:
+        """
+        Picks the allowed model with the lowest EWMA latency among those with at
+        least config.MODEL_STATS_MIN_SAMPLES measurements whose p95 is within
+        config.AUTO_MODEL_MAX_P95_S. Until every allowed model has that many
+        measurements, the least-measured one is picked instead (round-robin
+        exploration), so "auto" does not stay on the models it happened to call.
+        Falls back to fallback_model when no model qualifies.
+        """
+        best_model, best_latency = None, None
+        with self._lock:
+            counts = {model: self.models[model].count if model in self.models else 0 for model in allowed_models}
+            under_sampled = [model for model in allowed_models if counts[model] < config.MODEL_STATS_MIN_SAMPLES]
+            if under_sampled:
+                return min(under_sampled, key=counts.get) # First in allowed_models order on ties
+            for model in allowed_models:
+                record = self.models[model]
+                p95 = record.percentile(95)
+                if config.AUTO_MODEL_MAX_P95_S and p95 is not None and p95 > config.AUTO_MODEL_MAX_P95_S:
+                    continue
+                if best_latency is None or record.ewma_latency_s < best_latency:
+                    best_model, best_latency = model, record.ewma_latency_s
+        return best_model or fallback_model
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                model: {
+                    "count": record.count,
+                    "ewma_latency_s": record.ewma_latency_s,
+                    "latencies_s": [round(sample, 4) for sample in record.latencies_s],
+                    "tokens_per_s": [round(sample, 2) for sample in record.tokens_per_s],
+                }
+                for model, record in self.models.items()
+            }
+
+    @classmethod
+    def load(cls, stats_file: Path) -> "ModelStats":
+        stats = cls()
+        if not stats_file.exists():
+            return stats
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for model, values in data.items():
+                record = _ModelRecord(stats.max_samples)
+                record.count = int(values.get("count", 0))
+                record.ewma_latency_s = values.get("ewma_latency_s")
+                record.latencies_s.extend(float(v) for v in values.get("latencies_s", []))
+                record.tokens_per_s.extend(float(v) for v in values.get("tokens_per_s", []))
+                stats.models[model] = record
+        except Exception as e:
+            logger.warning("Could not load model stats from %s: %s", stats_file, e)
+        return stats
+
+    def save(self, stats_file: Path):
+        try:
+            stats_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(stats_file, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=4)
+        except Exception as e:
+            logger.warning("Could not save model stats to %s: %s", stats_file, e)
@@ -0,0 +1,147 @@
+# prompt_autocomplete.py
+# Suggests previously sent prompts under the input box while the user types.
+#
+# Every keystroke that changes the input submits a lookup in the prompt prefix
+# index (prompt_index.py) to a dedicated worker thread, so the Tk thread never
+# searches the history. Only the newest keystroke counts: older lookups still
+# queued are skipped, and results that arrive after a newer keystroke or outside
+# the latency budget are dropped. Tab takes the first suggestion, a click takes any
+# of them, and Escape hides the list.
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import customtkinter
+
+import config
+import theme_manager
+from prompt_index import PromptPrefixIndex
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_TEXT = "Enter your text here..."
+_PREVIEW_CHARS = 90
+
+
+def _history_time(timestamp: str | None) -> float | None:
+    """Epoch seconds of a history timestamp (YYYYmmdd_HHMMSS[...]), or None."""
+    try:
+        return datetime.strptime(timestamp[:15], "%Y%m%d_%H%M%S").timestamp() if timestamp else None
+    except ValueError:
+        return None
+
+
+class PromptAutocomplete:
+    """Prompt suggestions for ChatApp.input_textbox, looked up off the Tk thread."""
+
+    def __init__(self, app, textbox):
+        self.app = app
+        self.textbox = textbox
+        self.index = PromptPrefixIndex()
+        self.suggestions: list[str] = []
+        self.dropped_late = 0 # Results discarded for missing the budget
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Autocomplete")
+        self._generation = 0 # Bumped per input change; read by the worker to skip superseded lookups
+        self._last_text = ""
+        self._shown = False
+        self._buttons: list[customtkinter.CTkButton] = []
+        self.frame = customtkinter.CTkFrame(textbox.master, corner_radius=6)
+        theme_manager.register_widget(app, self.frame, "history_frame")
+        self.frame.grid_columnconfigure(0, weight=1)
+        textbox.bind("<KeyRelease>", self._on_key_release)
+        textbox.bind("<Tab>", self._on_tab)
+        textbox.bind("<Escape>", lambda event: self.hide())
+        textbox.bind("<FocusOut>", lambda event: self.app.after(200, self._hide_if_unfocused)) # Let a click on a suggestion land first
+
+    # --- Index ---
+    def build_from_history(self, history: list):
+        """Indexes the prompts of history (newest first) in bulk. Runs on a background thread."""
+        prompts, last_time = [], None
+        for item in reversed(list(history)):
+            if isinstance(item, (list, tuple)) and item and isinstance(item[0], str):
+                last_time = _history_time(item[2] if len(item) > 2 else None) or last_time # Untimestamped entries: as old as the one before
+                prompts.append((item[0], last_time))
+        self.index.build(prompts)
+
+    def record(self, prompt: str):
+        """Counts a sent prompt."""
+        self.index.add(prompt)
+
+    # --- Lookups (worker thread) ---
+    def _lookup(self, generation: int, text: str, typed_at: float):
+        if generation != self._generation:
+            return # A newer keystroke is already queued
+        started = time.perf_counter()
+        suggestions = self.index.query(text)
+        lookup_ms = (time.perf_counter() - started) * 1000
+        if lookup_ms > config.AUTOCOMPLETE_BUDGET_MS / 4:
+            logger.debug("Autocomplete lookup took %.1f ms for %s indexed prompts.", lookup_ms, len(self.index))
+        self.app.engine.post_to_ui(self._show, generation, suggestions, typed_at)
+
+    # --- Tk thread ---
+    def _on_key_release(self, event=None):
+        text = self.textbox.get("0.0", "end-1c")
+        if text == self._last_text:
+            return # Cursor movement, modifiers, ...
+        self._last_text = text
+        self._generation += 1
+        if (text == PLACEHOLDER_TEXT or "\n" in text or len(text) > config.AUTOCOMPLETE_MAX_INPUT_CHARS
+                or len(text.strip()) < config.AUTOCOMPLETE_MIN_PREFIX_CHARS or self.app._request_in_progress()):
+            self.hide()
+            return
+        self._executor.submit(self._lookup, self._generation, text, time.perf_counter())
+
+    def _show(self, generation: int, suggestions: list[str], typed_at: float):
+        if generation != self._generation or self.app._is_shutting_down.is_set():
+            return
+        latency_ms = (time.perf_counter() - typed_at) * 1000
+        if latency_ms > config.AUTOCOMPLETE_BUDGET_MS:
+            self.dropped_late += 1
+            logger.debug("Autocomplete result dropped: %.0f ms after the keystroke.", latency_ms)
+            return
+        self.suggestions = suggestions
+        if not suggestions:
+            self.hide()
+            return
+        for row, suggestion in enumerate(suggestions):
+            preview = suggestion.replace("\n", " ")
+            preview = (preview[:_PREVIEW_CHARS] + '...') if len(preview) > _PREVIEW_CHARS + 3 else preview
+            command = lambda s=suggestion: self.accept(s)
+            if row < len(self._buttons):
+                button = self._buttons[row]; button.configure(text=preview, command=command)
+            else:
+                button = customtkinter.CTkButton(self.frame, text=preview, anchor="w", height=24, command=command)
+                self._buttons.append(button); theme_manager.register_widget(self.app, button, "history_button")
+            button.grid(row=row, column=0, padx=4, pady=2, sticky="ew")
+        for spare_button in self._buttons[len(suggestions):]: spare_button.grid_remove()
+        self.frame.place(in_=self.textbox, relx=0, rely=1.0, relwidth=1.0, anchor="nw") # Overlays the output box
+        self.frame.lift(); self._shown = True
+
+    def _on_tab(self, event=None):
+        if not self.suggestions or not self._shown:
+            return None # Normal Tab
+        self.accept(self.suggestions[0])
+        return "break"
+
+    def accept(self, suggestion: str):
+        self.hide()
+        self._last_text = suggestion
+        self.textbox.delete("0.0", "end")
+        self.textbox.insert("0.0", suggestion)
+        self.textbox.mark_set("insert", "end-1c")
+        self.textbox.focus_set()
+
+    def _hide_if_unfocused(self):
+        focused = self.app.focus_get()
+        if focused is None or not str(focused).startswith(str(self.textbox)):
+            self.hide()
+
+    def hide(self):
+        self._generation += 1 # Results still in flight are stale
+        self.suggestions = []
+        if self._shown: self.frame.place_forget(); self._shown = False
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
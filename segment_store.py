@@ -0,0 +1,244 @@
+# segment_store.py
+# Optional packed storage for response recordings (config.PACKED_AUDIO_STORE).
+#
+# Instead of one response_<timestamp>.mp3 per exchange, clips are appended to a few
+# large segment files and located through an in-memory offset index, persisted as
+# an append-only JSON-lines log next to the segments. Existence checks are dict
+# lookups, reads are slices of a read-only mmap of the segment, and retention drops
+# whole segments instead of globbing and stat()ing every file.
+#
+# New clips are still written as loose files by the TTS code paths (streaming to a
+# file is what the API client does); compact() packs loose files into the active
+# segment in the background and removes them. The GUI is the only writer; other
+# processes (service.py) open the store read-only and call refresh().
+
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "index.jsonl"
+SEGMENT_PATTERN = "segment_{:06d}.seg"
+
+
+@dataclass
+class _Entry:
+    segment: int
+    offset: int
+    length: int
+    extension: str # ".mp3" / ".wav", so readers know the container format
+
+
+class SegmentStore:
+    """Append-only segment files plus a timestamp -> (segment, offset, length) index."""
+
+    def __init__(self, root_dir: Path = config.SEGMENTS_DIR, segment_max_bytes: int = config.SEGMENT_MAX_BYTES,
+                 read_only: bool = False):
+        self.root_dir = Path(root_dir)
+        self.segment_max_bytes = segment_max_bytes
+        self.read_only = read_only
+        self.index_path = self.root_dir / INDEX_FILE_NAME
+        self._entries: dict[str, _Entry] = {} # Insertion order == age order (oldest first)
+        self._maps: dict[int, mmap.mmap] = {}
+        self._index_mtime_ns: int | None = None
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock() # One compaction at a time (startup and per-response runs overlap)
+        if not read_only:
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root_dir / SEGMENT_PATTERN.format(segment)
+
+    def _load_index(self):
+        """Replays the index log, skipping records whose bytes never fully reached their segment."""
+        entries: dict[str, _Entry] = {}
+        segment_sizes: dict[int, int] = {}
+        torn_tail = False
+        try:
+            self._index_mtime_ns = self.index_path.stat().st_mtime_ns
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                for line in index_file:
+                    torn_tail = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                        entry = _Entry(int(record["seg"]), int(record["off"]), int(record["len"]), record["ext"])
+                    except (ValueError, KeyError, TypeError):
+                        continue # Torn last line after a crash
+                    if entry.segment not in segment_sizes:
+                        try: segment_sizes[entry.segment] = self._segment_path(entry.segment).stat().st_size
+                        except OSError: segment_sizes[entry.segment] = -1
+                    if entry.offset + entry.length <= segment_sizes[entry.segment]:
+                        entries.pop(record["ts"], None) # Re-packed entries move to the end (newest)
+                        entries[record["ts"]] = entry
+        except FileNotFoundError:
+            self._index_mtime_ns = None
+        except OSError as e:
+            logger.error("Could not read segment index %s: %s", self.index_path, e)
+        with self._lock:
+            self._close_maps()
+            self._entries = entries
+            if torn_tail and not self.read_only:
+                self._rewrite_index() # So the next append does not continue the torn record's line
+        logger.debug("Segment store loaded: %s clips in %s segments.", len(entries), len(set(e.segment for e in entries.values())))
+
+    def refresh(self):
+        """Reloads the index if another process changed it (cheap: one stat())."""
+        try:
+            mtime_ns = self.index_path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != self._index_mtime_ns:
+            self._load_index()
+
+    def contains(self, timestamp: str | None) -> bool:
+        return bool(timestamp) and timestamp in self._entries
+
+    def extension(self, timestamp: str) -> str | None:
+        entry = self._entries.get(timestamp)
+        return entry.extension if entry is not None else None
+
+    def read(self, timestamp: str) -> bytes | None:
+        """Returns the clip's encoded bytes (sliced from the segment's mmap), or None."""
+        with self._lock:
+            entry = self._entries.get(timestamp)
+            if entry is None:
+                return None
+            try:
+                segment_map = self._maps.get(entry.segment)
+                if segment_map is None or entry.offset + entry.length > len(segment_map):
+                    # Not mapped yet, or the active segment has grown since it was mapped
+                    if segment_map is not None: segment_map.close()
+                    with open(self._segment_path(entry.segment), "rb") as segment_file:
+                        segment_map = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[entry.segment] = segment_map
+                return segment_map[entry.offset:entry.offset + entry.length]
+            except (OSError, ValueError) as e:
+                logger.error("Could not read clip %s from segment %s: %s", timestamp, entry.segment, e)
+                return None
+
+    def _active_segment(self, incoming_bytes: int) -> tuple[int, int]:
+        """(segment number, current size) to append to, rolling over to a new segment when full."""
+        segments = sorted(int(p.stem.split("_")[1]) for p in self.root_dir.glob("segment_*.seg"))
+        segment = segments[-1] if segments else 1
+        try: size = self._segment_path(segment).stat().st_size
+        except OSError: size = 0
+        if size > 0 and size + incoming_bytes > self.segment_max_bytes:
+            segment, size = segment + 1, 0
+        return segment, size
+
+    def put(self, timestamp: str, data: bytes, extension: str) -> bool:
+        """Appends one clip. The bytes are flushed before the index record, so a crash never indexes partial data."""
+        if self.read_only:
+            raise RuntimeError("Segment store opened read-only.")
+        with self._lock:
+            segment, offset = self._active_segment(len(data))
+            try:
+                with open(self._segment_path(segment), "ab") as segment_file:
+                    segment_file.write(data)
+                    segment_file.flush()
+                    os.fsync(segment_file.fileno())
+                record = {"ts": timestamp, "seg": segment, "off": offset, "len": len(data), "ext": extension}
+                with open(self.index_path, "a", encoding="utf-8") as index_file:
+                    index_file.write(json.dumps(record) + "\n")
+                self._index_mtime_ns = self.index_path.stat().st_mtime_ns
+            except OSError as e:
+                logger.error("Could not append clip %s to segment %s: %s", timestamp, segment, e)
+                return False
+            self._entries.pop(timestamp, None)
+            self._entries[timestamp] = _Entry(segment, offset, len(data), extension)
+            return True
+
+    def compact(self, responses_dir: Path, min_age_s: float = config.SEGMENT_COMPACT_MIN_AGE_S) -> int:
+        """
+        Packs loose response_<timestamp>.* clips from responses_dir into segments
+        (oldest first) and deletes them. Files younger than min_age_s are left for
+        the next run, as they may still be being written. Returns the number packed.
+        """
+        with self._compact_lock:
+            return self._compact(responses_dir, time.time() - min_age_s)
+
+    def _compact(self, responses_dir: Path, cutoff: float) -> int:
+        loose = []
+        for extension in config.RESPONSE_AUDIO_EXTENSIONS:
+            for path in responses_dir.glob(f"response_*{extension}"):
+                try: mtime = path.stat().st_mtime
+                except OSError: continue
+                if mtime <= cutoff:
+                    loose.append((mtime, path))
+        packed = 0
+        for _, path in sorted(loose):
+            timestamp = path.stem[len("response_"):]
+            try:
+                if not self.contains(timestamp):
+                    if not self.put(timestamp, path.read_bytes(), path.suffix):
+                        continue
+                    packed += 1
+                path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue # Removed meanwhile (e.g. by retention)
+            except OSError as e:
+                logger.warning("Could not pack %s (will retry): %s", path.name, e) # e.g. still open for playback on Windows
+        if packed:
+            logger.info("Packed %s loose recordings into segments.", packed)
+        return packed
+
+    def retain_latest(self, max_recordings: int) -> int:
+        """
+        Drops every closed segment whose clips are all older than the newest
+        max_recordings, so slightly more than max_recordings may be kept.
+        Returns the number of clips dropped.
+        """
+        with self._lock:
+            if len(self._entries) <= max_recordings:
+                return 0
+            keep = set(list(self._entries)[-max_recordings:]) if max_recordings > 0 else set()
+            segment_has_kept = {}
+            for timestamp, entry in self._entries.items():
+                segment_has_kept[entry.segment] = segment_has_kept.get(entry.segment, False) or timestamp in keep
+            active_segment = max(segment_has_kept)
+            doomed = {segment for segment, has_kept in segment_has_kept.items() if not has_kept and segment != active_segment}
+            if not doomed:
+                return 0
+            dropped = [ts for ts, entry in self._entries.items() if entry.segment in doomed]
+            for timestamp in dropped:
+                del self._entries[timestamp]
+            self._rewrite_index() # Before unlinking, so the index never points at a missing segment
+            for segment in doomed:
+                segment_map = self._maps.pop(segment, None)
+                if segment_map is not None: segment_map.close()
+                try:
+                    self._segment_path(segment).unlink()
+                except OSError as e:
+                    logger.error("Could not delete segment %s: %s", segment, e)
+            logger.info("Dropped %s old segments (%s recordings).", len(doomed), len(dropped))
+            return len(dropped)
+
+    def _rewrite_index(self):
+        temp_path = self.index_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            for timestamp, entry in self._entries.items():
+                record = {"ts": timestamp, "seg": entry.segment, "off": entry.offset, "len": entry.length, "ext": entry.extension}
+                index_file.write(json.dumps(record) + "\n")
+        os.replace(temp_path, self.index_path)
+        self._index_mtime_ns = self.index_path.stat().st_mtime_ns
+
+    def _close_maps(self):
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
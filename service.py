@@ -0,0 +1,414 @@
+# service.py - Headless local HTTP service
+# Exposes the prompt -> answer -> speech pipeline without the GUI, so several local
+# tools can share one process: one OpenAI client (and so one warm HTTP connection
+# pool), one model-latency table and one history store.
+#
+#   python service.py [--host 127.0.0.1] [--port 8765]
+#
+#   POST /chat      {"prompt": "...", "model": optional, "speak": optional bool}
+#                   -> text/plain, streamed with chunked transfer encoding
+#   POST /tts       {"text": "...", "voice", "speed", "format": optional} -> audio bytes
+#   GET  /history?limit=50&offset=0 -> JSON
+#   GET  /history/<timestamp>/audio -> stored response audio
+#   GET  /health    -> JSON
+#
+# Requests beyond SERVICE_MAX_CONCURRENCY wait; beyond SERVICE_MAX_PENDING they get 503.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import config
+import api_handler
+from file_utils import find_response_audio, response_audio_path, write_pcm_as_wav
+from history_manager import load_history, save_history_merged
+from logging_setup import setup_logging, shutdown_logging
+from model_stats import ModelStats, estimate_tokens
+from segment_store import SegmentStore
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+AUDIO_CONTENT_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "pcm": "audio/L16;rate=24000;channels=1"}
+_STREAM_END = object()
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _load_user_defaults() -> dict:
+    """API key, chat model, voice and speed from the GUI's user_settings.json (if present)."""
+    defaults = {"chat_model": config.DEFAULT_CHAT_MODEL, "tts_voice": config.DEFAULT_TTS_VOICE, "tts_speed": config.DEFAULT_TTS_SPEED}
+    settings_file = config.APP_BASE_DATA_DIR / "user_settings.json"
+    if not settings_file.exists():
+        return defaults
+    try:
+        with open(settings_file, "r", encoding="utf-8") as f: settings_data = json.load(f)
+    except Exception as e:
+        logger.error("Error loading user settings file %s: %s", settings_file, e)
+        return defaults
+    loaded_key = settings_data.get("openai_api_key")
+    if isinstance(loaded_key, str) and loaded_key.startswith("sk-"): os.environ['OPENAI_API_KEY'] = loaded_key
+    if isinstance(settings_data.get("chat_model"), str): defaults["chat_model"] = settings_data["chat_model"]
+    if settings_data.get("tts_voice") in config.TTS_VOICES: defaults["tts_voice"] = settings_data["tts_voice"]
+    if isinstance(settings_data.get("tts_speed"), (float, int)) and 0.25 <= settings_data["tts_speed"] <= 4.0: defaults["tts_speed"] = float(settings_data["tts_speed"])
+    return defaults
+
+
+def _json_body(body: bytes) -> dict:
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError as e:
+        raise HTTPError(400, f"Invalid JSON body: {e}")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "JSON body must be an object.")
+    return payload
+
+
+class ChatService:
+    """Request handlers plus the state shared by every client."""
+
+    def __init__(self, max_concurrency: int = config.SERVICE_MAX_CONCURRENCY, max_pending: int = config.SERVICE_MAX_PENDING):
+        self.defaults = _load_user_defaults()
+        if not os.getenv("OPENAI_API_KEY"):
+            logger.error("OpenAI API key missing: set OPENAI_API_KEY or save a key in the app's settings.")
+            raise SystemExit(1)
+        self.client = api_handler.create_client() # Shared: one connection pool for all clients
+        self.history = load_history(config.HISTORY_FILE)
+        self.model_stats = ModelStats.load(config.MODEL_STATS_FILE)
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._pending = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._history_lock = asyncio.Lock()
+        self._background_tasks: set[asyncio.Task] = set() # Speech + history saves finishing after their response
+        self._streaming: set = set() # Writers whose chunked response head is sent but whose body is not finished
+        # Blocking OpenAI calls run here; sized to the concurrency limit
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ServiceWorker")
+        # The GUI owns (packs and trims) the packed store; the service only reads it
+        self.audio_store = SegmentStore(read_only=True) if config.PACKED_AUDIO_STORE else None
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.audio_store is not None: self.audio_store.close()
+        self.model_stats.save(config.MODEL_STATS_FILE)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Admission control: wait for one of max_concurrency slots, or fail fast when the queue is full."""
+        if self._pending >= self.max_pending:
+            raise HTTPError(503, "Service busy, retry later.")
+        self._pending += 1
+        try:
+            async with self._slots:
+                yield
+        finally:
+            self._pending -= 1
+
+    def _resolve_model(self, requested: str | None) -> str:
+        model = requested or self.defaults["chat_model"]
+        if model == config.AUTO_CHAT_MODEL:
+            model = self.model_stats.choose_fastest(config.AUTO_MODEL_CANDIDATES, config.DEFAULT_CHAT_MODEL)
+        return model
+
+    # --- HTTP plumbing ---
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves requests on one (keep-alive) connection."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(method, path, query, body, writer, keep_alive)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    if writer in self._streaming:
+                        # A response is half sent: a second one would corrupt it, so just close
+                        logger.error("Error while streaming %s %s: %s", method, path, e, exc_info=not isinstance(e, HTTPError))
+                        break
+                    if isinstance(e, HTTPError):
+                        await self._send_json(writer, e.status, {"error": e.message}, keep_alive=keep_alive)
+                    else:
+                        logger.error("Unhandled error serving %s %s: %s", method, path, e, exc_info=True)
+                        await self._send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+                        break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.debug("Client closed the connection.")
+        finally:
+            self._streaming.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            content_length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length.")
+        if content_length < 0:
+            raise HTTPError(400, "Invalid Content-Length.")
+        if content_length > config.SERVICE_MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {config.SERVICE_MAX_BODY_BYTES} bytes.")
+        body = await reader.readexactly(content_length) if content_length else b""
+        url = urlsplit(target)
+        return method.upper(), url.path.rstrip("/") or "/", parse_qs(url.query), headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, keep_alive: bool, extra: dict | None = None, length: int | None = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+        if status == 503: lines.append("Retry-After: 1")
+        for name, value in (extra or {}).items(): lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_bytes(self, writer, status: int, content_type: str, data: bytes, keep_alive: bool, extra: dict | None = None):
+        writer.write(self._head(status, content_type, keep_alive, extra, length=len(data)) + data)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload, keep_alive: bool = True):
+        await self._send_bytes(writer, status, "application/json", json.dumps(payload).encode("utf-8"), keep_alive)
+
+    async def _dispatch(self, method, path, query, body, writer, keep_alive):
+        if path == "/chat":
+            if method != "POST": raise HTTPError(405, "Use POST.")
+            await self._chat(_json_body(body), writer, keep_alive)
+        elif path == "/tts":
+            if method != "POST": raise HTTPError(405, "Use POST.")
+            await self._tts(_json_body(body), writer, keep_alive)
+        elif path == "/history":
+            if method != "GET": raise HTTPError(405, "Use GET.")
+            await self._history(query, writer, keep_alive)
+        elif path.startswith("/history/") and path.endswith("/audio"):
+            if method != "GET": raise HTTPError(405, "Use GET.")
+            await self._history_audio(path[len("/history/"):-len("/audio")], writer, keep_alive)
+        elif path == "/health":
+            await self._send_json(writer, 200, {"status": "ok", "pending": self._pending,
+                                                "max_concurrency": self.max_concurrency, "max_pending": self.max_pending}, keep_alive)
+        else:
+            raise HTTPError(404, f"No endpoint {path}")
+
+    # --- Endpoints ---
+    async def _chat(self, payload: dict, writer, keep_alive: bool):
+        prompt = str(payload.get("prompt", "")).strip()
+        if not prompt: raise HTTPError(400, "'prompt' is required.")
+        model = self._resolve_model(payload.get("model"))
+        speak = bool(payload.get("speak", False))
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") if speak else None
+
+        async with self._slot():
+            loop = asyncio.get_running_loop()
+            chunks: asyncio.Queue = asyncio.Queue(maxsize=config.SERVICE_STREAM_BUFFER_CHUNKS)
+            cancel_event = threading.Event()
+
+            def produce():
+                # Worker thread; blocks on the bounded queue while the client reads slowly (backpressure)
+                try:
+                    for delta in api_handler.stream_chat_response(self.client, prompt, model, cancel_event=cancel_event):
+                        if delta: asyncio.run_coroutine_threadsafe(chunks.put(delta), loop).result()
+                    asyncio.run_coroutine_threadsafe(chunks.put(_STREAM_END), loop).result()
+                except Exception as e:
+                    if not cancel_event.is_set(): asyncio.run_coroutine_threadsafe(chunks.put(e), loop).result()
+
+            extra = {"X-Model": model}
+            if timestamp: extra["X-History-Timestamp"] = timestamp
+            started = time.perf_counter()
+            producer = loop.run_in_executor(self._executor, produce)
+            parts = []
+            completed = False
+            try:
+                writer.write(self._head(200, "text/plain; charset=utf-8", keep_alive, extra))
+                self._streaming.add(writer)
+                while True:
+                    item = await chunks.get()
+                    if item is _STREAM_END:
+                        completed = True
+                        break
+                    if isinstance(item, Exception):
+                        logger.error("Chat stream failed: %s", item)
+                        await self._write_chunk(writer, f"\n[Error: {item}]")
+                        break
+                    parts.append(item)
+                    await self._write_chunk(writer, item)
+                latency_s = time.perf_counter() - started
+                writer.write(b"0\r\n\r\n") # End the response before any speech: the client has the whole answer
+                await writer.drain()
+                self._streaming.discard(writer)
+            finally:
+                cancel_event.set()
+                while not producer.done(): # Unblock a producer waiting on a full queue
+                    while not chunks.empty(): chunks.get_nowait()
+                    await asyncio.sleep(0.01)
+
+        generated_text = "".join(parts)
+        if completed and generated_text: # A stream cut off by an error is neither a latency sample nor an answer
+            self.model_stats.record(model, latency_s, estimate_tokens(generated_text))
+            self._start_background(self._save_chat(prompt, generated_text, timestamp), "history save")
+
+    def _start_background(self, coro, what: str):
+        """Runs coro after the response is sent, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro, name=what)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background %s failed: %r", task.get_name(), task.exception())
+
+    async def _save_chat(self, prompt: str, generated_text: str, timestamp: str | None):
+        """Speech for the history entry (if requested), then the entry itself."""
+        if timestamp and not await self._speak_to_history_audio(generated_text, timestamp):
+            timestamp = None
+        await self._append_history(prompt, generated_text, timestamp)
+
+    @staticmethod
+    async def _write_chunk(writer, text: str):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain() # Waits while the client's socket buffer is full
+
+    async def _speak_to_history_audio(self, text: str, timestamp: str) -> bool:
+        """Generates the response audio into the shared responses directory (as the GUI does)."""
+        output_path = response_audio_path(config.RESPONSES_DIR, timestamp, config.TTS_RESPONSE_FORMAT)
+        loop = asyncio.get_running_loop()
+        try:
+            pcm_data = await loop.run_in_executor(self._executor, api_handler.generate_speech, self.client, text, output_path,
+                                                  config.DEFAULT_TTS_MODEL, self.defaults["tts_voice"], self.defaults["tts_speed"],
+                                                  config.TTS_RESPONSE_FORMAT)
+            if pcm_data is not None:
+                await loop.run_in_executor(None, write_pcm_as_wav, pcm_data, output_path, config.TTS_NATIVE_SAMPLE_RATE)
+            return True
+        except (ConnectionError, RuntimeError) as e:
+            logger.error("Response audio generation failed: %s", e)
+            return False
+
+    async def _append_history(self, prompt: str, response: str, timestamp: str | None):
+        async with self._history_lock:
+            self.history.insert(0, (prompt, response, timestamp))
+            snapshot = list(self.history)
+            # Re-read and merge: the GUI writes the same file with entries this process has not seen
+            self.history = await asyncio.get_running_loop().run_in_executor(None, save_history_merged, config.HISTORY_FILE, snapshot)
+
+    async def _tts(self, payload: dict, writer, keep_alive: bool):
+        text = str(payload.get("text", "")).strip()
+        if not text: raise HTTPError(400, "'text' is required.")
+        voice = payload.get("voice", self.defaults["tts_voice"])
+        if voice not in config.TTS_VOICES: raise HTTPError(400, f"'voice' must be one of {config.TTS_VOICES}.")
+        try: speed = float(payload.get("speed", self.defaults["tts_speed"]))
+        except (TypeError, ValueError): raise HTTPError(400, "'speed' must be a number.")
+        if not 0.25 <= speed <= 4.0: raise HTTPError(400, "'speed' must be between 0.25 and 4.0.")
+        response_format = payload.get("format", config.TTS_RESPONSE_FORMAT)
+        if response_format not in AUDIO_CONTENT_TYPES: raise HTTPError(400, f"'format' must be one of {list(AUDIO_CONTENT_TYPES)}.")
+
+        def synthesize() -> bytes:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                output_path = Path(temp_dir) / f"speech.{response_format}"
+                pcm_data = api_handler.generate_speech(self.client, text, output_path, config.DEFAULT_TTS_MODEL, voice, speed, response_format, metrics=tts_metrics)
+                return pcm_data if pcm_data is not None else output_path.read_bytes()
+
+        tts_metrics = {}
+
+        async with self._slot():
+            try:
+                audio = await asyncio.get_running_loop().run_in_executor(self._executor, synthesize)
+            except (ConnectionError, RuntimeError) as e:
+                raise HTTPError(502, str(e))
+        saved_headers = {"X-TTS-Chars-Saved": str(tts_metrics.get("chars_saved", 0)), "X-TTS-Audio-Saved-Seconds": str(tts_metrics.get("audio_s_saved", 0.0))}
+        await self._send_bytes(writer, 200, AUDIO_CONTENT_TYPES[response_format], audio, keep_alive, saved_headers)
+
+    async def _history(self, query: dict, writer, keep_alive: bool):
+        try:
+            limit = min(int(query.get("limit", ["50"])[0]), 500)
+            offset = max(int(query.get("offset", ["0"])[0]), 0)
+        except ValueError:
+            raise HTTPError(400, "'limit' and 'offset' must be integers.")
+        async with self._history_lock:
+            total = len(self.history)
+            page = list(self.history[offset:offset + limit])
+        items = [{"prompt": item[0], "response": item[1], "timestamp": item[2] if len(item) > 2 else None} for item in page]
+        await self._send_json(writer, 200, {"total": total, "offset": offset, "items": items}, keep_alive)
+
+    async def _history_audio(self, timestamp: str, writer, keep_alive: bool):
+        if not timestamp.replace("_", "").isdigit(): raise HTTPError(404, f"No audio for history entry {timestamp}.")
+        loop = asyncio.get_running_loop()
+        audio_path = find_response_audio(config.RESPONSES_DIR, timestamp)
+        if audio_path is not None:
+            audio, extension = await loop.run_in_executor(None, audio_path.read_bytes), audio_path.suffix
+        elif self.audio_store is not None:
+            self.audio_store.refresh()
+            audio, extension = await loop.run_in_executor(None, self.audio_store.read, timestamp), self.audio_store.extension(timestamp) or ""
+        else:
+            audio, extension = None, None
+        if audio is None: raise HTTPError(404, f"No audio for history entry {timestamp}.")
+        await self._send_bytes(writer, 200, AUDIO_CONTENT_TYPES.get(extension.lstrip("."), "application/octet-stream"), audio, keep_alive)
+
+
+async def serve(host: str, port: int):
+    service = ChatService()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logger.info("Service listening on http://%s:%s (max %s concurrent, %s pending)", host, port, service.max_concurrency, service.max_pending)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless local chat + TTS service.")
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    args = parser.parse_args()
+
+    setup_logging()
+    config.ensure_data_dirs()
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        logger.warning("Binding to non-loopback address %s; the service has no authentication.", args.host)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Service stopped.")
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,16 @@
 import customtkinter
 import tkinter as tk
 import os
-from openai import OpenAI, OpenAIError # Keep for type hint if needed, but not used directly
+import logging
 
 # Import from custom modules
 import config
 import api_handler # Keep for default model list
 
-# Define available TTS voices and speed options
-TTS_VOICES = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
-TTS_SPEEDS = { # Dictionary mapping display string to speed float value
-    "0.5x": 0.5, "0.75x": 0.75, "Normal (1.0x)": 1.0,
-    "1.25x": 1.25, "1.5x": 1.5, "2.0x": 2.0,
-}
+# Available TTS voices and speed options now live in config (re-exported here)
+from config import TTS_VOICES, TTS_SPEEDS
+
+logger = logging.getLogger(__name__)
 
 class SettingsWindow(customtkinter.CTkToplevel):
     """
@@ -29,7 +27,7 @@ class SettingsWindow(customtkinter.CTkToplevel):
         self.master_app = master_app
 
         self.title("Settings")
-        self.geometry("500x480")
+        self.geometry("500x600")
         self.resizable(False, False)
         self.transient(master_app)
         self.grab_set()
@@ -41,8 +39,10 @@ class SettingsWindow(customtkinter.CTkToplevel):
         self.grid_rowconfigure(4, weight=0); self.grid_rowconfigure(5, weight=0) # Model
         self.grid_rowconfigure(6, weight=0); self.grid_rowconfigure(7, weight=0) # Voice
         self.grid_rowconfigure(8, weight=0); self.grid_rowconfigure(9, weight=0) # Speed
-        self.grid_rowconfigure(10, weight=1) # Spacer
-        self.grid_rowconfigure(11, weight=0) # Buttons
+        self.grid_rowconfigure(10, weight=0) # Profiler
+        self.grid_rowconfigure(11, weight=0) # Audio backfill
+        self.grid_rowconfigure(12, weight=1) # Speculative prefetch + spacer
+        self.grid_rowconfigure(13, weight=0) # Buttons
 
         # --- API Key Section --- (Row 0)
         api_key_label = customtkinter.CTkLabel(self, text="OpenAI API Key:")
@@ -71,16 +71,25 @@ class SettingsWindow(customtkinter.CTkToplevel):
         # --- Chat Model Selection Section --- (Row 4, 5)
         model_label = customtkinter.CTkLabel(self, text="Chat Model:")
         model_label.grid(row=4, column=0, columnspan=2, padx=20, pady=(5, 0), sticky="w")
-        self.model_var = customtkinter.StringVar(master=self, value=self.master_app.current_chat_model)
-
+        compare_button = customtkinter.CTkButton(self, text="Compare Models...", width=140, command=self.open_compare_window)
+        compare_button.grid(row=4, column=1, padx=20, pady=(5, 0), sticky="e")
         # --- Use the passed model_list --- ## MODIFIED ##
-        # Ensure current model is in the list passed from main app
-        if self.master_app.current_chat_model not in model_list:
+        # Ensure current model is in the list passed from main app (copy: don't mutate the app's list)
+        model_list = [m for m in model_list if m != config.AUTO_CHAT_MODEL]
+        if self.master_app.current_chat_model not in model_list and self.master_app.current_chat_model != config.AUTO_CHAT_MODEL:
              model_list.insert(0, self.master_app.current_chat_model)
 
+        # Entries show measured latency next to each model; map labels back to model IDs on save
+        model_stats = getattr(self.master_app, "model_stats", None)
+        self.model_label_to_id = {config.AUTO_CHAT_MODEL: config.AUTO_CHAT_MODEL}
+        for model_id in model_list:
+            self.model_label_to_id[model_stats.format_label(model_id) if model_stats else model_id] = model_id
+        current_label = next((label for label, model_id in self.model_label_to_id.items() if model_id == self.master_app.current_chat_model), config.AUTO_CHAT_MODEL)
+        self.model_var = customtkinter.StringVar(master=self, value=current_label)
+
         self.model_dropdown = customtkinter.CTkOptionMenu(
             self,
-            values=model_list, # Use the list passed as argument
+            values=list(self.model_label_to_id.keys()), # "auto" first, then the passed list
             variable=self.model_var
         )
         self.model_dropdown.grid(row=5, column=0, columnspan=2, padx=20, pady=2, sticky="ew")
@@ -110,11 +119,29 @@ class SettingsWindow(customtkinter.CTkToplevel):
         )
         speed_dropdown.grid(row=9, column=0, columnspan=2, padx=20, pady=2, sticky="ew")
 
-        # --- Save/Close Buttons --- (Row 11)
+        # --- Diagnostics --- (Row 10) Takes effect immediately, not on Save
+        self.profiler_switch = customtkinter.CTkSwitch(
+            self, text=f"Capture performance profile ({config.PROFILER_DURATION_S:.0f}s, Ctrl+Shift+P)",
+            command=self.toggle_profiler
+        )
+        self.profiler_switch.grid(row=10, column=0, columnspan=2, padx=20, pady=(15, 0), sticky="nw")
+        if self.master_app.sampling_profiler.is_running(): self.profiler_switch.select()
+
+        # --- Audio Backfill --- (Row 11) Applied on Save
+        self.backfill_switch = customtkinter.CTkSwitch(self, text="Generate missing audio for past answers (background)")
+        self.backfill_switch.grid(row=11, column=0, columnspan=2, padx=20, pady=(10, 0), sticky="nw")
+        if self.master_app.audio_backfill_enabled: self.backfill_switch.select()
+
+        # --- Speculative Prefetch --- (Row 12) Applied on Save
+        self.speculative_switch = customtkinter.CTkSwitch(self, text="Request answers while I pause typing (uses extra tokens)")
+        self.speculative_switch.grid(row=12, column=0, columnspan=2, padx=20, pady=(10, 0), sticky="nw")
+        if self.master_app.speculative_prefetch_enabled: self.speculative_switch.select()
+
+        # --- Save/Close Buttons --- (Row 13)
         save_button = customtkinter.CTkButton(self, text="Save Settings", command=self.save_and_close)
-        save_button.grid(row=11, column=0, padx=(20, 5), pady=(20, 20), sticky="ew")
+        save_button.grid(row=13, column=0, padx=(20, 5), pady=(20, 20), sticky="ew")
         close_button = customtkinter.CTkButton(self, text="Cancel", command=self.close_window)
-        close_button.grid(row=11, column=1, padx=(5, 20), pady=(20, 20), sticky="ew")
+        close_button.grid(row=13, column=1, padx=(5, 20), pady=(20, 20), sticky="ew")
 
         self.protocol("WM_DELETE_WINDOW", self.close_window)
 
@@ -123,6 +150,17 @@ class SettingsWindow(customtkinter.CTkToplevel):
     # def _fetch_models(self) -> list[str]: ...
 
 
+    def toggle_profiler(self):
+        """Starts/stops the app's sampling profiler; the switch follows the actual state."""
+        running = self.master_app.toggle_sampling_profiler()
+        if running: self.profiler_switch.select()
+        else: self.profiler_switch.deselect()
+
+    def open_compare_window(self):
+        """Closes Settings (it grabs input) and opens the side-by-side model comparison."""
+        self.close_window()
+        self.master_app.open_compare_window()
+
     def apply_appearance_change(self):
         """Applies appearance mode change to main app."""
         new_mode = self.appearance_mode_var.get()
@@ -134,7 +172,7 @@ class SettingsWindow(customtkinter.CTkToplevel):
         """Saves settings via master app and closes window."""
         new_key = self.api_key_entry.get().strip() or None
         new_mode = self.appearance_mode_var.get()
-        new_model = self.model_var.get()
+        new_model = self.model_label_to_id.get(self.model_var.get(), self.model_var.get())
         new_voice = self.voice_var.get()
         selected_speed_str = self.speed_var.get()
         new_speed = TTS_SPEEDS.get(selected_speed_str, config.DEFAULT_TTS_SPEED)
@@ -147,21 +185,23 @@ class SettingsWindow(customtkinter.CTkToplevel):
             appearance_mode=new_mode,
             chat_model=new_model,
             tts_voice=new_voice,
-            tts_speed=new_speed
+            tts_speed=new_speed,
+            audio_backfill=bool(self.backfill_switch.get()),
+            speculative_prefetch=bool(self.speculative_switch.get())
         )
 
         if saved_ok:
-            print("Settings saved via main app.")
+            logger.info("Settings saved via main app.")
             self.close_window()
         else:
-             print("Settings save failed (see main app logs).")
+             logger.warning("Settings save failed (see main app logs).")
              if hasattr(self, 'status_label') and self.status_label.winfo_exists():
                   self.status_label.configure(text="Failed to save settings.", text_color="red")
 
 
     def close_window(self):
         """Handles closing the settings window."""
-        print("Closing settings window.")
+        logger.info("Closing settings window.")
         self.grab_release()
         self.master_app.settings_window_closed() # Notify main app
         self.destroy()
@@ -0,0 +1,70 @@
+# similar_answers_window.py
+# Defines the "similar past answer" Toplevel shown before a chat request is sent
+
+import customtkinter
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SimilarAnswersWindow(customtkinter.CTkToplevel):
+    """
+    Lists history entries whose prompts closely match the new prompt. The user can
+    reuse one of them (its answer and, if recorded, its audio) or ask anyway.
+    """
+    def __init__(self, master_app, prompt: str, matches: list, on_reuse, on_ask):
+        super().__init__(master_app)
+
+        self.master_app = master_app
+        self.prompt = prompt
+        self.on_reuse = on_reuse
+        self.on_ask = on_ask
+
+        self.title("Similar Past Answers")
+        self.geometry("520x360")
+        self.transient(master_app)
+        self.grab_set()
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        header = customtkinter.CTkLabel(self, text="You asked something similar before:", anchor="w")
+        header.grid(row=0, column=0, padx=20, pady=(15, 5), sticky="ew")
+
+        # --- One row per match (score, prompt preview, answer preview, Reuse button) ---
+        matches_frame = customtkinter.CTkScrollableFrame(self)
+        matches_frame.grid(row=1, column=0, padx=15, pady=5, sticky="nsew")
+        matches_frame.grid_columnconfigure(0, weight=1)
+        for row, (score, item) in enumerate(matches):
+            past_prompt, past_response = item[0], item[1]
+            prompt_preview = past_prompt.replace("\n", " ")
+            prompt_preview = (prompt_preview[:70] + '...') if len(prompt_preview) > 73 else prompt_preview
+            response_preview = past_response.replace("\n", " ")
+            response_preview = (response_preview[:90] + '...') if len(response_preview) > 93 else response_preview
+            text = f"{score:.0%} match: {prompt_preview}\n→ {response_preview}"
+            match_label = customtkinter.CTkLabel(matches_frame, text=text, anchor="w", justify="left", wraplength=360)
+            match_label.grid(row=row, column=0, padx=5, pady=4, sticky="ew")
+            reuse_button = customtkinter.CTkButton(matches_frame, text="Reuse", width=70, command=lambda i=item: self.reuse(i))
+            reuse_button.grid(row=row, column=1, padx=5, pady=4, sticky="e")
+
+        # --- Ask Anyway / Cancel --- (Row 2)
+        button_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        button_frame.grid(row=2, column=0, padx=15, pady=(5, 15), sticky="ew")
+        button_frame.grid_columnconfigure(0, weight=1); button_frame.grid_columnconfigure(1, weight=1)
+        ask_button = customtkinter.CTkButton(button_frame, text="Ask Anyway", command=self.ask)
+        ask_button.grid(row=0, column=0, padx=5, sticky="ew")
+        cancel_button = customtkinter.CTkButton(button_frame, text="Cancel", command=self.close_window)
+        cancel_button.grid(row=0, column=1, padx=5, sticky="ew")
+
+        self.protocol("WM_DELETE_WINDOW", self.close_window)
+
+    def reuse(self, item):
+        logger.info("Reusing past answer instead of a new request.")
+        self.close_window()
+        self.on_reuse(item)
+
+    def ask(self):
+        self.close_window()
+        self.on_ask(self.prompt)
+
+    def close_window(self):
+        self.grab_release()
+        self.destroy()
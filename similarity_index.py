@@ -0,0 +1,170 @@
+# similarity_index.py
+# Local near-duplicate detection over history prompts using hashed TF-IDF vectors.
+#
+# Terms (word unigrams + bigrams) are hashed into a fixed feature space, so no
+# vocabulary is stored. Documents live in an inverted index (per-feature posting
+# arrays), i.e. the columns of a sparse doc x feature matrix. A query is one
+# sparse matrix-vector product: the query's few non-zero features select their
+# postings and np.bincount accumulates the cosine scores for every document, so
+# the cost scales with the postings touched rather than with the history size.
+
+import logging
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 1 << 20
+# Query features present in more than this fraction of documents carry almost no
+# IDF weight but have the longest postings, so they are skipped.
+MAX_QUERY_DF_FRACTION = 0.5
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _features(text: str) -> Counter:
+    """Hashed term counts (unigrams and bigrams) for text."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return Counter(zlib.crc32(term.encode("utf-8")) % N_FEATURES for term in terms)
+
+
+class _Postings:
+    """Growable (doc id, weight) arrays for one feature."""
+    __slots__ = ("docs", "weights", "size")
+
+    def __init__(self):
+        self.docs = np.empty(4, dtype=np.int32)
+        self.weights = np.empty(4, dtype=np.float32)
+        self.size = 0
+
+    def append(self, doc_id: int, weight: float):
+        if self.size == len(self.docs):
+            self.docs = np.resize(self.docs, self.size * 2)
+            self.weights = np.resize(self.weights, self.size * 2)
+        self.docs[self.size] = doc_id
+        self.weights[self.size] = weight
+        self.size += 1
+
+    def extend(self, other: "_Postings"):
+        size = self.size + other.size
+        if size > len(self.docs):
+            self.docs = np.resize(self.docs, size)
+            self.weights = np.resize(self.weights, size)
+        self.docs[self.size:size] = other.docs[:other.size]
+        self.weights[self.size:size] = other.weights[:other.size]
+        self.size = size
+
+
+class SimilarityIndex:
+    """
+    Cosine similarity over TF-IDF prompt vectors, updated incrementally with add().
+    Document weights use the IDF at the time they were added (build() computes it
+    over the whole initial history first); the small drift this causes as the
+    corpus grows does not matter for near-duplicate detection.
+    """
+
+    def __init__(self):
+        self._postings: dict[int, _Postings] = {}
+        self._payloads: list = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _idf(self, feature: int, n_docs: int) -> float:
+        postings = self._postings.get(feature)
+        df = postings.size if postings is not None else 0
+        return math.log((1 + n_docs) / (1 + df)) + 1.0
+
+    @staticmethod
+    def _normalized(weights: dict[int, float]) -> dict[int, float]:
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {f: w / norm for f, w in weights.items()} if norm > 0 else {}
+
+    def _document_weights(self, counts: Counter, n_docs: int, df: Counter | None = None) -> dict[int, float]:
+        """Normalized TF-IDF weights; df defaults to the index's current document frequencies."""
+        weights = {}
+        for feature, count in counts.items():
+            if df is not None:
+                idf = math.log((1 + n_docs) / (1 + df[feature])) + 1.0
+            else:
+                idf = self._idf(feature, n_docs)
+            weights[feature] = (1.0 + math.log(count)) * idf # Sublinear TF
+        return self._normalized(weights)
+
+    def _add_locked(self, counts: Counter, payload):
+        doc_id = len(self._payloads)
+        self._payloads.append(payload)
+        for feature, weight in self._document_weights(counts, doc_id + 1).items():
+            postings = self._postings.get(feature)
+            if postings is None:
+                postings = self._postings[feature] = _Postings()
+            postings.append(doc_id, weight)
+
+    def build(self, items: list[tuple[str, object]]):
+        """
+        Indexes (prompt, payload) pairs in bulk, computing document frequencies over all
+        of them first. The postings are built without the lock (queries keep working
+        meanwhile); only merging in the documents already indexed holds it.
+        """
+        feature_counts = [_features(prompt) for prompt, _ in items]
+        df = Counter()
+        for counts in feature_counts:
+            df.update(counts.keys())
+        n_docs = len(self) + len(items)
+        built: dict[int, _Postings] = {}
+        for doc_id, counts in enumerate(feature_counts):
+            for feature, weight in self._document_weights(counts, n_docs, df).items():
+                postings = built.get(feature)
+                if postings is None:
+                    postings = built[feature] = _Postings()
+                postings.append(doc_id, weight)
+        payloads = [payload for _, payload in items]
+        with self._lock:
+            # Documents already indexed (usually a few added while this ran) follow the built ones
+            shift = len(payloads)
+            for feature, postings in self._postings.items():
+                postings.docs[:postings.size] += shift
+                target = built.get(feature)
+                if target is None: built[feature] = postings
+                else: target.extend(postings)
+            self._postings, self._payloads = built, payloads + self._payloads
+        logger.debug("Similarity index built over %s prompts (%s features).", len(items), len(self._postings))
+
+    def add(self, prompt: str, payload):
+        """Adds one prompt (e.g. a new history entry)."""
+        counts = _features(prompt)
+        with self._lock:
+            self._add_locked(counts, payload)
+
+    def query(self, prompt: str, k: int = 3, min_score: float = 0.0) -> list[tuple[float, object]]:
+        """Top-k (cosine score, payload) pairs with score >= min_score, best first."""
+        counts = _features(prompt)
+        with self._lock:
+            n_docs = len(self._payloads)
+            if n_docs == 0 or not counts:
+                return []
+            query_weights = self._normalized({
+                feature: (1.0 + math.log(count)) * self._idf(feature, n_docs) for feature, count in counts.items()
+            })
+            doc_parts, weight_parts = [], []
+            for feature, query_weight in query_weights.items():
+                postings = self._postings.get(feature)
+                if postings is None or postings.size > MAX_QUERY_DF_FRACTION * n_docs > 1:
+                    continue
+                doc_parts.append(postings.docs[:postings.size])
+                weight_parts.append(postings.weights[:postings.size] * query_weight)
+            if not doc_parts:
+                return []
+            scores = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(weight_parts), minlength=n_docs)
+            # Rank only the documents that share a feature (argpartition is slow on long runs of ties)
+            candidates = np.flatnonzero(scores >= max(min_score, 1e-9))
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+            candidates = candidates[np.argsort(scores[candidates])[::-1]]
+            return [(float(scores[i]), self._payloads[i]) for i in candidates]
@@ -0,0 +1,144 @@
+# speculative_prefetch.py
+# Starts the chat request for a draft prompt while the user pauses typing.
+#
+# When the input box has not changed for SPECULATIVE_DEBOUNCE_MS, its text is sent
+# as a streamed request on the engine loop. Any further edit cancels it, and the
+# debounce starts over. On submit, a speculation for the same text and model is
+# claimed: a finished answer is used at once, and one still streaming is awaited
+# instead of starting over. Speculations that are cancelled or never claimed count
+# as waste (estimated prompt + answer tokens). Once the session's waste reaches
+# SPECULATIVE_WASTE_BUDGET_TOKENS, no new speculations start. Hit rate, waste and
+# time saved are logged on each claim and when the app closes.
+
+import logging
+import time
+
+import config
+import api_handler
+from model_stats import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_TEXT = "Enter your text here..."
+
+
+class Speculation:
+    """One background request for a draft prompt."""
+
+    def __init__(self, prompt: str, model: str):
+        self.prompt = prompt
+        self.model = model
+        self.parts: list[str] = [] # Appended on the engine loop
+        self.metrics: dict = {}
+        self.started = time.perf_counter()
+        self.future = None # concurrent Future of the engine task
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def failed(self) -> bool:
+        return self.future.done() and (self.future.cancelled() or self.future.exception() is not None)
+
+    def tokens_spent(self) -> int:
+        return estimate_tokens(self.prompt) + (self.metrics.get("completion_tokens") or estimate_tokens(self.text))
+
+
+class SpeculativePrefetch:
+    """Debounced speculative chat requests for ChatApp.input_textbox (Tk thread, except _run)."""
+
+    def __init__(self, app, textbox, enabled: bool = config.SPECULATIVE_PREFETCH):
+        self.app = app
+        self.textbox = textbox
+        self.enabled = enabled
+        self.current: Speculation | None = None
+        self.started = 0
+        self.hits = 0
+        self.wasted_tokens = 0
+        self.saved_s = 0.0
+        self._timer = None # after() id of the pending debounce
+        self._last_text = ""
+        self._budget_logged = False
+        textbox.bind("<KeyRelease>", self._on_key_release)
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        if not enabled: self.discard()
+
+    def _draft(self) -> str:
+        return self.textbox.get("0.0", "end-1c").strip()
+
+    def _on_key_release(self, event=None):
+        if not self.enabled:
+            return
+        text = self._draft()
+        if text == self._last_text:
+            return # Cursor movement, modifiers, ...
+        self._last_text = text
+        if self.current is not None and self.current.prompt != text:
+            self._discard_current("edited")
+        self._cancel_timer()
+        self._timer = self.app.after(config.SPECULATIVE_DEBOUNCE_MS, self._start)
+
+    def _cancel_timer(self):
+        if self._timer is not None: self.app.after_cancel(self._timer); self._timer = None
+
+    def _start(self):
+        self._timer = None
+        text = self._draft()
+        if (not self.enabled or self.current is not None or self.app._is_shutting_down.is_set() or self.app._request_in_progress()
+                or self.app.speak_input_enabled or text == PLACEHOLDER_TEXT or len(text) < config.SPECULATIVE_MIN_CHARS):
+            return
+        if self.wasted_tokens >= config.SPECULATIVE_WASTE_BUDGET_TOKENS:
+            if not self._budget_logged: logger.info("Speculative prefetch paused: ~%s wasted tokens reached the budget of %s.", self.wasted_tokens, config.SPECULATIVE_WASTE_BUDGET_TOKENS); self._budget_logged = True
+            return
+        speculation = Speculation(text, self.app.resolve_chat_model())
+        speculation.future = self.app.engine.submit(self._run(speculation), timeout=config.CHAT_REQUEST_TIMEOUT_S, name="SpeculativeChat")
+        self.current = speculation; self.started += 1
+        logger.debug("Speculative request started (%s chars, %s).", len(text), speculation.model)
+
+    async def _run(self, speculation: Speculation) -> str:
+        client = self.app._get_async_client()
+        if not client.api_key: raise ValueError("OpenAI API key missing.")
+        async for delta in api_handler.stream_chat_response_async(client, speculation.prompt, speculation.model, metrics=speculation.metrics):
+            speculation.parts.append(delta)
+        return speculation.text or "(No text response received from API.)"
+
+    def claim(self, prompt: str, model: str) -> Speculation | None:
+        """On submit: the speculation for exactly this prompt and model (finished or still streaming), else None."""
+        self._cancel_timer()
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+        if speculation.prompt != prompt.strip() or speculation.model != model or speculation.failed():
+            self._discard(speculation, "not submitted")
+            return None
+        ready = speculation.future.done()
+        saved_s = speculation.metrics.get("latency_s", 0.0) if ready else time.perf_counter() - speculation.started
+        self.hits += 1; self.saved_s += saved_s
+        logger.info("Speculative prefetch hit (%s, ~%.1fs saved). %s", "answer ready" if ready else "still streaming", saved_s, self.summary())
+        return speculation
+
+    def discard(self):
+        """Cancels the pending debounce and any running speculation (e.g. when the input is replaced)."""
+        self._cancel_timer()
+        self._last_text = ""
+        if self.current is not None: self._discard_current("discarded")
+
+    def _discard_current(self, reason: str):
+        speculation, self.current = self.current, None
+        self._discard(speculation, reason)
+
+    def _discard(self, speculation: Speculation, reason: str):
+        speculation.future.cancel()
+        self.wasted_tokens += speculation.tokens_spent()
+        logger.debug("Speculative request dropped (%s), ~%s tokens wasted so far.", reason, self.wasted_tokens)
+
+    def summary(self) -> str:
+        hit_rate = self.hits / self.started if self.started else 0.0
+        return (f"Speculative prefetch: {self.hits}/{self.started} used ({hit_rate:.0%} hit rate), "
+                f"~{self.wasted_tokens} tokens wasted, ~{self.saved_s:.1f}s saved.")
+
+    def close(self):
+        self.discard()
+        if self.started: logger.info("%s", self.summary())
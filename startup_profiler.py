@@ -0,0 +1,100 @@
+# startup_profiler.py
+# Records how long each import/initializer takes during application startup.
+# Only uses the standard library so it can be imported before anything else.
+
+import time
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Reference point for all startup timings (as close to process start as we can get)
+_PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """Collects named startup phases and reports them against a first-paint target."""
+
+    def __init__(self):
+        self.phases: list[tuple[str, float, float, str]] = [] # (name, start_ms, duration_ms, thread)
+        self.first_paint_ms: float | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def elapsed_ms() -> float:
+        """Milliseconds since the profiler module was imported."""
+        return (time.perf_counter() - _PROCESS_START) * 1000.0
+
+    @contextmanager
+    def phase(self, name: str):
+        """Context manager timing one import or initializer."""
+        start = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            duration = self.elapsed_ms() - start
+            with self._lock:
+                self.phases.append((name, start, duration, threading.current_thread().name))
+
+    def mark_first_paint(self):
+        """Records the time-to-first-paint (only the first call counts)."""
+        if self.first_paint_ms is None:
+            self.first_paint_ms = self.elapsed_ms()
+
+    def report(self, target_ms: float, output_file: Path | None = None):
+        """Prints the phase table and optionally writes it as JSON."""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p[1])
+        logger.info("--- Startup profile ---")
+        for name, start, duration, thread_name in phases:
+            thread_note = "" if thread_name == "MainThread" else f" [{thread_name}]"
+            logger.info("  %8.1f ms  +%7.1f ms  %s%s", start, duration, name, thread_note)
+        if self.first_paint_ms is not None:
+            verdict = "OK" if self.first_paint_ms <= target_ms else "OVER TARGET"
+            logger.info("  Time to first paint: %.1f ms (target %.0f ms) - %s", self.first_paint_ms, target_ms, verdict)
+        logger.info("-----------------------")
+
+        if output_file is None:
+            return
+        try:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "first_paint_ms": self.first_paint_ms,
+                "target_ms": target_ms,
+                "phases": [
+                    {"name": name, "start_ms": round(start, 2), "duration_ms": round(duration, 2), "thread": thread_name}
+                    for name, start, duration, thread_name in phases
+                ],
+            }
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+        except Exception as e:
+            logger.warning("Could not write startup profile to %s: %s", output_file, e)
+
+
+# Shared instance used by main.py and ChatApp
+profiler = StartupProfiler()
+
+
+def preload_modules_in_background(module_names: list[str]) -> threading.Thread:
+    """
+    Imports heavy modules on a daemon thread so they are warm by the time the
+    GUI first needs them. Failures are ignored here; the real import site
+    reports them.
+    """
+    import importlib
+
+    def _preload():
+        for module_name in module_names:
+            try:
+                with profiler.phase(f"import {module_name} (background)"):
+                    importlib.import_module(module_name)
+            except Exception as e:
+                logger.debug("Background preload of '%s' failed: %s", module_name, e)
+
+    thread = threading.Thread(target=_preload, name="ModulePreload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,28 @@
+import json
+
+import history_manager
+from history_manager import load_history, save_history, save_history_merged
+
+
+def test_merged_save_keeps_entries_from_other_writers(tmp_path):
+    history_file = tmp_path / "history.json"
+    save_history(history_file, [("a", "1", None), ("other", "x", None), ("b", "2", None)])
+    merged = save_history_merged(history_file, [("a", "1", "t1"), ("b", "2", None), ("c", "3", None)])
+    assert merged == [("a", "1", "t1"), ("other", "x", None), ("b", "2", None), ("c", "3", None)]
+    assert load_history(history_file) == merged
+    assert not (tmp_path / "history.json.tmp").exists()
+
+
+def test_failed_write_leaves_the_history_file_intact(tmp_path, monkeypatch):
+    history_file = tmp_path / "history.json"
+    save_history(history_file, [("a", "1", None)])
+
+    def failing_dump(data, f, **kwargs):
+        f.write('[["a", "1", nu') # Torn write
+        raise OSError("disk full")
+
+    monkeypatch.setattr(history_manager.json, "dump", failing_dump)
+    save_history_merged(history_file, [("a", "1", None), ("b", "2", None)])
+    monkeypatch.undo()
+    assert json.loads(history_file.read_text(encoding="utf-8")) == [["a", "1", None]]
+    assert not (tmp_path / "history.json.tmp").exists()
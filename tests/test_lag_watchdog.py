@@ -0,0 +1,50 @@
+import time
+import tkinter
+
+import pytest
+
+from lag_watchdog import EventLoopWatchdog
+
+
+# after() and the event loop without a display. Kept for the whole session: a Tcl
+# interpreter must not be freed by the watchdog thread that last references it.
+_INTERP = tkinter.Tcl()
+
+
+@pytest.fixture
+def tcl():
+    return _INTERP
+
+
+def _pump(interp, seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        interp.dooneevent(tkinter._tkinter.DONT_WAIT)
+        time.sleep(0.002)
+
+
+def slow_history_update():
+    time.sleep(0.4)
+
+
+def test_stall_is_attributed_to_the_after_callback(tcl):
+    watchdog = EventLoopWatchdog(tcl, interval_ms=10, stall_threshold_ms=100)
+    watchdog.start()
+    try:
+        tcl.after(50, slow_history_update)
+        _pump(tcl, 0.8)
+    finally:
+        watchdog.stop()
+    assert watchdog.stalls, "stall not detected"
+    assert watchdog.stalls[0]["callback"].startswith("slow_history_update (test_lag_watchdog.py:")
+
+
+def test_histogram_counts_ticks(tcl):
+    watchdog = EventLoopWatchdog(tcl, interval_ms=10, stall_threshold_ms=1000)
+    watchdog.start()
+    try:
+        _pump(tcl, 0.2)
+    finally:
+        watchdog.stop()
+    assert sum(count for _, count in watchdog.histogram()) > 0
+    assert not watchdog.stalls
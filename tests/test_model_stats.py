@@ -0,0 +1,44 @@
+import config
+from model_stats import ModelStats
+
+MODELS = ["fast", "slow", "medium"]
+
+
+def _record(stats: ModelStats, model: str, latency_s: float, count: int):
+    for _ in range(count):
+        stats.record(model, latency_s)
+
+
+def test_without_candidates_uses_the_fallback():
+    assert ModelStats().choose_fastest([], "default") == "default"
+
+
+def test_explores_under_sampled_models_round_robin():
+    stats = ModelStats()
+    latencies = {"fast": 0.5, "slow": 3.0, "medium": 1.0}
+    picks = []
+    for _ in range(config.MODEL_STATS_MIN_SAMPLES * len(MODELS)):
+        model = stats.choose_fastest(MODELS, "slow")
+        picks.append(model)
+        stats.record(model, latencies[model])
+    assert picks[:len(MODELS)] == MODELS
+    assert all(picks.count(model) == config.MODEL_STATS_MIN_SAMPLES for model in MODELS)
+    assert stats.choose_fastest(MODELS, "slow") == "fast"
+
+
+def test_picks_the_least_measured_model_first():
+    stats = ModelStats()
+    _record(stats, "fast", 0.5, config.MODEL_STATS_MIN_SAMPLES)
+    _record(stats, "slow", 3.0, 1)
+    assert stats.choose_fastest(MODELS, "fast") == "medium"
+
+
+def test_skips_models_over_the_p95_limit(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_MODEL_MAX_P95_S", 2.0)
+    stats = ModelStats()
+    _record(stats, "fast", 0.5, config.MODEL_STATS_MIN_SAMPLES)
+    stats.record("fast", 10.0) # One outlier pushes p95 over the limit
+    _record(stats, "medium", 1.0, config.MODEL_STATS_MIN_SAMPLES)
+    assert stats.choose_fastest(["fast", "medium"], "default") == "medium"
+    _record(stats, "medium", 5.0, 20)
+    assert stats.choose_fastest(["fast", "medium"], "default") == "default"
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import pytest
+
+from segment_store import INDEX_FILE_NAME, SegmentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SegmentStore(tmp_path / "segments", segment_max_bytes=100)
+    yield store
+    store.close()
+
+
+def test_put_and_read(store):
+    assert store.put("20240101_000001", b"first clip", ".mp3")
+    assert store.put("20240101_000002", b"second", ".wav")
+    assert store.contains("20240101_000001") and not store.contains("20240101_000003")
+    assert store.read("20240101_000001") == b"first clip"
+    assert store.read("20240101_000002") == b"second"
+    assert store.extension("20240101_000002") == ".wav"
+    assert store.read("20240101_000003") is None
+
+
+def test_read_only_store_sees_new_clips_after_refresh(store):
+    store.put("20240101_000001", b"first clip", ".mp3")
+    reader = SegmentStore(store.root_dir, read_only=True)
+    try:
+        assert reader.read("20240101_000001") == b"first clip"
+        store.put("20240101_000002", b"second", ".mp3")
+        os.utime(store.index_path, ns=(time.time_ns(), time.time_ns() + 10**9)) # mtime granularity
+        reader.refresh()
+        assert reader.read("20240101_000002") == b"second"
+        with pytest.raises(RuntimeError):
+            reader.put("20240101_000003", b"x", ".mp3")
+    finally:
+        reader.close()
+
+
+def test_reload_skips_torn_index_tail_and_partial_segment(store):
+    store.put("20240101_000001", b"complete", ".mp3")
+    with open(store.index_path, "a", encoding="utf-8") as index_file:
+        index_file.write('{"ts": "20240101_000002", "seg": 1, "off": 8, "len": 50, "ext": ".mp3"}\n') # Bytes never written
+        index_file.write('{"ts": "20240101_0000') # Crash mid-record
+    reloaded = SegmentStore(store.root_dir, segment_max_bytes=100)
+    try:
+        assert len(reloaded) == 1 and reloaded.read("20240101_000001") == b"complete"
+        assert reloaded.put("20240101_000003", b"after crash", ".mp3")
+    finally:
+        reloaded.close()
+    again = SegmentStore(store.root_dir)
+    try:
+        assert again.read("20240101_000003") == b"after crash"
+        assert not again.contains("20240101_000002")
+    finally:
+        again.close()
+
+
+def test_retain_latest_drops_whole_old_segments(store):
+    for i in range(6):
+        store.put(f"20240101_00000{i}", b"x" * 40, ".mp3") # Two clips per 100-byte segment
+    segments = sorted(store.root_dir.glob("segment_*.seg"))
+    assert len(segments) == 3
+    assert store.retain_latest(3) == 2 # Segment 2 still holds a kept clip, segment 3 is active
+    assert not segments[0].exists() and segments[1].exists()
+    assert not store.contains("20240101_000000") and store.read("20240101_000002") == b"x" * 40
+    reloaded = SegmentStore(store.root_dir)
+    try:
+        assert len(reloaded) == 4
+    finally:
+        reloaded.close()
+
+
+def test_concurrent_compactions_pack_each_clip_once(store, tmp_path):
+    responses_dir = tmp_path / "responses"
+    responses_dir.mkdir()
+    for i in range(20):
+        (responses_dir / f"response_20240101_0000{i:02d}.mp3").write_bytes(b"clip %d" % i)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.compact(responses_dir, min_age_s=0))) for _ in range(2)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert sum(results) == 20
+    assert not list(responses_dir.iterdir())
+    assert sum(1 for _ in open(store.root_dir / INDEX_FILE_NAME, encoding="utf-8")) == 20
+    assert store.read("20240101_000007") == b"clip 7"
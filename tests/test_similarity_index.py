@@ -0,0 +1,77 @@
+import random
+import threading
+import time
+
+from similarity_index import SimilarityIndex
+
+PROMPTS = [
+    "How do I reverse a list in Python?",
+    "What is the capital of France?",
+    "Explain how a hash map works",
+    "Write a haiku about autumn leaves",
+]
+
+
+def _synthetic_prompts(count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)]
+    return [" ".join(rng.choices(words, k=10)) for _ in range(count)]
+
+
+def test_query_ranks_the_closest_prompt_first():
+    index = SimilarityIndex()
+    index.build([(prompt, i) for i, prompt in enumerate(PROMPTS)])
+    results = index.query("how can I reverse a python list", k=3)
+    assert results[0][1] == 0
+    assert results[0][0] > 0.3
+    assert all(a[0] >= b[0] for a, b in zip(results, results[1:]))
+    assert index.query("capital of France?", k=1, min_score=0.5)[0][1] == 1
+    assert index.query("completely unrelated gibberish zzz", min_score=0.1) == []
+
+
+def test_add_makes_a_prompt_findable():
+    index = SimilarityIndex()
+    index.build([(prompt, i) for i, prompt in enumerate(PROMPTS)])
+    index.add("Summarize the plot of Hamlet", "hamlet")
+    assert len(index) == len(PROMPTS) + 1
+    assert index.query("summarize Hamlet's plot", k=1)[0][1] == "hamlet"
+
+
+def test_build_after_add_keeps_both():
+    index = SimilarityIndex()
+    index.add("Summarize the plot of Hamlet", "hamlet")
+    index.build([(prompt, i) for i, prompt in enumerate(PROMPTS)])
+    assert len(index) == len(PROMPTS) + 1
+    assert index.query("summarize Hamlet's plot", k=1)[0][1] == "hamlet"
+    assert index.query("capital of France?", k=1)[0][1] == 1
+
+
+def test_query_is_not_blocked_by_a_running_build():
+    index = SimilarityIndex()
+    index.add(PROMPTS[0], 0)
+    builder = threading.Thread(target=index.build, args=([(p, p) for p in _synthetic_prompts(20_000)],))
+    builder.start()
+    longest_s = 0.0
+    while builder.is_alive(): # Only the final merge holds the lock
+        started = time.perf_counter()
+        index.query(PROMPTS[0])
+        longest_s = max(longest_s, time.perf_counter() - started)
+        time.sleep(0.005)
+    builder.join()
+    assert longest_s < 0.1
+    assert len(index) == 20_001
+
+
+def test_query_is_sub_millisecond_at_50k_prompts():
+    prompts = _synthetic_prompts(50_000)
+    index = SimilarityIndex()
+    index.build([(p, i) for i, p in enumerate(prompts)])
+    queries = prompts[:200:2]
+    for query in queries[:5]: index.query(query) # Warm-up
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        assert index.query(query, k=3)[0][0] > 0.99 # Finds itself
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    assert timings[len(timings) // 2] < 0.001
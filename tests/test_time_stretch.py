@@ -0,0 +1,46 @@
+# Peak amplitude of time-stretched audio stays bounded at every replay speed.
+
+import numpy as np
+import pytest
+
+import config
+import time_stretch
+
+RATE = config.TTS_NATIVE_SAMPLE_RATE
+
+
+def _sine(amplitude: int = 10000, seconds: float = 2.0) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def _noise(seconds: float = 2.0) -> np.ndarray:
+    samples = np.random.default_rng(0).normal(0, 3000, int(RATE * seconds))
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+@pytest.mark.parametrize("speed", sorted(set(config.TTS_SPEEDS.values())))
+@pytest.mark.parametrize("make_signal", [_sine, _noise], ids=["sine", "noise"])
+def test_peak_stays_bounded(speed, make_signal):
+    samples = make_signal()
+    stretched = time_stretch.stretch_int16(samples, speed)
+    input_peak = np.abs(samples.astype(np.int32)).max()
+    assert len(stretched) == int(round(len(samples) / speed))
+    assert np.abs(stretched.astype(np.int32)).max() <= 1.25 * input_peak
+    assert np.abs(stretched[-300:].astype(np.int32)).max() <= 1.25 * input_peak # No click at the end
+
+
+def test_stereo_keeps_layout():
+    samples = np.stack([_sine(), _sine(5000)], axis=1)
+    stretched = time_stretch.stretch_int16(samples, 0.5)
+    assert stretched.shape == (len(samples) * 2, 2) and stretched.dtype == np.int16 and stretched.flags["C_CONTIGUOUS"]
+
+
+@pytest.mark.parametrize("speed", [0.5, 2.0])
+def test_clip_shorter_than_one_frame_is_stretched(speed):
+    samples = _sine(seconds=0.02) # 480 samples, shorter than one DEFAULT_N_FFT frame
+    stretched = time_stretch.stretch_int16(samples, speed)
+    assert len(stretched) == int(round(len(samples) / speed))
+    assert np.abs(stretched.astype(np.int32)).max() <= 1.25 * np.abs(samples.astype(np.int32)).max()
+    if speed < 1: # The slowed clip is sound throughout, not the original followed by silence
+        assert np.abs(stretched[len(samples):len(samples) + 200].astype(np.int32)).max() > 1000
@@ -0,0 +1,43 @@
+import config
+from tts_text import prepare_for_speech, speech_cache_key
+
+
+def test_numbers_at_line_start_are_kept():
+    assert prepare_for_speech("100. items were counted", mode="strip") == "100. items were counted."
+    assert prepare_for_speech("1. Preheat the oven\n2) Mix the flour", mode="strip") == "1. Preheat the oven.\n2. Mix the flour."
+
+
+def test_bullets_and_checkboxes_are_removed():
+    assert prepare_for_speech("- apples\n* pears!\n+ [x] done", mode="strip") == "apples.\npears!\ndone."
+
+
+def test_headings_emphasis_and_inline_code():
+    text = "## Setup ##\nUse **bold**, *italic*, _under_ and `pip install x`."
+    assert prepare_for_speech(text, mode="strip") == "Setup.\nUse bold, italic, under and pip install x."
+
+
+def test_code_blocks_are_skipped_or_kept():
+    text = "Run this:\n```python\nprint('hi')\n```\nDone."
+    assert prepare_for_speech(text, mode="strip", skip_code=True) == f"Run this:\n{config.TTS_CODE_PLACEHOLDER}\nDone."
+    assert prepare_for_speech(text, mode="verbalize", skip_code=True) == "Run this:\npython code omitted.\nDone."
+    assert prepare_for_speech(text, mode="strip", skip_code=False) == "Run this:\nprint('hi')\nDone."
+
+
+def test_links_and_urls():
+    text = "See [the docs](https://example.com/a/b) or https://python.org/x for more"
+    assert prepare_for_speech(text, mode="strip") == "See the docs or for more"
+    assert prepare_for_speech(text, mode="verbalize") == "See the docs (link to example.com) or python.org for more"
+
+
+def test_tables_become_comma_separated():
+    text = "| Name | Age |\n|------|-----|\n| Ann | 31 |"
+    assert prepare_for_speech(text, mode="strip") == "Name, Age\nAnn, 31"
+
+
+def test_off_mode_only_normalizes_whitespace():
+    assert prepare_for_speech("  **keep**   `this`  \n\n\n- as is ", mode="off") == "**keep** `this`\n- as is"
+
+
+def test_cache_key_ignores_markup_differences():
+    assert speech_cache_key("**Hello** world", "tts-1", "alloy", 1.0, "mp3") == speech_cache_key("Hello   world", "tts-1", "alloy", 1.0, "mp3")
+    assert speech_cache_key("Hello", "tts-1", "alloy", 1.0, "mp3") != speech_cache_key("Hello", "tts-1", "nova", 1.0, "mp3")
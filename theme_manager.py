@@ -1,16 +1,24 @@
 # theme_manager.py
+# Applies appearance modes using precomputed palettes and a registry of themed widgets.
+#
+# Every themed widget is registered once with a role (e.g. "button", "history_button").
+# A mode switch only calls configure() for properties whose value actually changes,
+# and all of that work runs in a single idle callback, so switching stays cheap even
+# with thousands of history rows.
 import customtkinter
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
 
 # --- Define Theme Colors ---
 DARK_BG_MAIN = "#2B2B2B"
 DARK_BG_INPUT = "#2B2B2B"
 DARK_TEXT_PRIMARY = "#DCE4EE"
 BUTTON_DARK_HOVER = "gray15" # Dark hover for buttons
+DARK_HISTORY_BUTTON_FG = "#3A3A3A"
 
 # --- Define HARDCODED default light theme colors for resetting ---
 # Remove the attempt to read from ThemeManager or tk.Frame defaults
-print("INFO: Using hardcoded light theme colors for reset.")
 LIGHT_WINDOW_BG = "#E5E5E5"
 LIGHT_FRAME_BG = "#DBDBDB"
 LIGHT_INPUT_BG = "#F9F9FA"
@@ -21,139 +29,161 @@ LIGHT_BUTTON_HOVER = "#CACACA"
 LIGHT_STOP_BUTTON_HOVER = "#E57373"
 LIGHT_TK_FRAME_BG = "#F0F0F0" # Default tk frame color
 
-# --- Helper Functions ---
-
-def _apply_manual_black_white_overrides(app_instance):
-    """Applies manual dark theme overrides to selected widgets."""
-    # Function definition MUST exist before apply_theme calls it
-    try:
-        print("DEBUG: Applying manual black/white OVERRIDES via theme_manager...")
-        # Backgrounds
-        if hasattr(app_instance, 'configure'): app_instance.configure(fg_color=DARK_BG_MAIN)
-        if hasattr(app_instance, 'history_container'): app_instance.history_container.configure(bg=DARK_BG_MAIN)
-        if hasattr(app_instance, 'main_content_container'): app_instance.main_content_container.configure(bg=DARK_BG_MAIN)
-        if hasattr(app_instance, 'main_content_frame'): app_instance.main_content_frame.configure(fg_color=DARK_BG_MAIN)
-        if hasattr(app_instance, 'history_frame'): app_instance.history_frame.configure(fg_color=DARK_BG_MAIN)
-        if hasattr(app_instance, 'button_frame'): app_instance.button_frame.configure(fg_color=DARK_BG_MAIN)
-        # Input Textbox
-        if hasattr(app_instance, 'input_textbox'): app_instance.input_textbox.configure(fg_color=DARK_BG_INPUT, text_color=DARK_TEXT_PRIMARY)
-        # Labels
-        if hasattr(app_instance, 'history_title_label'): app_instance.history_title_label.configure(text_color=DARK_TEXT_PRIMARY)
-        if hasattr(app_instance, 'status_label'): app_instance.status_label.configure(text_color=DARK_TEXT_PRIMARY)
-        # Checkboxes
-        if hasattr(app_instance, 'tts_checkbox'): app_instance.tts_checkbox.configure(text_color=DARK_TEXT_PRIMARY)
-        if hasattr(app_instance, 'speak_input_checkbox'): app_instance.speak_input_checkbox.configure(text_color=DARK_TEXT_PRIMARY)
-        # Buttons
-        button_list = [
-            getattr(app_instance, 'submit_button', None),
-            getattr(app_instance, 'play_history_button', None),
-            getattr(app_instance, 'settings_button', None)
-        ]
-        for button in button_list:
-            if button and isinstance(button, customtkinter.CTkButton):
-                 try:
-                     button.configure(fg_color=DARK_BG_MAIN, text_color=DARK_TEXT_PRIMARY, hover_color=BUTTON_DARK_HOVER)
-                 except Exception as btn_e: print(f"Warn: Failed to configure button {button}: {btn_e}")
-        # Style Stop button text/hover only
-        if hasattr(app_instance, 'stop_button') and app_instance.stop_button.winfo_exists():
-             try: app_instance.stop_button.configure(text_color=DARK_TEXT_PRIMARY, hover_color="maroon") # Darker red hover
-             except: pass
-
-        print("DEBUG: Manual dark overrides applied.")
-    except Exception as e:
-        print(f"Error applying manual dark overrides: {e}")
-        # traceback.print_exc()
-
-def _reset_manual_overrides(app_instance):
-    """Resets ALL manually styled widgets to explicit light theme default colors."""
-    try:
-        print("DEBUG: Resetting ALL manual OVERRIDES to default colors via theme_manager...")
-
-        # --- Backgrounds ---
-        if hasattr(app_instance, 'configure'): app_instance.configure(fg_color=LIGHT_WINDOW_BG)
-        if hasattr(app_instance, 'history_container'): app_instance.history_container.configure(bg=LIGHT_TK_FRAME_BG)
-        if hasattr(app_instance, 'main_content_container'): app_instance.main_content_container.configure(bg=LIGHT_TK_FRAME_BG)
-        if hasattr(app_instance, 'main_content_frame'): app_instance.main_content_frame.configure(fg_color="transparent")
-        if hasattr(app_instance, 'history_frame'): app_instance.history_frame.configure(fg_color=LIGHT_FRAME_BG)
-        if hasattr(app_instance, 'button_frame'): app_instance.button_frame.configure(fg_color="transparent")
-
-        # --- Text Widgets ---
-        if hasattr(app_instance, 'input_textbox'):
-             app_instance.input_textbox.configure(fg_color=LIGHT_INPUT_BG, text_color=LIGHT_TEXT_COLOR)
-
-        # --- Labels ---
-        if hasattr(app_instance, 'history_title_label'):
-            app_instance.history_title_label.configure(text_color=LIGHT_TEXT_COLOR)
-        if hasattr(app_instance, 'status_label'):
-            app_instance.status_label.configure(text_color=LIGHT_TEXT_COLOR)
-
-        # --- Checkboxes ---
-        if hasattr(app_instance, 'tts_checkbox'):
-            app_instance.tts_checkbox.configure(text_color=LIGHT_TEXT_COLOR)
-        if hasattr(app_instance, 'speak_input_checkbox'):
-            app_instance.speak_input_checkbox.configure(text_color=LIGHT_TEXT_COLOR)
-
-        # --- Buttons ---
-        # Reset using explicit light colors now
-        print("DEBUG: Attempting to reset Button colors using EXPLICIT light values...")
-        button_list = [
-            getattr(app_instance, 'submit_button', None),
-            getattr(app_instance, 'play_history_button', None),
-            getattr(app_instance, 'settings_button', None)
-        ]
-        for button in button_list:
-            if button and isinstance(button, customtkinter.CTkButton):
-                try:
-                     # Reset fg_color, text_color, hover_color
-                     button.configure(fg_color=LIGHT_BUTTON_FG, text_color=LIGHT_BUTTON_TEXT, hover_color=LIGHT_BUTTON_HOVER)
-                except Exception as btn_e: print(f"Warn: Failed to reset button {button}: {btn_e}")
-
-        # Reset stop button text/hover only (keep red background)
-        if hasattr(app_instance, 'stop_button') and app_instance.stop_button.winfo_exists():
-             try:
-                  app_instance.stop_button.configure(text_color=LIGHT_BUTTON_TEXT, hover_color=LIGHT_STOP_BUTTON_HOVER) # Use a light hover red
-             except Exception as btn_e: print(f"Warn: Failed to reset stop button text/hover: {btn_e}")
-
-        print("DEBUG: Manual overrides reset attempted.")
-
-    except Exception as e:
-        print(f"Error resetting manual overrides: {e}")
-        # traceback.print_exc()
+# --- Precomputed Palettes: mode -> role -> configure() options ---
+# "Dark" is a manual override on top of the Light base theme (for stability);
+# "Light" and "System" reset everything to explicit light colors.
+_DARK_PALETTE = {
+    "window": {"fg_color": DARK_BG_MAIN},
+    "tk_container": {"bg": DARK_BG_MAIN},
+    "main_frame": {"fg_color": DARK_BG_MAIN},
+    "history_frame": {"fg_color": DARK_BG_MAIN},
+    "button_frame": {"fg_color": DARK_BG_MAIN},
+    "input": {"fg_color": DARK_BG_INPUT, "text_color": DARK_TEXT_PRIMARY},
+    "label": {"text_color": DARK_TEXT_PRIMARY},
+    "checkbox": {"text_color": DARK_TEXT_PRIMARY},
+    "button": {"fg_color": DARK_BG_MAIN, "text_color": DARK_TEXT_PRIMARY, "hover_color": BUTTON_DARK_HOVER},
+    "stop_button": {"text_color": DARK_TEXT_PRIMARY, "hover_color": "maroon"}, # Keep red background
+    "history_button": {"fg_color": DARK_HISTORY_BUTTON_FG, "text_color": DARK_TEXT_PRIMARY, "hover_color": BUTTON_DARK_HOVER},
+}
+_LIGHT_PALETTE = {
+    "window": {"fg_color": LIGHT_WINDOW_BG},
+    "tk_container": {"bg": LIGHT_TK_FRAME_BG},
+    "main_frame": {"fg_color": "transparent"},
+    "history_frame": {"fg_color": LIGHT_FRAME_BG},
+    "button_frame": {"fg_color": "transparent"},
+    "input": {"fg_color": LIGHT_INPUT_BG, "text_color": LIGHT_TEXT_COLOR},
+    "label": {"text_color": LIGHT_TEXT_COLOR},
+    "checkbox": {"text_color": LIGHT_TEXT_COLOR},
+    "button": {"fg_color": LIGHT_BUTTON_FG, "text_color": LIGHT_BUTTON_TEXT, "hover_color": LIGHT_BUTTON_HOVER},
+    "stop_button": {"text_color": LIGHT_BUTTON_TEXT, "hover_color": LIGHT_STOP_BUTTON_HOVER},
+    "history_button": {"fg_color": LIGHT_BUTTON_FG, "text_color": LIGHT_BUTTON_TEXT, "hover_color": LIGHT_BUTTON_HOVER},
+}
+PALETTES = {"Dark": _DARK_PALETTE, "Light": _LIGHT_PALETTE, "System": _LIGHT_PALETTE}
+
+# Fixed widgets of ChatApp and their roles (history rows register themselves)
+APP_WIDGET_ROLES = {
+    "history_container": "tk_container",
+    "main_content_container": "tk_container",
+    "main_content_frame": "main_frame",
+    "history_frame": "history_frame",
+    "button_frame": "button_frame",
+    "input_textbox": "input",
+    "history_title_label": "label",
+    "status_label": "label",
+    "replay_speed_label": "label",
+    "tts_checkbox": "checkbox",
+    "speak_input_checkbox": "checkbox",
+    "submit_button": "button",
+    "play_history_button": "button",
+    "settings_button": "button",
+    "stop_button": "stop_button",
+}
+
+
+class ThemeRegistry:
+    """Tracks themed widgets and the options last applied to each one."""
+
+    def __init__(self, app_instance):
+        self.app = app_instance
+        self.mode: str | None = None # Set by the first apply_theme()
+        self._roles: dict = {}    # widget -> role
+        self._applied: dict = {}  # widget -> {option: value} last configured
+        self._flush_pending = False
+
+    def register(self, widget, role: str):
+        """Registers a widget and, once a mode is active, styles it straight away."""
+        if widget is None or role not in _LIGHT_PALETTE:
+            return
+        self._roles[widget] = role
+        if self.mode is not None:
+            self._apply_to(widget, role, PALETTES.get(self.mode, _LIGHT_PALETTE))
+
+    def register_app_widgets(self):
+        """Registers the main window and its fixed widgets (attributes that exist so far)."""
+        self.register(self.app, "window")
+        for attr_name, role in APP_WIDGET_ROLES.items():
+            self.register(getattr(self.app, attr_name, None), role)
+
+    def unregister(self, widget):
+        self._roles.pop(widget, None)
+        self._applied.pop(widget, None)
+
+    def set_mode(self, mode: str, immediate: bool = False):
+        """Switches palette. The configure() calls are batched into one idle callback unless immediate."""
+        self.mode = mode
+        if immediate:
+            self._flush()
+        elif not self._flush_pending:
+            self._flush_pending = True
+            self.app.after_idle(self._flush)
+
+    def _flush(self):
+        """Applies the current palette to every registered widget, diffing against what is already set."""
+        self._flush_pending = False
+        palette = PALETTES.get(self.mode, _LIGHT_PALETTE)
+        configured = 0
+        for widget, role in list(self._roles.items()):
+            try:
+                if widget is not self.app and not widget.winfo_exists():
+                    self.unregister(widget)
+                    continue
+                configured += self._apply_to(widget, role, palette)
+            except Exception as e:
+                logger.warning("Failed to theme widget %s: %s", widget, e)
+                self.unregister(widget)
+        logger.debug("Theme '%s' applied (%s of %s widgets changed).", self.mode, configured, len(self._roles))
+
+    def _apply_to(self, widget, role: str, palette: dict) -> int:
+        """Configures only the options that differ from what was last applied. Returns 1 if configure() ran."""
+        target = palette[role]
+        applied = self._applied.setdefault(widget, {})
+        changes = {option: value for option, value in target.items() if applied.get(option) != value}
+        if not changes:
+            return 0
+        widget.configure(**changes)
+        applied.update(changes)
+        return 1
+
+
+def get_registry(app_instance) -> ThemeRegistry:
+    """Returns the app's ThemeRegistry, creating it (and registering the fixed widgets) on first use."""
+    registry = getattr(app_instance, "theme_registry", None)
+    if registry is None:
+        registry = ThemeRegistry(app_instance)
+        app_instance.theme_registry = registry
+        registry.register_app_widgets()
+    return registry
+
+
+def register_widget(app_instance, widget, role: str):
+    """Registers a dynamically created widget (e.g. a history row) for theming."""
+    get_registry(app_instance).register(widget, role)
 
 
 # --- Main Theme Application Function ---
-# Make sure this is defined AFTER the helpers it calls (_apply... and _reset...)
-def apply_theme(app_instance, mode: str):
+def apply_theme(app_instance, mode: str, immediate: bool = False):
     """
-    Applies the global theme ('Light', 'Dark', 'System') and handles
-    manual overrides. Calls full reset for Light/System.
+    Applies the global theme ('Light', 'Dark', 'System') and the matching
+    palette overrides. Pass immediate=True before the first paint; otherwise
+    the per-widget work is batched into a single idle callback.
     """
-    print(f"DEBUG: theme_manager applying theme: {mode}")
+    logger.debug("theme_manager applying theme: %s", mode)
     try:
         applied_mode = mode
-        if mode == "Dark":
-            customtkinter.set_appearance_mode("Light") # Set base theme
-            _apply_manual_black_white_overrides(app_instance) # Apply overrides <--- Make sure this function name matches definition
-        elif mode == "Light":
-            customtkinter.set_appearance_mode("Light")
-            _reset_manual_overrides(app_instance) # Call FULL reset
-        else: # System mode
-            if mode != "System":
-                print(f"WARN: Invalid mode '{mode}' received, defaulting to System.")
-                applied_mode = "System"
-            customtkinter.set_appearance_mode("System")
-            _reset_manual_overrides(app_instance) # Call FULL reset
+        if mode not in PALETTES:
+            logger.warning("Invalid mode '%s' received, defaulting to System.", mode)
+            applied_mode = "System"
+        # Dark uses the Light base theme plus manual overrides
+        customtkinter.set_appearance_mode("System" if applied_mode == "System" else "Light")
+        get_registry(app_instance).set_mode(applied_mode, immediate=immediate)
 
         if hasattr(app_instance, 'current_appearance_mode'):
              app_instance.current_appearance_mode = applied_mode
-    except NameError as ne: # Catch specific NameError
-         print(f"FATAL NameError applying theme: {ne}. Check function definitions in theme_manager.py")
-         traceback.print_exc()
     except Exception as e:
-        print(f"Error applying theme mode '{mode}': {e}")
+        logger.error("Error applying theme mode '%s': %s", mode, e, exc_info=True)
         try: # Fallback safely
-             print("Attempting fallback to System theme.")
+             logger.info("Attempting fallback to System theme.")
              customtkinter.set_appearance_mode("System")
-             _reset_manual_overrides(app_instance) # Call FULL reset
+             get_registry(app_instance).set_mode("System", immediate=True)
              if hasattr(app_instance, 'current_appearance_mode'): app_instance.current_appearance_mode = "System"
-        except Exception as fallback_e: print(f"Error applying fallback System theme: {fallback_e}")
\ No newline at end of file
+        except Exception as fallback_e: logger.error("Error applying fallback System theme: %s", fallback_e)
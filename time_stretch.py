@@ -0,0 +1,70 @@
+# time_stretch.py
+# Pitch-preserving time-stretch (phase vocoder) for replaying clips at a different speed.
+# Pure NumPy and top-level functions only, so work can be sent to a ProcessPoolExecutor.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_N_FFT = 1024
+DEFAULT_HOP = 256
+
+
+def _stretch_mono(samples: np.ndarray, speed: float, n_fft: int, hop: int) -> np.ndarray:
+    """Phase-vocoder time-stretch of a 1-D float signal. speed > 1 is faster/shorter."""
+    target_length = int(round(len(samples) / speed))
+    if len(samples) < n_fft: # Shorter than one frame (a few ms): resample, pitch does not matter at this length
+        if target_length == 0 or len(samples) == 0:
+            return np.zeros(target_length)
+        return np.interp(np.linspace(0, len(samples) - 1, target_length), np.arange(len(samples)), samples)
+
+    window = np.hanning(n_fft)
+    padded = np.pad(samples, (n_fft // 2, n_fft // 2 + n_fft)) # Extra tail: frames overlap fully up to target_length
+    frames = sliding_window_view(padded, n_fft)[::hop] * window
+    stft = np.fft.rfft(frames, axis=1) # (n_frames, n_bins)
+
+    # Fractional analysis positions for each synthesis frame
+    time_steps = np.arange(0, stft.shape[0] - 1, speed)
+    index = time_steps.astype(np.int64)
+    frac = (time_steps - index)[:, None]
+    left, right = stft[index], stft[index + 1]
+    magnitude = (1.0 - frac) * np.abs(left) + frac * np.abs(right)
+
+    # Phase advance per bin, unwrapped around the expected advance, accumulated over frames
+    expected = 2.0 * np.pi * hop * np.arange(stft.shape[1]) / n_fft
+    delta = np.angle(right) - np.angle(left) - expected
+    delta -= 2.0 * np.pi * np.round(delta / (2.0 * np.pi))
+    advance = expected + delta
+    phase = np.angle(stft[0]) + np.vstack([np.zeros((1, stft.shape[1])), np.cumsum(advance[:-1], axis=0)])
+
+    # Inverse STFT with vectorized overlap-add
+    out_frames = np.fft.irfft(magnitude * np.exp(1j * phase), n=n_fft, axis=1) * window
+    positions = (np.arange(out_frames.shape[0]) * hop)[:, None] + np.arange(n_fft)
+    output_length = positions[-1, -1] + 1
+    output = np.zeros(output_length)
+    window_sum = np.zeros(output_length)
+    np.add.at(output, positions, out_frames)
+    np.add.at(window_sum, positions, np.broadcast_to(window ** 2, out_frames.shape))
+    output /= np.maximum(window_sum, 0.1 * window_sum.max()) # Relative floor: edges with little window overlap must not blow up
+
+    output = output[n_fft // 2:]
+    if len(output) < target_length:
+        output = np.pad(output, (0, target_length - len(output)))
+    return output[:target_length]
+
+
+def stretch_int16(samples: np.ndarray, speed: float, n_fft: int = DEFAULT_N_FFT, hop: int = DEFAULT_HOP) -> np.ndarray:
+    """
+    Time-stretches int16 samples shaped (n,) or (n, channels) as returned by
+    pygame.sndarray.array(). Returns a C-contiguous int16 array of the same layout.
+    """
+    if speed == 1.0:
+        return samples
+    float_samples = samples.astype(np.float64) / 32768.0
+    if float_samples.ndim == 1:
+        stretched = _stretch_mono(float_samples, speed, n_fft, hop)
+    else:
+        stretched = np.stack(
+            [_stretch_mono(float_samples[:, channel], speed, n_fft, hop) for channel in range(float_samples.shape[1])],
+            axis=1,
+        )
+    return np.ascontiguousarray(np.clip(stretched * 32768.0, -32768, 32767).astype(np.int16))
@@ -4,6 +4,8 @@
 import customtkinter
 import tkinter as tk
 
+import config
+
 def create_history_panel(master_container):
     """
     Creates the widgets for the history panel.
@@ -50,7 +52,8 @@ def create_main_panel(master_container):
               Keys: 'main_frame', 'input_textbox', 'output_textbox',
                     'button_frame', 'submit_button', 'stop_button',
                     'play_history_button', 'settings_button',
-                    'tts_checkbox', 'speak_input_checkbox', 'status_label'
+                    'tts_checkbox', 'speak_input_checkbox', 'replay_speed_label',
+                    'replay_speed_menu', 'status_label'
     """
     # Main CTkFrame inside the container
     main_content_frame = customtkinter.CTkFrame(
@@ -85,6 +88,7 @@ def create_main_panel(master_container):
     button_frame.grid_rowconfigure(0, weight=0) # Gen/Stop
     button_frame.grid_rowconfigure(1, weight=0) # Play History/Settings
     button_frame.grid_rowconfigure(2, weight=0) # Checkboxes
+    button_frame.grid_rowconfigure(3, weight=0) # Replay speed
 
     # Buttons (Rows 0, 1)
     submit_button = customtkinter.CTkButton(button_frame, text="Generate & Speak") # Command set later
@@ -105,6 +109,13 @@ def create_main_panel(master_container):
     speak_input_checkbox.grid(row=2, column=1, padx=(10,5), pady=(5,5), sticky="w")
     speak_input_checkbox.deselect() # Default OFF
 
+    # Replay Speed (Row 3) - applied locally when playing history audio
+    replay_speed_label = customtkinter.CTkLabel(button_frame, text="Replay Speed:", anchor="w")
+    replay_speed_label.grid(row=3, column=0, padx=(5,10), pady=(0,5), sticky="w")
+    replay_speed_menu = customtkinter.CTkOptionMenu(button_frame, values=list(config.TTS_SPEEDS.keys()))
+    replay_speed_menu.grid(row=3, column=1, padx=(5,0), pady=(0,5), sticky="ew")
+    replay_speed_menu.set("Normal (1.0x)")
+
     # Status Label (Row 3)
     status_label = customtkinter.CTkLabel(main_content_frame, text="Status: Ready", anchor="w")
     status_label.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="ew")
@@ -121,6 +132,8 @@ def create_main_panel(master_container):
         "settings_button": settings_button,
         "tts_checkbox": tts_checkbox,
         "speak_input_checkbox": speak_input_checkbox,
+        "replay_speed_label": replay_speed_label,
+        "replay_speed_menu": replay_speed_menu,
         "status_label": status_label
     }
 